@@ -0,0 +1,118 @@
+"""
+Benchmark de arranque en frío: CLI, worker del pool y GUI.
+
+Cada medición corre en un intérprete nuevo y registra:
+  - import_ms: tiempo de importar el módulo (calculadora_financiera o gui)
+  - primer_resultado_ms: desde el inicio hasta el primer resultado (CLI / worker)
+    o el primer frame dibujado (GUI)
+  - proceso_ms: tiempo total del proceso visto desde afuera (incluye el intérprete)
+  - modulos_pesados: cuáles de pandas / firebase_admin / multiprocessing quedaron cargados
+
+Uso:
+  python benchmark_arranque.py [--repeticiones 5] [--salida arranque.jsonl] [--casos cli worker gui]
+
+Con --salida se agrega una línea JSON por corrida para seguir regresiones en el tiempo.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+DIRECTORIO = os.path.dirname(os.path.abspath(__file__))
+
+_MEDIR = r'''
+import json, sys, time
+t0 = time.perf_counter()
+{cuerpo}
+t2 = time.perf_counter()
+pesados = [m for m in ("pandas", "firebase_admin", "multiprocessing") if m in sys.modules]
+print(json.dumps({{"import_ms": (t1 - t0) * 1e3, "primer_resultado_ms": (t2 - t0) * 1e3,
+                  "modulos_pesados": pesados}}))
+'''
+
+CASOS = {
+    # Script/CLI: modelo base completo con sus métricas
+    "cli": """
+import calculadora_financiera as cf
+t1 = time.perf_counter()
+p = cf.parametros
+monto = p["financiamiento"]["monto_deuda"]
+df = cf.generar_modelo_financiero_detallado(
+    p, cf.construir_cronograma_inversiones(p), cf.crear_tabla_amortizacion(p, monto), monto)
+cf.TIR_anual(df["FCF Apalancado (FCFE)"])
+""",
+    # Worker del pool: lo mismo que ejecuta cada proceso de generar_modelo_financiero_paralelo
+    "worker": """
+import calculadora_financiera as cf
+t1 = time.perf_counter()
+_, escenarios = cf.construir_escenarios_sensibilidad(
+    cf.parametros, {"Tasa": ("financiamiento", "costo_deuda_anual")}, [-0.1, 0.0, 0.1])
+cf._evaluar_bloque_escenarios((escenarios, [p["financiamiento"]["monto_deuda"] for p in escenarios],
+                               ("FCF Apalancado (FCFE)",)))
+""",
+    # GUI: construir la ventana y dibujar el primer frame
+    "gui": """
+import gui
+t1 = time.perf_counter()
+app = gui.App()
+app.update()
+app.destroy()
+""",
+}
+
+def medir(caso):
+    codigo = _MEDIR.format(cuerpo=CASOS[caso].strip())
+    inicio = time.perf_counter()
+    proceso = subprocess.run([sys.executable, "-c", codigo], cwd=DIRECTORIO, capture_output=True, text=True)
+    proceso_ms = (time.perf_counter() - inicio) * 1e3
+    if proceso.returncode != 0:
+        ultima_linea = (proceso.stderr.strip().splitlines() or ["error desconocido"])[-1]
+        return {"error": ultima_linea}
+    resultado = json.loads(proceso.stdout.strip().splitlines()[-1])
+    resultado["proceso_ms"] = proceso_ms
+    return resultado
+
+def resumir(mediciones):
+    """Mediana de cada tiempo; los módulos pesados se toman de la primera medición."""
+    resumen = {clave: statistics.median(m[clave] for m in mediciones)
+               for clave in ("import_ms", "primer_resultado_ms", "proceso_ms")}
+    resumen["modulos_pesados"] = mediciones[0]["modulos_pesados"]
+    return resumen
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeticiones", type=int, default=5)
+    parser.add_argument("--salida", help="archivo JSONL donde agregar el resultado")
+    parser.add_argument("--casos", nargs="+", choices=list(CASOS), default=list(CASOS))
+    args = parser.parse_args()
+
+    resultados = {}
+    print(f"{'Caso':<8}{'Import (ms)':>14}{'1er resultado (ms)':>21}{'Proceso (ms)':>15}  Módulos pesados")
+    for caso in args.casos:
+        mediciones = [medir(caso) for _ in range(args.repeticiones)]
+        errores = [m["error"] for m in mediciones if "error" in m]
+        if errores:
+            # p.ej. la GUI sin customtkinter o sin display: se registra y se sigue
+            resultados[caso] = {"omitido": errores[0]}
+            print(f"{caso:<8}omitido: {errores[0]}")
+            continue
+        resumen = resultados[caso] = resumir(mediciones)
+        print(f"{caso:<8}{resumen['import_ms']:>14.1f}{resumen['primer_resultado_ms']:>21.1f}"
+              f"{resumen['proceso_ms']:>15.1f}  {', '.join(resumen['modulos_pesados']) or '-'}")
+
+    if args.salida:
+        registro = {
+            "fecha": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "repeticiones": args.repeticiones,
+            "casos": resultados,
+        }
+        with open(args.salida, "a", encoding="utf-8") as f:
+            f.write(json.dumps(registro) + "\n")
+
+if __name__ == "__main__":
+    main()
@@ -4,12 +4,47 @@
 # viabilidad de proyectos de inversión inmobiliaria.
 
 import numpy as np
-import pandas as pd
 import copy
-try:
-    from firebase_manager import FirebaseManager
-except ImportError:
-    FirebaseManager = None
+import hashlib
+import importlib
+import numbers
+import os
+import threading
+from collections import Counter, OrderedDict, deque
+from collections.abc import Mapping, MutableMapping, Sequence
+from concurrent.futures import FIRST_COMPLETED, wait
+from dataclasses import dataclass, field
+from enum import IntEnum
+
+class _ModuloPerezoso:
+    """
+    Módulo que se importa recién al leer su primer atributo.
+
+    pandas (y todo lo que arrastra) sólo hace falta para armar DataFrames de salida; los
+    workers del pool y los caminos por lotes trabajan con arrays y nunca lo cargan.
+    """
+
+    def __init__(self, nombre):
+        self._nombre = nombre
+
+    def __getattr__(self, atributo):
+        return getattr(importlib.import_module(self._nombre), atributo)
+
+pd = _ModuloPerezoso("pandas")
+
+def _cargar_firebase_manager():
+    """FirebaseManager importado en el primer uso (firebase_admin es pesado); None si no está instalado."""
+    try:
+        from firebase_manager import FirebaseManager
+    except ImportError:
+        return None
+    return FirebaseManager
+
+def __getattr__(nombre):
+    # Compatibilidad: cf.FirebaseManager sigue disponible, pero se resuelve perezosamente
+    if nombre == "FirebaseManager":
+        return _cargar_firebase_manager()
+    raise AttributeError(f"module {__name__!r} has no attribute {nombre!r}")
 
 # ==============================================================================
 # 1. PARÁMETROS DEL PROYECTO
@@ -72,6 +107,7 @@ def obtener_parametros_firebase(project_id="default_project"):
     Intenta cargar los parámetros desde Firebase.
     Si falla o no hay conexión, retorna None.
     """
+    FirebaseManager = _cargar_firebase_manager()
     if FirebaseManager is None:
         print("FirebaseManager no disponible. Instale firebase-admin.")
         return None
@@ -83,20 +119,579 @@ def obtener_parametros_firebase(project_id="default_project"):
     data = fm.get_project_data(project_id)
     return data
 
+# ------------------------------------------------------------------------------
+# 1.1 Capas de parámetros (copy-on-write)
+# ------------------------------------------------------------------------------
+# Un escenario de sensibilidad cambia uno o dos valores del caso base. En lugar de
+# copiar todo el árbol con copy.deepcopy, ParametrosOverlay envuelve el diccionario base
+# y registra sólo las rutas modificadas; el motor lo lee con el mismo acceso p[...][...].
+
+_ELIMINADO = object()
+_SIN_CAMBIO = object()
+
+def _leer_en_capa(vista, clave):
+    """Resuelve vista[clave]: cambio registrado, o valor base (con multiplicador de tag)."""
+    ruta = vista._prefijo + (clave,)
+    valor = vista._cambios.get(ruta, _SIN_CAMBIO)
+    if valor is _ELIMINADO:
+        raise KeyError(clave)
+    if valor is _SIN_CAMBIO:
+        valor = vista._base[clave]
+        if (vista._tags and clave == "monto" and len(vista._prefijo) == 2
+                and vista._prefijo[0] == "cronograma_inversion"):
+            valor = valor * vista._tags.get(vista.get("tag_sensibilidad"), 1.0)
+    if isinstance(valor, Mapping):
+        return ParametrosOverlay._vista(valor, vista._cambios, vista._tags, ruta)
+    if isinstance(valor, list):
+        return _ListaOverlay(valor, vista._cambios, vista._tags, ruta)
+    return valor
+
+def _escribir_en_capa(vista, clave, valor):
+    """Registra vista[clave] = valor; descarta cambios anteriores por debajo de esa ruta."""
+    ruta = vista._prefijo + (clave,)
+    n = len(ruta)
+    for r in [r for r in vista._cambios if len(r) > n and r[:n] == ruta]:
+        del vista._cambios[r]
+    vista._cambios[ruta] = valor
+
+def _materializar(valor):
+    if isinstance(valor, Mapping):
+        return {k: _materializar(v) for k, v in valor.items()}
+    if isinstance(valor, (list, _ListaOverlay)):
+        return [_materializar(v) for v in valor]
+    return copy.deepcopy(valor)
+
+class ParametrosOverlay(MutableMapping):
+    """
+    Parámetros de un escenario como capa copy-on-write sobre un diccionario base.
+
+    Se lee igual que un dict (p["financiamiento"]["costo_deuda_anual"], iteración de
+    listas, .get); los sub-diccionarios y listas se devuelven como vistas. Las escrituras
+    (también las anidadas, p["financiamiento"]["x"] = v) quedan registradas como rutas en
+    la capa y nunca modifican el base, que puede compartirse entre muchos escenarios.
+
+    Parameters:
+      base: diccionario de parámetros (o otra capa).
+      cambios: {ruta: valor}; la ruta es una tupla de claves e índices de lista,
+        p.ej. ("financiamiento", "costo_deuda_anual") o ("planes_venta", 0, "velocidad").
+      multiplicadores_tag: {tag_sensibilidad: factor} aplicado al "monto" de los ítems
+        de cronograma_inversion con ese tag.
+    """
+    __slots__ = ("_base", "_cambios", "_tags", "_prefijo")
+
+    def __init__(self, base, cambios=None, multiplicadores_tag=None):
+        self._base = base
+        self._cambios = {}
+        self._tags = dict(multiplicadores_tag or {})
+        self._prefijo = ()
+        for ruta, valor in (cambios or {}).items():
+            ruta = tuple(ruta) if isinstance(ruta, (tuple, list)) else (ruta,)
+            vista = self
+            for clave in ruta[:-1]:
+                vista = vista[clave]
+            vista[ruta[-1]] = valor
+
+    @classmethod
+    def _vista(cls, base, cambios, tags, prefijo):
+        vista = cls.__new__(cls)
+        vista._base, vista._cambios, vista._tags, vista._prefijo = base, cambios, tags, prefijo
+        return vista
+
+    def __getitem__(self, clave):
+        return _leer_en_capa(self, clave)
+
+    def __setitem__(self, clave, valor):
+        _escribir_en_capa(self, clave, valor)
+
+    def __delitem__(self, clave):
+        if clave not in self:
+            raise KeyError(clave)
+        _escribir_en_capa(self, clave, _ELIMINADO)
+
+    def __iter__(self):
+        n = len(self._prefijo) + 1
+        nuevas = [r[-1] for r in self._cambios if len(r) == n and r[:-1] == self._prefijo]
+        for clave in list(self._base) + [c for c in nuevas if c not in self._base]:
+            if self._cambios.get(self._prefijo + (clave,)) is not _ELIMINADO:
+                yield clave
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __repr__(self):
+        return f"ParametrosOverlay(cambios={self.cambios!r}, multiplicadores_tag={self._tags!r})"
+
+    @property
+    def cambios(self):
+        """Rutas modificadas respecto del base (relativas a esta vista)."""
+        n = len(self._prefijo)
+        return {r[n:]: v for r, v in self._cambios.items() if r[:n] == self._prefijo}
+
+    @property
+    def multiplicadores_tag(self):
+        return dict(self._tags)
+
+    def con(self, cambios=None, multiplicadores_tag=None):
+        """
+        Nueva capa sobre el mismo base con los cambios de ésta más los indicados; los
+        multiplicadores de tag se componen con los existentes. Esta capa no se modifica.
+        """
+        if self._prefijo:
+            raise ValueError("con() sólo está disponible en la capa raíz")
+        tags = dict(self._tags)
+        for tag, factor in (multiplicadores_tag or {}).items():
+            tags[tag] = tags.get(tag, 1.0) * factor
+        nueva = ParametrosOverlay(self._base, multiplicadores_tag=tags)
+        nueva._cambios = dict(self._cambios)
+        for ruta, valor in (cambios or {}).items():
+            ruta = tuple(ruta) if isinstance(ruta, (tuple, list)) else (ruta,)
+            vista = nueva
+            for clave in ruta[:-1]:
+                vista = vista[clave]
+            vista[ruta[-1]] = valor
+        return nueva
+
+    def materializar(self):
+        """Diccionario plano e independiente con los cambios aplicados (p.ej. para guardar)."""
+        return _materializar(self)
+
+class _ListaOverlay(Sequence):
+    """Vista de una lista dentro de un ParametrosOverlay; sus elementos también son vistas."""
+    __slots__ = ("_base", "_cambios", "_tags", "_prefijo")
+
+    def __init__(self, base, cambios, tags, prefijo):
+        self._base, self._cambios, self._tags, self._prefijo = base, cambios, tags, prefijo
+
+    def _indice(self, i):
+        if not -len(self._base) <= i < len(self._base):
+            raise IndexError("índice fuera de rango")
+        return i % len(self._base)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self._base)))]
+        return _leer_en_capa(self, self._indice(i))
+
+    def __setitem__(self, i, valor):
+        _escribir_en_capa(self, self._indice(i), valor)
+
+    def __len__(self):
+        return len(self._base)
+
+    def get(self, clave, defecto=None):
+        try:
+            return self[clave]
+        except (KeyError, IndexError):
+            return defecto
+
+    def __eq__(self, otro):
+        return isinstance(otro, (list, _ListaOverlay)) and list(self) == list(otro)
+
+    def __repr__(self):
+        return repr(list(self))
+
+# ------------------------------------------------------------------------------
+# 1.2 Caché de etapas del modelo
+# ------------------------------------------------------------------------------
+# Cada etapa (CAPEX, amortización, ventas, proyección operativa) se memoiza con una
+# clave construida sólo con los parámetros que la etapa realmente lee; cambiar p.ej.
+# costo_capital_propio_anual no invalida ninguna etapa del modelo.
+
+def _canonico(valor):
+    """Forma canónica y estable de un sub-árbol de parámetros (dicts ordenados, números float)."""
+    if isinstance(valor, Mapping):
+        return tuple(sorted((str(k), _canonico(v)) for k, v in valor.items()))
+    if isinstance(valor, (list, tuple, Sequence)) and not isinstance(valor, str):
+        return tuple(_canonico(v) for v in valor)
+    if isinstance(valor, (bool, np.bool_)):
+        return bool(valor)
+    if isinstance(valor, numbers.Real):
+        return float(valor)
+    return valor
+
+def _clave_canonica(*partes):
+    """Hash canónico de las entradas de una etapa."""
+    return hashlib.blake2b(repr(_canonico(partes)).encode(), digest_size=16).hexdigest()
+
+def _solo_lectura(valor):
+    if isinstance(valor, np.ndarray):
+        valor.setflags(write=False)
+    elif isinstance(valor, tuple):
+        for v in valor:
+            _solo_lectura(v)
+    return valor
+
+class CacheEtapas:
+    """
+    Caché LRU de resultados por etapa del modelo, con contadores de aciertos y fallos.
+
+    Las entradas se indexan por (etapa, clave) donde la clave es el hash canónico de las
+    entradas de la etapa (ver `_clave_canonica`). Los arrays guardados quedan de sólo
+    lectura; quien arma un objeto pandas a partir de ellos lo hace con copia.
+
+    Parameters:
+      max_entradas: límite de entradas (0 desactiva la caché).
+    """
+
+    def __init__(self, max_entradas=256):
+        self.max_entradas = max_entradas
+        self._entradas = OrderedDict()
+        self._lock = threading.Lock()
+        self.aciertos = Counter()
+        self.fallos = Counter()
+
+    def __len__(self):
+        return len(self._entradas)
+
+    def buscar(self, etapa, clave):
+        """Valor guardado o None; cuenta un acierto o un fallo para la etapa."""
+        with self._lock:
+            valor = self._entradas.get((etapa, clave))
+            if valor is None:
+                self.fallos[etapa] += 1
+            else:
+                self._entradas.move_to_end((etapa, clave))
+                self.aciertos[etapa] += 1
+            return valor
+
+    def guardar(self, etapa, clave, valor):
+        valor = _solo_lectura(valor)
+        with self._lock:
+            if self.max_entradas > 0:
+                self._entradas[(etapa, clave)] = valor
+                self._entradas.move_to_end((etapa, clave))
+                while len(self._entradas) > self.max_entradas:
+                    self._entradas.popitem(last=False)
+        return valor
+
+    def obtener(self, etapa, clave, calcular):
+        """Resultado de la etapa para `clave`, llamando a `calcular()` sólo si no está guardado."""
+        valor = self.buscar(etapa, clave)
+        if valor is None:
+            valor = self.guardar(etapa, clave, calcular())
+        return valor
+
+    def limpiar(self):
+        with self._lock:
+            self._entradas.clear()
+            self.aciertos.clear()
+            self.fallos.clear()
+
+    def estadisticas(self):
+        """{etapa: {"aciertos": int, "fallos": int}} más el total de entradas."""
+        etapas = sorted(set(self.aciertos) | set(self.fallos))
+        resumen = {e: {"aciertos": self.aciertos[e], "fallos": self.fallos[e]} for e in etapas}
+        resumen["entradas"] = len(self._entradas)
+        return resumen
+
+# Caché compartida por todo el módulo
+cache_etapas = CacheEtapas()
+
+# Las claves se arman sobre el proyecto compilado (ver 1.3): los campos ya son
+# int/float/IntEnum, así que el repr de cada dataclass es estable.
+
+def _clave_capex(s):
+    return _clave_canonica(s.horizonte_meses, [(evento.mes, evento.monto) for evento in s.inversiones])
+
+def _clave_amortizacion(s, monto_deuda):
+    f = s.financiamiento
+    return _clave_canonica(s.horizonte_meses, monto_deuda, f.plazo_deuda_meses,
+                           f.costo_deuda_anual, int(f.capitalizacion))
+
+def _clave_ventas(s):
+    return _clave_canonica(s.horizonte_meses, s.crecimiento_precio_anual, s.planes_venta)
+
+def _clave_operativa(s, clave_ventas):
+    return _clave_canonica(clave_ventas, s.items_periodicos)
+
+def _etapa_por_escenario(etapa, claves, calcular_filas):
+    """
+    Resuelve una etapa para N escenarios deduplicando por clave: cada clave distinta se
+    busca en la caché y las faltantes se calculan juntas con `calcular_filas(indices)`,
+    que debe devolver una tupla de arrays cuyo primer eje recorre `indices`.
+
+    Returns:
+      tupla de arrays con primer eje N, en el orden de `claves`.
+    """
+    primero = {}
+    for i, clave in enumerate(claves):
+        primero.setdefault(clave, i)
+    valores = {}
+    faltantes = []
+    for clave in primero:
+        valor = cache_etapas.buscar(etapa, clave)
+        if valor is None:
+            faltantes.append(clave)
+        else:
+            valores[clave] = valor
+    if faltantes:
+        calculado = calcular_filas([primero[clave] for clave in faltantes])
+        for j, clave in enumerate(faltantes):
+            valores[clave] = cache_etapas.guardar(etapa, clave, tuple(np.array(a[j]) for a in calculado))
+    n_partes = len(valores[claves[0]])
+    return tuple(np.stack([valores[clave][c] for clave in claves]) for c in range(n_partes))
+
+# ------------------------------------------------------------------------------
+# 1.3 Proyecto compilado (especificación validada)
+# ------------------------------------------------------------------------------
+# El motor no recorre los diccionarios anidados: `compilar_proyecto` valida cada campo
+# una sola vez, cambia las etiquetas de texto por enteros (IntEnum) y deja el cronograma
+# de inversiones ordenado por mes. Las capas (ParametrosOverlay) y el grafo del modelo
+# siguen trabajando sobre el diccionario, que es lo que edita la GUI.
+
+class TipoPlan(IntEnum):
+    DINAMICO = 0
+    PROGRAMADO = 1
+
+class TipoItem(IntEnum):
+    INGRESO = 1
+    GASTO = 2
+
+class BaseCalculo(IntEnum):
+    MONTO_FIJO = 1
+    PCT_VENTAS = 2
+    POR_LOTE = 3
+    PCT_UTILIDAD = 4
+
+class Capitalizacion(IntEnum):
+    """El valor es la cantidad de meses por período de pago."""
+    MENSUAL = 1
+    TRIMESTRAL = 3
+    SEMESTRAL = 6
+    ANUAL = 12
+
+# Etiquetas que usan los diccionarios de parámetros (y los combos de la GUI)
+_ETIQUETAS = {
+    TipoPlan: {"Dinámico": TipoPlan.DINAMICO, "Programado": TipoPlan.PROGRAMADO},
+    TipoItem: {"Ingreso": TipoItem.INGRESO, "Gasto": TipoItem.GASTO},
+    BaseCalculo: {"Monto Fijo": BaseCalculo.MONTO_FIJO, "% Ventas": BaseCalculo.PCT_VENTAS,
+                  "Por Lote Inventario": BaseCalculo.POR_LOTE, "% Utilidad": BaseCalculo.PCT_UTILIDAD},
+    Capitalizacion: {"Mensual": Capitalizacion.MENSUAL, "Trimestral": Capitalizacion.TRIMESTRAL,
+                     "Semestral": Capitalizacion.SEMESTRAL, "Anual": Capitalizacion.ANUAL},
+}
+
+# Meses por período de pago según `capitalizacion`
+_MESES_POR_PERIODO = {etiqueta: int(valor) for etiqueta, valor in _ETIQUETAS[Capitalizacion].items()}
+
+class ParametrosInvalidos(ValueError):
+    """Un parámetro falta o tiene un valor inválido; `ruta` indica cuál (p.ej. "planes_venta[1].frecuencia")."""
+
+    def __init__(self, ruta, mensaje):
+        super().__init__(f"{ruta}: {mensaje}")
+        self.ruta = ruta
+
+@dataclass(frozen=True, slots=True)
+class EventoInversion:
+    mes: int
+    monto: float
+    item: str = field(default="", compare=False, repr=False)
+    tag: str | None = field(default=None, compare=False, repr=False)
+
+@dataclass(frozen=True, slots=True)
+class PlanVenta:
+    tipo: TipoPlan
+    cantidad_lotes: float
+    velocidad: float
+    mes_inicio: int
+    monto_pie: float
+    monto_cuota: float
+    frecuencia: int
+    cantidad_cuotas: int
+    nombre: str = field(default="", compare=False, repr=False)
+
+@dataclass(frozen=True, slots=True)
+class ItemPeriodico:
+    tipo: TipoItem
+    base_calculo: BaseCalculo
+    monto: float
+    mes_inicio: int
+    mes_fin: int
+
+@dataclass(frozen=True, slots=True)
+class Financiamiento:
+    """Los campos que no vienen en el diccionario quedan en None (ver `ProyectoCompilado.exigir`)."""
+    monto_deuda: float | None
+    costo_deuda_anual: float | None
+    plazo_deuda_meses: int | None
+    capitalizacion: Capitalizacion
+    costo_capital_propio_anual: float | None
+    tasa_impuesto_renta: float | None
+    porcentaje_deuda: float | None
+
+@dataclass(frozen=True, slots=True)
+class ProyectoCompilado:
+    """
+    Parámetros de un proyecto ya validados, tal como los lee el motor.
+
+    inversiones: EventoInversion ordenados por mes (orden estable dentro de cada mes).
+    inversion_total: suma de los montos en el orden original del cronograma.
+    """
+    horizonte_meses: int | None
+    inversiones: tuple
+    inversion_total: float
+    crecimiento_precio_anual: float
+    planes_venta: tuple
+    items_periodicos: tuple
+    financiamiento: Financiamiento
+
+    def exigir(self, *campos):
+        """Lanza ParametrosInvalidos si alguno de los campos (p.ej. "financiamiento.plazo_deuda_meses") falta."""
+        for campo in campos:
+            valor = self
+            for parte in campo.split("."):
+                valor = getattr(valor, parte)
+            if valor is None:
+                raise ParametrosInvalidos(campo, "falta el campo")
+        return self
+
+_FALTA = object()
+
+def _numero(seccion, clave, ruta, entero=False, defecto=_FALTA, minimo=None):
+    """Campo numérico validado (int si `entero`); None cuenta como ausente."""
+    ruta = f"{ruta}.{clave}" if ruta else clave
+    valor = seccion.get(clave)
+    if valor is None:
+        if defecto is _FALTA:
+            raise ParametrosInvalidos(ruta, "falta el campo")
+        return defecto
+    if isinstance(valor, (bool, np.bool_)) or not isinstance(valor, numbers.Real) or not np.isfinite(valor):
+        raise ParametrosInvalidos(ruta, f"se esperaba un número (recibido {valor!r})")
+    if entero:
+        if valor != int(valor):
+            raise ParametrosInvalidos(ruta, f"se esperaba un entero (recibido {valor!r})")
+        valor = int(valor)
+    else:
+        valor = float(valor)
+    if minimo is not None and valor < minimo:
+        raise ParametrosInvalidos(ruta, f"debe ser >= {minimo} (recibido {valor!r})")
+    return valor
+
+def _etiqueta(seccion, clave, ruta, enum, defecto=_FALTA):
+    """Etiqueta de texto (o el IntEnum mismo) convertida a `enum`."""
+    ruta = f"{ruta}.{clave}" if ruta else clave
+    valor = seccion.get(clave)
+    if valor is None:
+        if defecto is _FALTA:
+            raise ParametrosInvalidos(ruta, "falta el campo")
+        return defecto
+    if isinstance(valor, enum):
+        return valor
+    opciones = _ETIQUETAS[enum]
+    if not isinstance(valor, str) or valor not in opciones:
+        raise ParametrosInvalidos(ruta, f"valor desconocido {valor!r} (opciones: {', '.join(opciones)})")
+    return opciones[valor]
+
+def _seccion(p, clave):
+    seccion = p.get(clave)
+    if seccion is None:
+        return {}
+    if not isinstance(seccion, Mapping):
+        raise ParametrosInvalidos(clave, "se esperaba un diccionario")
+    return seccion
+
+def _lista(p, clave):
+    lista = p.get(clave)
+    if lista is None:
+        return []
+    if isinstance(lista, (str, Mapping)) or not isinstance(lista, Sequence):
+        raise ParametrosInvalidos(clave, "se esperaba una lista")
+    for i, elemento in enumerate(lista):
+        if not isinstance(elemento, Mapping):
+            raise ParametrosInvalidos(f"{clave}[{i}]", "se esperaba un diccionario")
+    return lista
+
+def _compilar_plan(plan, ruta):
+    tipo = _etiqueta(plan, "tipo", ruta, TipoPlan, TipoPlan.DINAMICO)
+    return PlanVenta(
+        tipo=tipo,
+        cantidad_lotes=_numero(plan, "cantidad_lotes", ruta),
+        # Un plan programado vende todo en mes_inicio: la velocidad no se usa
+        velocidad=_numero(plan, "velocidad", ruta, minimo=0, defecto=0.0 if tipo == TipoPlan.PROGRAMADO else _FALTA),
+        mes_inicio=_numero(plan, "mes_inicio", ruta, entero=True, defecto=1),
+        monto_pie=_numero(plan, "monto_pie", ruta),
+        monto_cuota=_numero(plan, "monto_cuota", ruta),
+        frecuencia=_numero(plan, "frecuencia", ruta, entero=True, minimo=0),
+        cantidad_cuotas=_numero(plan, "cantidad_cuotas", ruta, entero=True, minimo=0),
+        nombre=str(plan.get("nombre", "")),
+    )
+
+def _compilar_item(item, ruta):
+    return ItemPeriodico(
+        tipo=_etiqueta(item, "tipo", ruta, TipoItem),
+        base_calculo=_etiqueta(item, "base_calculo", ruta, BaseCalculo, BaseCalculo.MONTO_FIJO),
+        monto=_numero(item, "monto", ruta),
+        mes_inicio=_numero(item, "mes_inicio", ruta, entero=True),
+        mes_fin=_numero(item, "mes_fin", ruta, entero=True),
+    )
+
+def compilar_proyecto(p):
+    """
+    Valida un diccionario de parámetros (o una capa ParametrosOverlay) y lo convierte
+    en un ProyectoCompilado. Si `p` ya está compilado se devuelve tal cual.
+
+    Cada campo presente se valida (tipo, rango y etiquetas conocidas); las secciones y
+    listas ausentes quedan vacías, y los escalares ausentes sin valor por defecto quedan
+    en None para que cada punto de entrada del motor exija sólo los que usa. Las claves
+    que el motor no lee se ignoran.
+
+    Raises:
+      ParametrosInvalidos: con la ruta del primer campo inválido.
+    """
+    if isinstance(p, ProyectoCompilado):
+        return p
+
+    eventos = []
+    for i, item in enumerate(_lista(p, "cronograma_inversion")):
+        ruta = f"cronograma_inversion[{i}]"
+        eventos.append(EventoInversion(
+            mes=_numero(item, "mes", ruta, entero=True, minimo=0),
+            monto=_numero(item, "monto", ruta),
+            item=str(item.get("item", "")),
+            tag=item.get("tag_sensibilidad"),
+        ))
+    inversion_total = sum(evento.monto for evento in eventos)
+    eventos.sort(key=lambda evento: evento.mes)
+
+    ventas = _seccion(p, "ventas")
+    f = _seccion(p, "financiamiento")
+    financiamiento = Financiamiento(
+        monto_deuda=_numero(f, "monto_deuda", "financiamiento", minimo=0, defecto=None),
+        costo_deuda_anual=_numero(f, "costo_deuda_anual", "financiamiento", minimo=-1, defecto=None),
+        plazo_deuda_meses=_numero(f, "plazo_deuda_meses", "financiamiento", entero=True, minimo=0, defecto=None),
+        capitalizacion=_etiqueta(f, "capitalizacion", "financiamiento", Capitalizacion, Capitalizacion.MENSUAL),
+        costo_capital_propio_anual=_numero(f, "costo_capital_propio_anual", "financiamiento", minimo=-1, defecto=None),
+        tasa_impuesto_renta=_numero(f, "tasa_impuesto_renta", "financiamiento", defecto=None),
+        porcentaje_deuda=_numero(f, "porcentaje_deuda", "financiamiento", defecto=None),
+    )
+    return ProyectoCompilado(
+        horizonte_meses=_numero(p, "horizonte_meses", "", entero=True, minimo=0, defecto=None),
+        inversiones=tuple(eventos),
+        inversion_total=inversion_total,
+        crecimiento_precio_anual=_numero(ventas, "crecimiento_precio_anual", "ventas", minimo=-1, defecto=0.0),
+        planes_venta=tuple(_compilar_plan(plan, f"planes_venta[{i}]") for i, plan in enumerate(_lista(p, "planes_venta"))),
+        items_periodicos=tuple(_compilar_item(item, f"items_periodicos[{i}]")
+                               for i, item in enumerate(_lista(p, "items_periodicos"))),
+        financiamiento=financiamiento,
+    )
+
+
 # ==============================================================================
 # 2. CÁLCULOS PRELIMINARES Y CRONOGRAMAS
 # ==============================================================================
 
 def calcular_inversion_total(p):
-    return sum(item["monto"] for item in p["cronograma_inversion"])
+    return compilar_proyecto(p).inversion_total
+
+def _etapa_capex(s):
+    """Etapa de CAPEX memoizada: array (horizonte + 1,) de sólo lectura, en positivo."""
+    s.exigir("horizonte_meses")
+    return cache_etapas.obtener("capex", _clave_capex(s), lambda: _capex_batch([s], s.horizonte_meses)[0])
 
 def construir_cronograma_inversiones(p):
-    horizonte = p["horizonte_meses"]
-    cronograma = pd.Series([0.0] * (horizonte + 1), name="Inversiones (CAPEX)")
-    for item in p["cronograma_inversion"]:
-        if item["mes"] <= horizonte:
-            cronograma[item["mes"]] += item["monto"]
-    return cronograma
+    return _cronograma_inversiones(compilar_proyecto(p))
+
+def _cronograma_inversiones(s):
+    return pd.Series(_etapa_capex(s), name="Inversiones (CAPEX)", copy=True)
 
 def crear_tabla_amortizacion(p, monto_deuda):
     """
@@ -106,403 +701,1119 @@ def crear_tabla_amortizacion(p, monto_deuda):
     - `plazo_deuda_meses` es el horizonte en meses del préstamo.
     - `capitalizacion` define la frecuencia de pago en meses (Mensual=1, Trimestral=3, Semestral=6, Anual=12).
     - La tasa anual `costo_deuda_anual` se interpreta como tasa efectiva anual (EAR).
+
+    La tabla se memoiza en `cache_etapas` por plazo, tasa, capitalización, monto y horizonte.
     """
-    import math
-
-    plazo_meses = p["financiamiento"]["plazo_deuda_meses"]
-    tasa_anual = p["financiamiento"]["costo_deuda_anual"]
-    freq_map = {"Mensual": 1, "Trimestral": 3, "Semestral": 6, "Anual": 12}
-    period_months = freq_map.get(p["financiamiento"].get("capitalizacion", "Mensual"), 1)
-
-    # Número de pagos (uno cada `period_months`)
-    if period_months <= 0:
-        period_months = 1
-    num_payments = math.ceil(plazo_meses / period_months) if plazo_meses > 0 else 0
-
-    # Tasa por período de pago (efectiva para el periodo)
-    # Si tasa_anual es EAR, la tasa periódica es:
-    periodic_rate = (1 + tasa_anual) ** (period_months / 12.0) - 1 if num_payments > 0 else 0.0
-
-    # Amortización de capital por pago (sistema alemán: capital constante por pago)
-    amort_por_pago = (monto_deuda / num_payments) if num_payments > 0 else 0.0
-
-    cronograma = []
-    saldo = monto_deuda
-
-    horizonte = p["horizonte_meses"]
-    for mes in range(1, horizonte + 1):
-        if mes <= plazo_meses:
-            interes_pagado = 0.0
-            principal_pagado = 0.0
-
-            # Si es mes de pago (cada period_months), se paga interés + principal
-            if mes % period_months == 0:
-                # calcular interés sobre el saldo vigente al inicio del período
-                interes_pagado = saldo * periodic_rate
-                principal_pagado = amort_por_pago
-
-                # evitar sobregiro final por redondeos
-                principal_pagado = min(principal_pagado, saldo)
-                saldo -= principal_pagado
-
-            cronograma.append({
-                "Mes": mes,
-                "Saldo Inicial": saldo + principal_pagado,
-                "Interés": interes_pagado,
-                "Principal": principal_pagado,
-                "Saldo Pendiente": max(0.0, saldo)
-            })
-        else:
-            cronograma.append({
-                "Mes": mes,
-                "Saldo Inicial": 0.0,
-                "Interés": 0.0,
-                "Principal": 0.0,
-                "Saldo Pendiente": 0.0
-            })
+    return _tabla_amortizacion(compilar_proyecto(p), monto_deuda)
+
+def _tabla_amortizacion(s, monto_deuda):
+    cubo = _etapa_amortizacion(s, monto_deuda)
+    meses = pd.Index(np.arange(1, s.horizonte_meses + 1), name="Mes")
+    return pd.DataFrame({nombre: cubo[i, 1:].copy() for i, nombre in enumerate(COLUMNAS_AMORTIZACION)}, index=meses)
+
+_CAMPOS_DEUDA = ("horizonte_meses", "financiamiento.costo_deuda_anual", "financiamiento.plazo_deuda_meses")
 
-    return pd.DataFrame(cronograma).set_index("Mes")
+def _etapa_amortizacion(s, monto_deuda):
+    """Etapa de deuda memoizada: array (4, horizonte + 1) con los campos de COLUMNAS_AMORTIZACION."""
+    s.exigir(*_CAMPOS_DEUDA)
+    return cache_etapas.obtener(
+        "amortizacion", _clave_amortizacion(s, monto_deuda), lambda: _cubo_amortizacion(s, monto_deuda)
+    )
+
+# Orden de los campos en el cubo de `calcular_amortizacion_batch`
+COLUMNAS_AMORTIZACION = ["Saldo Inicial", "Interés", "Principal", "Saldo Pendiente"]
+
+def calcular_amortizacion_batch(montos_deuda, tasas_anuales, plazos_meses, meses_por_periodo, horizonte):
+    """
+    Sistema alemán en forma cerrada para N préstamos a la vez (sin recorrer meses).
+
+    Con k(m) = floor(min(m, plazo) / período) pagos hechos hasta el mes m, el saldo antes
+    del pago de un mes es monto - (k(m) - pago(m)) * amortización; interés y principal
+    salen de ese saldo en los meses de pago. Mismas convenciones que `crear_tabla_amortizacion`:
+    tasa efectiva anual, capital constante monto / ceil(plazo / período) y todo en cero
+    después del plazo.
+
+    Parameters:
+      montos_deuda, tasas_anuales, plazos_meses, meses_por_periodo: escalares o arrays (N,).
+      horizonte: último mes del cronograma.
+
+    Returns:
+      array (4, N, horizonte + 1) con los campos de COLUMNAS_AMORTIZACION; t=0 en cero.
+    """
+    monto, tasa, plazo, periodo = np.broadcast_arrays(
+        *(np.atleast_1d(np.asarray(x, dtype=float)) for x in (montos_deuda, tasas_anuales, plazos_meses, meses_por_periodo))
+    )
+    periodo = np.maximum(periodo, 1.0)
+
+    num_pagos = np.where(plazo > 0, np.ceil(plazo / periodo), 0.0)
+    hay_pagos = num_pagos > 0
+    tasa_periodo = np.where(hay_pagos, (1 + tasa) ** (periodo / 12.0) - 1, 0.0)
+    amort_por_pago = np.divide(monto, num_pagos, out=np.zeros_like(monto), where=hay_pagos)
+
+    meses = np.arange(horizonte + 1)
+    plazo_c, periodo_c = plazo[:, None], periodo[:, None]
+    vigente = (meses >= 1) & (meses <= plazo_c)
+    pago = vigente & (meses % periodo_c == 0)
+    pagos_previos = np.floor(np.minimum(meses, np.maximum(plazo_c, 0)) / periodo_c) - pago
+
+    saldo_antes = monto[:, None] - pagos_previos * amort_por_pago[:, None]
+    principal = np.where(pago, np.minimum(amort_por_pago[:, None], saldo_antes), 0.0)
+    interes = np.where(pago, saldo_antes * tasa_periodo[:, None], 0.0)
+
+    cubo = np.empty((len(COLUMNAS_AMORTIZACION), monto.size, horizonte + 1))
+    cubo[0] = np.where(vigente, saldo_antes, 0.0)
+    cubo[1] = interes
+    cubo[2] = principal
+    cubo[3] = np.where(vigente, np.maximum(0.0, saldo_antes - principal), 0.0)
+    return cubo
+
+def _cubo_amortizacion(s, monto_deuda):
+    f = s.financiamiento
+    cubo = calcular_amortizacion_batch(
+        monto_deuda, f.costo_deuda_anual, f.plazo_deuda_meses, int(f.capitalizacion), s.horizonte_meses
+    )
+    return np.ascontiguousarray(cubo[:, 0, :])
 
 # ==============================================================================
 # 3. MOTOR DE CÁLCULO FINANCIERO DETALLADO
 # ==============================================================================
 
-def generar_modelo_financiero_detallado(p, capex, tabla_amortizacion, monto_deuda_total):
+def _lotes_vendidos_plan(plan, horizonte):
     """
-    Genera el modelo financiero detallado con estricta separación de flujos
-    de PROYECTO (No Apalancado) vs INVERSIONISTA (Apalancado).
-    
-    Reglas de Negocio:
-    1. FCFF (Proyecto) = NOPAT + Depreciacion + CAPEX (+/- WK).
-       - NOPAT usa Impuestos Operativos (asumiendo deuda=0).
-       - Excluye intereses y amortización.
-    2. FCFE (Inversionista) = FCFF - Intereses*(1-T) - Amortización + Nueva Deuda.
-       - Refleja el flujo neto real para el accionista.
-    3. t=0: Se maneja explícitamente. Si (CAPEX_0 + Deuda_0) < 0, es aporte de equity.
+    Vector mensual (t=0..horizonte) de lotes vendidos por un plan de venta.
+
+    - "Programado": vende todo el inventario en `mes_inicio`.
+    - "Dinámico": vende `velocidad` lotes por mes desde el mes 1 hasta agotar inventario.
     """
-    horizonte = p["horizonte_meses"]
-    tasa_impuesto = p["financiamiento"]["tasa_impuesto_renta"]
-    
-    # Columnas extendidas para traza clara
-    columnas = [
-        "Ingresos Ventas Pies", "Ingresos Ventas Cuotas", "Otros Ingresos", "Ingresos Totales",
-        "Costos Operativos Dinámicos", "EBITDA", "Depreciacion", "EBIT",
-        "Impuestos Operativos (Teóricos)", "NOPAT", "FCF Operativo", "CAPEX", "FCF No Apalancado (FCFF)",
-        "Intereses", "Ahorro Fiscal Intereses", "Amortización Principal", "Entrada Deuda",
-        "Net Debt Cashflow", "FCF Apalancado (FCFE)",
-        # Métricas P&L Real (Contable)
-        "EBT", "Impuestos Reales", "Utilidad Neta",
-        "Lotes Vendidos", "Lotes en Inventario", "Saldo Deuda"
-    ]
-    
-    # Inicializar DataFrame con t=0 hasta t=Horizonte
-    df = pd.DataFrame(0.0, index=range(horizonte + 1), columns=columnas)
-    
+    vendidos = np.zeros(horizonte + 1)
+    cantidad = plan.cantidad_lotes
+    if cantidad <= 0 or horizonte < 1:
+        return vendidos
+
+    if plan.tipo == TipoPlan.PROGRAMADO:
+        if 1 <= plan.mes_inicio <= horizonte:
+            vendidos[plan.mes_inicio] = cantidad
+    else:
+        velocidad = plan.velocidad
+        meses = np.arange(horizonte)
+        restantes = np.maximum(cantidad - velocidad * meses, 0)
+        vendidos[1:] = np.minimum(velocidad, restantes)
+    return vendidos
+
+def _kernel_cuotas(plan, horizonte):
+    """
+    Núcleo de cobro de cuotas de un plan: kernel[k] = cantidad de cuotas que se cobran
+    k meses después del mes de venta. Truncado al horizonte del modelo.
+    """
+    desfase = 0 if plan.tipo == TipoPlan.PROGRAMADO else 1
+    offsets = desfase + np.arange(plan.cantidad_cuotas) * plan.frecuencia
+    offsets = offsets[(offsets >= 0) & (offsets <= horizonte)]
+    if offsets.size == 0:
+        return np.zeros(0)
+    kernel = np.zeros(offsets.max() + 1)
+    np.add.at(kernel, offsets, 1.0)
+    return kernel
+
+def _proyectar_ventas(s, horizonte):
+    """
+    Motor de cobranza: proyecta lotes vendidos, cobros de pies y cobros de cuotas.
+
+    Para cada plan se construye primero el vector mensual de ventas; los cobros de
+    cuotas se obtienen convolucionando ese vector (valorizado con el factor de precio
+    del mes de venta) con el núcleo de cuotas del plan. El costo no depende de la
+    cantidad de lotes.
+
+    Returns:
+      (lotes_vendidos, cobros_pies, cobros_cuotas): arrays de largo horizonte + 1.
+    """
+    lotes_vendidos = np.zeros(horizonte + 1)
+    cobros_pies = np.zeros(horizonte + 1)
+    cobros_cuotas = np.zeros(horizonte + 1)
+
+    meses = np.arange(horizonte + 1)
+    factor_precio = (1 + s.crecimiento_precio_anual) ** ((meses - 1) / 12.0)
+
+    for plan in s.planes_venta:
+        vendidos = _lotes_vendidos_plan(plan, horizonte)
+        lotes_vendidos += vendidos
+        cobros_pies += (plan.monto_pie * factor_precio) * vendidos
+
+        kernel = _kernel_cuotas(plan, horizonte)
+        if kernel.size:
+            ventas_valorizadas = vendidos * (plan.monto_cuota * factor_precio)
+            cobros_cuotas += np.convolve(ventas_valorizadas, kernel)[:horizonte + 1]
+
+    return lotes_vendidos, cobros_pies, cobros_cuotas
+
+# Columnas del modelo (orden público del DataFrame). Extendidas para traza clara.
+COLUMNAS_MODELO = [
+    "Ingresos Ventas Pies", "Ingresos Ventas Cuotas", "Otros Ingresos", "Ingresos Totales",
+    "Costos Operativos Dinámicos", "EBITDA", "Depreciacion", "EBIT",
+    "Impuestos Operativos (Teóricos)", "NOPAT", "FCF Operativo", "CAPEX", "FCF No Apalancado (FCFF)",
+    "Intereses", "Ahorro Fiscal Intereses", "Amortización Principal", "Entrada Deuda",
+    "Net Debt Cashflow", "FCF Apalancado (FCFE)",
+    # Métricas P&L Real (Contable)
+    "EBT", "Impuestos Reales", "Utilidad Neta",
+    "Lotes Vendidos", "Lotes en Inventario", "Saldo Deuda",
+    # Alias / visualización
+    "Flujo Caja Neto Inversionista", "Aportación Capital",
+]
+IDX_COLUMNA = {nombre: i for i, nombre in enumerate(COLUMNAS_MODELO)}
+
+def _a_vector_mensual(serie, horizonte):
+    """
+    Convierte una Serie/DataFrame-columna indexada por mes (o un array desde t=0)
+    en un array float64 de largo horizonte + 1, rellenando con ceros.
+    """
+    if hasattr(serie, "reindex"):
+        return serie.reindex(range(horizonte + 1), fill_value=0.0).to_numpy(dtype=float)
+    valores = np.asarray(serie, dtype=float)[:horizonte + 1]
+    vector = np.zeros(horizonte + 1)
+    vector[:valores.size] = valores
+    return vector
+
+def _tabla_o_sin_deuda(tabla_amortizacion):
+    """Las funciones públicas del modelo reciben None como "sin cronograma de deuda"."""
+    if tabla_amortizacion is None:
+        return {columna: np.zeros(0) for columna in COLUMNAS_AMORTIZACION}
+    return tabla_amortizacion
+
+def _calcular_bloque_modelo(s, capex, tabla_amortizacion, monto_deuda_total):
+    """
+    Núcleo del modelo financiero sobre arrays NumPy.
+
+    Trabaja sobre un único bloque 2D float64 de forma (len(COLUMNAS_MODELO), horizonte + 1),
+    una fila contigua por columna (ver IDX_COLUMNA). No construye ningún DataFrame.
+
+    Returns:
+      (bloque, kpis): kpis es un dict con "roi_estatico", "multiplo_capital" y "roi_total".
+    """
+    s.exigir("horizonte_meses", "financiamiento.tasa_impuesto_renta")
+    horizonte = s.horizonte_meses
+    tasa_impuesto = s.financiamiento.tasa_impuesto_renta
+
+    bloque = np.zeros((len(COLUMNAS_MODELO), horizonte + 1))
+    col = {nombre: bloque[i] for nombre, i in IDX_COLUMNA.items()}
+
     # --------------------------------------------------------------------------
     # 1. CARGA DE ESTRUCTURAS DE TIEMPO (CAPEX, DEUDA)
     # --------------------------------------------------------------------------
-    
+
     # CAPEX es negativo (salida de caja)
-    df["CAPEX"] = -capex.reindex(df.index, fill_value=0.0)
-    
-    # Deuda (Tabla Amortización del sistema alemán/francés ya calculado)
-    if tabla_amortizacion is not None:
-        # Interés y amortización son salidas (positivas en tabla, negativas en flujo)
-        # Ajustamos signo en el bucle o aquí. Preferible explícito:
-        # Interés es gasto, Amortización es flujo salida.
-        interes_reindex = tabla_amortizacion["Interés"].reindex(df.index, fill_value=0.0)
-        principal_reindex = tabla_amortizacion["Principal"].reindex(df.index, fill_value=0.0)
-        saldo_reindex = tabla_amortizacion["Saldo Pendiente"].reindex(df.index, fill_value=0.0)
-        
-        df["Intereses"] = interes_reindex
-        df["Amortización Principal"] = -principal_reindex # Flujo salida
-        df["Saldo Deuda"] = saldo_reindex
-    else:
-        df["Intereses"] = 0.0
-        df["Amortización Principal"] = 0.0
-        df["Saldo Deuda"] = 0.0
+    col["CAPEX"][:] = -_a_vector_mensual(capex, horizonte)
+
+    # Deuda (Tabla Amortización del sistema alemán ya calculado)
+    # Interés es gasto, Amortización es flujo salida (positivas en tabla, negativas en flujo).
+    col["Intereses"][:] = _a_vector_mensual(tabla_amortizacion["Interés"], horizonte)
+    col["Amortización Principal"][:] = -_a_vector_mensual(tabla_amortizacion["Principal"], horizonte)
+    col["Saldo Deuda"][:] = _a_vector_mensual(tabla_amortizacion["Saldo Pendiente"], horizonte)
 
     # Entrada de Deuda (t=0 usualmente)
-    df.loc[0, "Entrada Deuda"] = monto_deuda_total
+    col["Entrada Deuda"][0] = monto_deuda_total
 
-    # Lotes e Inventario
-    total_lotes = sum(plan["cantidad_lotes"] for plan in p.get("planes_venta", []))
-    df.loc[0, "Lotes en Inventario"] = total_lotes
-    
     # --------------------------------------------------------------------------
     # 2. PROYECCIÓN OPERATIVA (INGRESOS, COSTOS, EBITDA)
     # --------------------------------------------------------------------------
-    
-    cobros_programados_pies = np.zeros(horizonte + 1)
-    cobros_programados_cuotas = np.zeros(horizonte + 1)
-    
-    v_planes = []
-    for p_v in p.get("planes_venta", []):
-        v_planes.append({**p_v, "lotes_restantes": p_v["cantidad_lotes"]})
-    
-    crecimiento_anual = p["ventas"].get("crecimiento_precio_anual", 0.0)
-    
-    # Variables de estado para pérdidas fiscales (real y operativa)
-    perdida_arrastrable_real = 0.0
-    # Podríamos modelar pérdida operativa teórica para NOPAT si se desea estricto,
-    # por simplicidad NOPAT = EBIT * (1-t) asumiendo escudo inmediato o simplificado.
-    
-    for mes in range(1, horizonte + 1):
-        # A. Ventas
-        factor_precio = (1 + crecimiento_anual) ** ((mes - 1) / 12.0)
-        lotes_vendidos_mes = 0
-        
-        for plan in v_planes:
-            if plan["lotes_restantes"] > 0:
-                if plan.get("tipo", "Dinámico") == "Programado":
-                    if mes == plan.get("mes_inicio", 1):
-                        vendidos = plan["lotes_restantes"]
-                        plan["lotes_restantes"] = 0
-                    else: vendidos = 0
-                else:
-                    vendidos = min(plan["velocidad"], plan["lotes_restantes"])
-                    plan["lotes_restantes"] -= vendidos
-                
-                lotes_vendidos_mes += vendidos
-                if vendidos > 0:
-                    monto_pie = (plan["monto_pie"] * factor_precio) * vendidos
-                    if mes <= horizonte: cobros_programados_pies[mes] += monto_pie
-                    monto_cuota = plan["monto_cuota"] * factor_precio
-                    for _ in range(vendidos):
-                        for c_idx in range(plan["cantidad_cuotas"]):
-                            mes_cobro = mes + (c_idx * plan["frecuencia"]) + (0 if plan.get("tipo") == "Programado" else 1)
-                            if mes_cobro <= horizonte:
-                                cobros_programados_cuotas[mes_cobro] += monto_cuota
-
-        df.loc[mes, "Lotes Vendidos"] = lotes_vendidos_mes
-        df.loc[mes, "Lotes en Inventario"] = df.loc[mes-1, "Lotes en Inventario"] - lotes_vendidos_mes
-        df.loc[mes, "Ingresos Ventas Pies"] = cobros_programados_pies[mes]
-        df.loc[mes, "Ingresos Ventas Cuotas"] = cobros_programados_cuotas[mes]
-        
-        # B. Otros Ingresos
-        ing_periodico = 0
-        for item in p.get("items_periodicos", []):
-            if item["mes_inicio"] <= mes <= item["mes_fin"] and item["tipo"] == "Ingreso":
-                ing_periodico += item["monto"]
-        
-        df.loc[mes, "Otros Ingresos"] = ing_periodico
-        ing_totales = df.loc[mes, "Ingresos Ventas Pies"] + df.loc[mes, "Ingresos Ventas Cuotas"] + ing_periodico
-        df.loc[mes, "Ingresos Totales"] = ing_totales
-        
-        # C. Costos Operativos
-        cost_dinamico = 0
-        for item in p.get("items_periodicos", []):
-            if item["mes_inicio"] <= mes <= item["mes_fin"] and item["tipo"] == "Gasto":
-                base = item.get("base_calculo", "Monto Fijo")
-                if base == "Monto Fijo":
-                    cost_dinamico += item["monto"]
-                elif base == "% Ventas":
-                    cost_dinamico += ing_totales * (item["monto"] / 100)
-                elif base == "Por Lote Inventario":
-                    cost_dinamico += df.loc[mes, "Lotes en Inventario"] * item["monto"]
-                elif base == "% Utilidad":
-                    ebitda_pre = ing_totales - cost_dinamico
-                    cost_dinamico += max(0, ebitda_pre) * (item["monto"] / 100)
-        
-        df.loc[mes, "Costos Operativos Dinámicos"] = -cost_dinamico
-        df.loc[mes, "EBITDA"] = df.loc[mes, "Ingresos Totales"] + df.loc[mes, "Costos Operativos Dinámicos"]
-        df.loc[mes, "EBIT"] = df.loc[mes, "EBITDA"] - df.loc[mes, "Depreciacion"]
+
+    # Lotes e Inventario (etapas memoizadas: ventas y proyección operativa)
+    ventas = _etapa_ventas(s)
+    lotes_vendidos, cobros_pies, cobros_cuotas = ventas
+    col["Lotes Vendidos"][:] = lotes_vendidos
+    col["Lotes en Inventario"][:] = _inventario(s, lotes_vendidos)
+    col["Ingresos Ventas Pies"][:] = cobros_pies
+    col["Ingresos Ventas Cuotas"][:] = cobros_cuotas
+
+    otros_ingresos, costos = _etapa_operativa(s, ventas)
+    col["Otros Ingresos"][:] = otros_ingresos
+    col["Ingresos Totales"][1:] = cobros_pies[1:] + cobros_cuotas[1:] + otros_ingresos[1:]
+    col["Costos Operativos Dinámicos"][1:] = 0.0 - costos[1:]
+
+    col["EBITDA"][:] = col["Ingresos Totales"] + col["Costos Operativos Dinámicos"]
+    col["EBIT"][:] = col["EBITDA"] - col["Depreciacion"]
+
+    kpis = _completar_flujos(col, tasa_impuesto)
+    return bloque, kpis
+
+def _inventario(s, lotes_vendidos):
+    total_lotes = sum(plan.cantidad_lotes for plan in s.planes_venta)
+    return total_lotes - np.cumsum(lotes_vendidos)
+
+def _etapa_ventas(s):
+    """Etapa de ventas memoizada: (lotes_vendidos, cobros_pies, cobros_cuotas)."""
+    s.exigir("horizonte_meses")
+    return cache_etapas.obtener("ventas", _clave_ventas(s), lambda: _proyectar_ventas(s, s.horizonte_meses))
+
+def _etapa_operativa(s, ventas):
+    """Etapa de ítems periódicos memoizada a partir de la etapa de ventas: (otros_ingresos, costos)."""
+    s.exigir("horizonte_meses")
+    lotes_vendidos, cobros_pies, cobros_cuotas = ventas
+    return cache_etapas.obtener(
+        "operativo", _clave_operativa(s, _clave_ventas(s)),
+        lambda: _proyeccion_operativa(s, cobros_pies + cobros_cuotas, _inventario(s, lotes_vendidos), s.horizonte_meses),
+    )
+
+def _proyeccion_operativa(s, ingresos_ventas, inventario, horizonte):
+    """
+    Ítems periódicos de un escenario (misma lógica compilada que `_proyeccion_operativa_batch`).
+
+    Returns:
+      (otros_ingresos, costos_dinamicos): arrays de largo horizonte + 1; costos en positivo.
+    """
+    otros_ingresos, costos = _proyeccion_operativa_batch(
+        [s], np.asarray(ingresos_ventas)[None, :], np.asarray(inventario)[None, :], horizonte
+    )
+    return otros_ingresos[0], costos[0]
+
+def calcular_impuestos_con_perdidas(ebt, tasa_impuesto, meses_vencimiento=None, fraccion_max_uso=None):
+    """
+    Impuesto a la renta con pérdida arrastrable para una serie 1D o una matriz
+    escenarios x meses (el arrastre recorre el último eje).
+
+    Sin reglas adicionales la pérdida arrastrable sigue p_t = max(p_{t-1} - EBT_t, 0)
+    (recursión de Lindley), que tiene forma cerrada con la suma acumulada S_t de -EBT:
+    p_t = S_t - min(0, min_{k<=t} S_k); la base imponible es max(EBT_t - p_{t-1}, 0).
+
+    Parameters:
+      ebt: array (..., meses).
+      tasa_impuesto: escalar o una tasa por escenario (forma ebt.shape[:-1]).
+      meses_vencimiento: si se indica, la pérdida generada en el mes k sólo puede usarse
+        hasta el mes k + meses_vencimiento; se consume primero la más antigua.
+      fraccion_max_uso: si se indica, la pérdida puede compensar como máximo esa fracción
+        de la utilidad de cada mes.
+      Con cualquiera de las dos reglas el arrastre se recorre mes a mes (vectorizado sobre
+      escenarios) manteniendo la pérdida remanente por mes de origen.
+
+    Returns:
+      (impuestos, perdida_arrastrable): impuestos en negativo (salida de caja) y la pérdida
+      remanente al cierre de cada mes, ambos con la forma de `ebt`.
+    """
+    ebt = np.asarray(ebt, dtype=float)
+    tasa = np.asarray(tasa_impuesto, dtype=float)[..., None]
+
+    if meses_vencimiento is None and fraccion_max_uso is None:
+        acumulado = np.cumsum(-ebt, axis=-1)
+        perdida = acumulado - np.minimum(np.minimum.accumulate(acumulado, axis=-1), 0.0)
+        perdida_previa = np.concatenate([np.zeros(ebt.shape[:-1] + (1,)), perdida[..., :-1]], axis=-1)
+        base_imponible = np.maximum(ebt - perdida_previa, 0.0)
+    else:
+        n_meses = ebt.shape[-1]
+        capas = np.zeros(ebt.shape[:-1] + (n_meses,))  # pérdida remanente por mes de origen
+        base_imponible = np.zeros_like(ebt)
+        perdida = np.zeros_like(ebt)
+        for mes in range(n_meses):
+            if meses_vencimiento is not None and mes - meses_vencimiento - 1 >= 0:
+                capas[..., mes - meses_vencimiento - 1] = 0.0
+            utilidad = np.maximum(ebt[..., mes], 0.0)
+            tope = utilidad if fraccion_max_uso is None else utilidad * fraccion_max_uso
+            uso = np.minimum(capas.sum(axis=-1), tope)
+            # Consumo FIFO: cada capa aporta lo que falta después de las más antiguas
+            previas = np.cumsum(capas, axis=-1) - capas
+            capas -= np.clip(uso[..., None] - previas, 0.0, capas)
+            capas[..., mes] += np.maximum(-ebt[..., mes], 0.0)
+            base_imponible[..., mes] = utilidad - uso
+            perdida[..., mes] = capas.sum(axis=-1)
+
+    return 0.0 - base_imponible * tasa, perdida
+
+def _completar_flujos(col, tasa_impuesto):
+    """
+    Etapas 3 a 5 del modelo (impuestos, FCFF, FCFE y KPIs) a partir de EBIT, CAPEX y deuda.
+
+    `col` mapea nombre de columna -> array de forma (..., horizonte + 1); el mismo código
+    sirve para un escenario (1D) o para una matriz escenarios x meses (2D), en cuyo caso
+    `tasa_impuesto` puede ser un array con una tasa por escenario.
+    Escribe in-place en `col` y retorna los KPIs (escalares o arrays por escenario).
+    """
+    tasa_impuesto = np.asarray(tasa_impuesto, dtype=float)
+    tasa_col = tasa_impuesto[..., None]
 
     # --------------------------------------------------------------------------
     # 3. FLUJO DE CAJA DEL PROYECTO (UNLEVERAGED)
     # --------------------------------------------------------------------------
     # NOPAT = EBIT * (1 - T). Asumimos impuestos operativos teóricos sin deuda.
     # FCFF = NOPAT + Depreciacion + CAPEX
-    
+
     # Manejo de impuestos operativos negativos:
     # Si EBIT < 0, impuesto operativo es 0 (o crédito fiscal si se asume simetría perfecta).
     # Para ser conservador y estándar: Impuesto Operativo = max(0, EBIT) * T
-    df["Impuestos Operativos (Teóricos)"] = df["EBIT"].apply(lambda x: -x * tasa_impuesto if x > 0 else 0)
-    df["NOPAT"] = df["EBIT"] + df["Impuestos Operativos (Teóricos)"] 
-    df["FCF Operativo"] = df["NOPAT"] + df["Depreciacion"] # (+/- Variación Capital de Trabajo si existiera)
-    
+    ebit = col["EBIT"]
+    col["Impuestos Operativos (Teóricos)"][:] = 0.0 - np.maximum(ebit, 0.0) * tasa_col
+    col["NOPAT"][:] = ebit + col["Impuestos Operativos (Teóricos)"]
+    col["FCF Operativo"][:] = col["NOPAT"] + col["Depreciacion"] # (+/- Variación Capital de Trabajo si existiera)
+
     # FCFF incluye todos los periodos (t=0 también, donde EBIT=0, pero CAPEX != 0)
-    df["FCF No Apalancado (FCFF)"] = df["FCF Operativo"] + df["CAPEX"]
+    col["FCF No Apalancado (FCFF)"][:] = col["FCF Operativo"] + col["CAPEX"]
 
     # --------------------------------------------------------------------------
     # 4. FLUJO DE CAJA DEL INVERSIONISTA (LEVERAGED)
     # --------------------------------------------------------------------------
     # P&L Real (con Intereses) para impuestos reales
-    df["EBT"] = df["EBIT"] - df["Intereses"]
-    
-    # Cálculo de impuestos reales con pérdida arrastrable
-    impuestos_reales = []
-    p_arrastrable = 0.0
-    
-    for val_ebt in df["EBT"]:
-        if val_ebt < 0:
-            p_arrastrable += abs(val_ebt)
-            impuestos_reales.append(0.0)
-        else:
-            uso = min(val_ebt, p_arrastrable)
-            p_arrastrable -= uso
-            base = val_ebt - uso
-            impuestos_reales.append(-base * tasa_impuesto)
-            
-    df["Impuestos Reales"] = impuestos_reales
-    df["Utilidad Neta"] = df["EBT"] + df["Impuestos Reales"]
-    
-    # Derivación FCFE desde FCFF (Método Estándar Robusto)
-    # FCFE = FCFF - Intereses*(1-T) - Amortización + Deuda Nueva
-    
-    # Ahorro Fiscal de Intereses (Tax Shield)
-    # OJO: La fórmula FCFF - Int(1-t) asume que la empresa paga impuestos operativos y recupera el escudo.
-    # Si usamos los impuestos reales calculados arriba, es más exacto hacer:
-    # FCFE = Utilidad Neta + Depreciacion + CAPEX + Amortizacion + Deuda Nueva - VariacionCapitalTrabajo
-    # Validemos contra la fórmula pedida:
-    # FCFE request: FCFF - Int(1-T) - Amort + Deuda
-    
-    # Calculamos el Escudo Fiscal REAL que se usó (diferencia entre impuesto operativo y real no es solo intereses, es p.arrastrable)
-    # Para consistencia absoluta con el P&L, usaremos el método directo desde la Utilidad Neta, 
-    # que es matemáticamente equivalente pero evita errores de escudo fiscal teórico vs real.
-    
+    ebt = col["EBT"]
+    ebt[:] = ebit - col["Intereses"]
+
+    # Cálculo de impuestos reales con pérdida arrastrable (kernel común 1D / 2D)
+    impuestos_reales = col["Impuestos Reales"]
+    impuestos_reales[:], _ = calcular_impuestos_con_perdidas(ebt, tasa_impuesto)
+
+    col["Utilidad Neta"][:] = ebt + impuestos_reales
+
+    # Derivación FCFE: se usa el método directo desde la Utilidad Neta (impuestos reales
+    # con pérdida arrastrable), matemáticamente equivalente a FCFF - Int(1-T) - Amort + Deuda
+    # pero sin errores de escudo fiscal teórico vs real.
     # FCFE = Utilidad Neta + Depreciacion + CAPEX + (Entrada Deuda + Amortización Principal)
     # Nota: Amortización Principal ya es negativa.
-    
-    df["Net Debt Cashflow"] = df["Entrada Deuda"] + df["Amortización Principal"]
-    
-    # Método "Directo" (Más seguro para P&L complejo):
-    df["FCF Apalancado (FCFE)"] = (
-        df["Utilidad Neta"] + 
-        df["Depreciacion"] + 
-        df["CAPEX"] + 
-        df["Net Debt Cashflow"]
+    col["Net Debt Cashflow"][:] = col["Entrada Deuda"] + col["Amortización Principal"]
+    col["FCF Apalancado (FCFE)"][:] = (
+        col["Utilidad Neta"] +
+        col["Depreciacion"] +
+        col["CAPEX"] +
+        col["Net Debt Cashflow"]
     )
-    
-    # Nota: En t=0, Utilidad=0, Dep=0. FCFE_0 = CAPEX_0 + Deuda_0. 
+
+    # Nota: En t=0, Utilidad=0, Dep=0. FCFE_0 = CAPEX_0 + Deuda_0.
     # Si CAPEX=-100 y Deuda=60 -> FCFE = -40 (Equity Injection). Correcto.
-    
-    # "Flujo Caja Neto Inversionista" es simplemente alias de FCFE para el GUI
-    # Las aportaciones de capital negativas YA ESTÁN INCLUIDAS en FCFE cuando es negativo.
-    # No necesitamos columna separada "Aportación Capital" forzada, salvo para visualización.
-    df["Flujo Caja Neto Inversionista"] = df["FCF Apalancado (FCFE)"]
-    
-    # Para visualización en GUI, podemos extraer los negativos como "Aportación"
-    df["Aportación Capital"] = df["FCF Apalancado (FCFE)"].apply(lambda x: -x if x < 0 else 0)
+
+    # "Flujo Caja Neto Inversionista" es simplemente alias de FCFE para el GUI.
+    # Las aportaciones de capital (FCFE negativo) se extraen sólo para visualización.
+    fcfe = col["FCF Apalancado (FCFE)"]
+    col["Flujo Caja Neto Inversionista"][:] = fcfe
+    col["Aportación Capital"][:] = np.where(fcfe < 0, -fcfe, 0.0)
 
     # --------------------------------------------------------------------------
     # 5. KPIS SIMPLES
     # --------------------------------------------------------------------------
-    # ROI Estático (basado en inversión inicial total o equity sumado)
-    total_capex = abs(df["CAPEX"].sum())
-    df.attrs["roi_estatico"] = (df["Utilidad Neta"].sum() / total_capex) if total_capex != 0 else 0
-    
-    # Múltiplo sobre Equity (MOIC)
-    # Suma de flujos positivos / Suma de flujos negativos (en abs)
-    f_pos = df[df["FCF Apalancado (FCFE)"] > 0]["FCF Apalancado (FCFE)"].sum()
-    f_neg = abs(df[df["FCF Apalancado (FCFE)"] < 0]["FCF Apalancado (FCFE)"].sum())
-    
-    df.attrs["multiplo_capital"] = (f_pos / f_neg) if f_neg > 0 else np.nan
+    with np.errstate(divide="ignore", invalid="ignore"):
+        # ROI Estático (basado en inversión inicial total o equity sumado)
+        total_capex = np.abs(col["CAPEX"].sum(axis=-1))
+        roi_estatico = np.where(total_capex != 0, col["Utilidad Neta"].sum(axis=-1) / total_capex, 0.0)
+
+        # Múltiplo sobre Equity (MOIC)
+        # Suma de flujos positivos / Suma de flujos negativos (en abs)
+        f_pos = np.where(fcfe > 0, fcfe, 0.0).sum(axis=-1)
+        f_neg = np.abs(np.where(fcfe < 0, fcfe, 0.0).sum(axis=-1))
+        multiplo_capital = np.where(f_neg > 0, f_pos / f_neg, np.nan)
+        # ROI Total acumulado del inversionista = MOIC - 1 (0 si no hubo aportes)
+        roi_total = np.where(f_neg > 0, multiplo_capital - 1, 0.0)
+
+    return {"roi_estatico": roi_estatico[()], "multiplo_capital": multiplo_capital[()], "roi_total": roi_total[()]}
+
+# Columnas que ResultadoModelo no guarda: se derivan al pedirlas con las mismas
+# operaciones (y en el mismo orden) que `_calcular_bloque_modelo` / `_completar_flujos`
+_COLUMNAS_DERIVADAS = {
+    "EBITDA": lambda c: c("Ingresos Totales") + c("Costos Operativos Dinámicos"),
+    "EBIT": lambda c: c("EBITDA") - c("Depreciacion"),
+    "NOPAT": lambda c: c("EBIT") + c("Impuestos Operativos (Teóricos)"),
+    "FCF Operativo": lambda c: c("NOPAT") + c("Depreciacion"),
+    "EBT": lambda c: c("EBIT") - c("Intereses"),
+    "Utilidad Neta": lambda c: c("EBT") + c("Impuestos Reales"),
+    "Net Debt Cashflow": lambda c: c("Entrada Deuda") + c("Amortización Principal"),
+    "Flujo Caja Neto Inversionista": lambda c: c("FCF Apalancado (FCFE)").copy(),
+    "Aportación Capital": lambda c: np.where(c("FCF Apalancado (FCFE)") < 0, -c("FCF Apalancado (FCFE)"), 0.0),
+}
+COLUMNAS_ALMACENADAS = [nombre for nombre in COLUMNAS_MODELO if nombre not in _COLUMNAS_DERIVADAS]
+IDX_ALMACENADA = {nombre: i for i, nombre in enumerate(COLUMNAS_ALMACENADAS)}
+_FILAS_ALMACENADAS = [IDX_COLUMNA[nombre] for nombre in COLUMNAS_ALMACENADAS]
+
+class ResultadoModelo:
+    """
+    Resultado compacto del modelo (ver `evaluar_proyecto`): sólo NumPy, sin DataFrame.
+
+    Guarda un único bloque contiguo de sólo lectura con las columnas que no se pueden
+    derivar (COLUMNAS_ALMACENADAS) y los KPIs ya calculados. Las columnas nulas en todo
+    el horizonte (Depreciacion, deuda en proyectos sin deuda, ...) no ocupan fila. Las
+    columnas derivadas y el DataFrame completo se construyen sólo cuando se piden.
+
+    Attributes:
+      bloque: array float64 (columnas no nulas, horizonte + 1), en el orden de
+        COLUMNAS_ALMACENADAS.
+      kpis: dict de escalares: roi_estatico, roi_total y multiplo_capital siempre; con
+        métricas además inversion_total, total_intereses, wacc, van_proyecto, tir_proyecto,
+        van_inversionista, tir_inversionista, payback_normal y payback_descontado
+        (las TIR y los paybacks pueden ser None).
+    """
+
+    __slots__ = ("bloque", "kpis", "_filas")
+
+    def __init__(self, bloque, kpis, filas):
+        bloque.setflags(write=False)
+        self.bloque = bloque
+        self.kpis = kpis
+        self._filas = filas  # fila en `bloque` de cada COLUMNAS_ALMACENADAS; -1 si es nula
+
+    @classmethod
+    def desde_bloque_modelo(cls, bloque_modelo, kpis):
+        """Compacta un bloque (len(COLUMNAS_MODELO), horizonte + 1) de `_calcular_bloque_modelo`."""
+        almacenadas = bloque_modelo[_FILAS_ALMACENADAS]
+        no_nulas = almacenadas.any(axis=1)
+        filas = np.where(no_nulas, np.cumsum(no_nulas) - 1, -1).astype(np.int8)
+        return cls(np.ascontiguousarray(almacenadas[no_nulas]), kpis, filas)
+
+    def column(self, nombre):
+        """Columna `nombre` de COLUMNAS_MODELO: vista de sólo lectura si está guardada, si no se deriva."""
+        i = IDX_ALMACENADA.get(nombre)
+        if i is not None:
+            fila = self._filas[i]
+            return self.bloque[fila] if fila >= 0 else np.zeros(self.bloque.shape[1])
+        if nombre not in _COLUMNAS_DERIVADAS:
+            raise KeyError(nombre)
+        return _COLUMNAS_DERIVADAS[nombre](self.column)
+
+    @property
+    def fcff(self):
+        return self.column("FCF No Apalancado (FCFF)")
+
+    @property
+    def fcfe(self):
+        return self.column("FCF Apalancado (FCFE)")
+
+    @property
+    def nbytes(self):
+        return self.bloque.nbytes + self._filas.nbytes
+
+    def to_frame(self):
+        """DataFrame con todas las COLUMNAS_MODELO (copia independiente); KPIs en `df.attrs`."""
+        df = pd.DataFrame({nombre: self.column(nombre) for nombre in COLUMNAS_MODELO})
+        df.attrs.update(self.kpis)
+        return df
+
+def evaluar_proyecto(p, monto_deuda=None, capex=None, tabla_amortizacion=None, metricas=True):
+    """
+    Camino headless del modelo: flujos y KPIs de un proyecto usando sólo NumPy.
+
+    Las etapas de CAPEX y deuda salen de `cache_etapas` como arrays (sin pasar por
+    `construir_cronograma_inversiones` ni `crear_tabla_amortizacion`), el modelo se
+    calcula sobre un único bloque y no se construye ningún objeto pandas.
+
+    Parameters:
+      monto_deuda: por defecto p["financiamiento"]["monto_deuda"].
+      capex, tabla_amortizacion: opcionales, para reutilizar cronogramas ya construidos
+        (Serie/DataFrame por mes o arrays desde t=0).
+      metricas: si es False se omiten VAN, TIR, WACC y paybacks.
+
+    Returns:
+      ResultadoModelo
+
+    Raises:
+      ParametrosInvalidos: si `p` no compila o le falta un campo que el modelo usa.
+    """
+    s = compilar_proyecto(p)
+    if monto_deuda is None:
+        monto_deuda = s.exigir("financiamiento.monto_deuda").financiamiento.monto_deuda
+    if capex is None:
+        capex = _etapa_capex(s)
+    if tabla_amortizacion is None:
+        tabla_amortizacion = dict(zip(COLUMNAS_AMORTIZACION, _etapa_amortizacion(s, monto_deuda)))
+
+    bloque, kpis = _calcular_bloque_modelo(s, capex, tabla_amortizacion, monto_deuda)
+    if not metricas:
+        return ResultadoModelo.desde_bloque_modelo(bloque, {clave: float(valor) for clave, valor in kpis.items()})
+
+    s.exigir("financiamiento.costo_deuda_anual", "financiamiento.costo_capital_propio_anual")
+    fcff = bloque[IDX_COLUMNA["FCF No Apalancado (FCFF)"]]
+    fcfe = bloque[IDX_COLUMNA["FCF Apalancado (FCFE)"]]
+    ke = s.financiamiento.costo_capital_propio_anual
+    inversion_total = s.inversion_total
+    porcentaje_deuda = monto_deuda / inversion_total if inversion_total > 0 else 0
+    wacc = _wacc(s.financiamiento, porcentaje_deuda)
+
+    kpis.update(
+        inversion_total=inversion_total,
+        total_intereses=_a_vector_mensual(tabla_amortizacion["Interés"], s.horizonte_meses).sum(),
+        wacc=wacc,
+        van_proyecto=VAN(fcff, wacc),
+        tir_proyecto=TIR_anual(fcff),
+        van_inversionista=VAN(fcfe, ke),
+        tir_inversionista=TIR_anual(fcfe),
+        payback_normal=payback_normal(fcfe),
+        payback_descontado=payback_descontado(fcfe, wacc),
+    )
+    return ResultadoModelo.desde_bloque_modelo(
+        bloque, {clave: None if valor is None else float(valor) for clave, valor in kpis.items()}
+    )
+
+def calcular_flujos_modelo(p, capex, tabla_amortizacion, monto_deuda_total,
+                           columnas=("FCF No Apalancado (FCFF)", "FCF Apalancado (FCFE)")):
+    """
+    Corre el modelo sin construir el DataFrame y retorna sólo las columnas pedidas.
+
+    Returns:
+      dict {nombre_columna: np.ndarray} con arrays de largo horizonte + 1.
+    """
+    bloque, _ = _calcular_bloque_modelo(
+        compilar_proyecto(p), capex, _tabla_o_sin_deuda(tabla_amortizacion), monto_deuda_total
+    )
+    return {nombre: bloque[IDX_COLUMNA[nombre]] for nombre in columnas}
+
+def generar_modelo_financiero_detallado(p, capex, tabla_amortizacion, monto_deuda_total):
+    """
+    Genera el modelo financiero detallado con estricta separación de flujos
+    de PROYECTO (No Apalancado) vs INVERSIONISTA (Apalancado).
     
-    return df
+    Reglas de Negocio:
+    1. FCFF (Proyecto) = NOPAT + Depreciacion + CAPEX (+/- WK).
+       - NOPAT usa Impuestos Operativos (asumiendo deuda=0).
+       - Excluye intereses y amortización.
+    2. FCFE (Inversionista) = FCFF - Intereses*(1-T) - Amortización + Nueva Deuda.
+       - Refleja el flujo neto real para el accionista.
+    3. t=0: Se maneja explícitamente. Si (CAPEX_0 + Deuda_0) < 0, es aporte de equity.
+
+    Adaptador sobre `evaluar_proyecto` (camino NumPy): el DataFrame se materializa una
+    sola vez al final con `ResultadoModelo.to_frame()`. KPIs en `df.attrs`.
+    Con tabla_amortizacion=None el modelo no tiene intereses ni amortizaciones.
+    """
+    return evaluar_proyecto(p, monto_deuda_total, capex, _tabla_o_sin_deuda(tabla_amortizacion),
+                            metricas=False).to_frame()
+
+
+# ------------------------------------------------------------------------------
+# 3.1 EVALUACIÓN POR LOTES (ESCENARIOS x MESES)
+# ------------------------------------------------------------------------------
+
+# Las funciones de esta sección reciben proyectos ya compilados (ProyectoCompilado).
+
+def _capex_batch(lista_params, horizonte):
+    """Matriz (N, horizonte + 1) de CAPEX positivo por escenario."""
+    capex = np.zeros((len(lista_params), horizonte + 1))
+    for i, s in enumerate(lista_params):
+        for evento in s.inversiones:
+            if evento.mes > horizonte:
+                break  # inversiones ordenadas por mes
+            capex[i, evento.mes] += evento.monto
+    return capex
+
+def _amortizacion_batch(lista_params, montos_deuda, horizonte):
+    """
+    Sistema alemán para N préstamos a la vez (ver `calcular_amortizacion_batch`).
+
+    Returns:
+      (interes, principal, saldo_pendiente): matrices (N, horizonte + 1), t=0 en cero.
+    """
+    fin = [s.financiamiento for s in lista_params]
+    cubo = calcular_amortizacion_batch(
+        montos_deuda,
+        [f.costo_deuda_anual for f in fin],
+        [f.plazo_deuda_meses for f in fin],
+        [int(f.capitalizacion) for f in fin],
+        horizonte,
+    )
+    return cubo[1], cubo[2], cubo[3]
+
+def _proyectar_ventas_batch(lista_params, horizonte, velocidades=None, crecimientos=None):
+    """
+    Versión multi-escenario de `_proyectar_ventas`: todos los planes de todos los
+    escenarios se proyectan juntos; los cobros de cuotas se agrupan por núcleo
+    (desfase, cantidad de cuotas, frecuencia) y se resuelven con un producto matricial.
+
+    velocidades, crecimientos: opcionales, reemplazan la velocidad de cada plan (array con
+    un valor por plan, en el orden escenario -> plan) y el crecimiento de precio de cada
+    escenario (N,), sin construir un proyecto por muestra (ver `simular_monte_carlo`).
+
+    Returns:
+      (lotes_vendidos, cobros_pies, cobros_cuotas, total_lotes): matrices (N, horizonte + 1)
+      y vector (N,) de lotes iniciales.
+    """
+    n = len(lista_params)
+    lotes_vendidos = np.zeros((n, horizonte + 1))
+    cobros_pies = np.zeros((n, horizonte + 1))
+    cobros_cuotas = np.zeros((n, horizonte + 1))
+    total_lotes = np.zeros(n)
+
+    planes = [(i, plan) for i, s in enumerate(lista_params) for plan in s.planes_venta]
+    if not planes or horizonte < 1:
+        for i, plan in planes:
+            total_lotes[i] += plan.cantidad_lotes
+        return lotes_vendidos, cobros_pies, cobros_cuotas, total_lotes
+
+    escenario = np.array([i for i, _ in planes])
+    cantidad = np.array([plan.cantidad_lotes for _, plan in planes], dtype=float)
+    programado = np.array([plan.tipo == TipoPlan.PROGRAMADO for _, plan in planes])
+    mes_inicio = np.array([plan.mes_inicio for _, plan in planes])
+    if velocidades is None:
+        velocidad = np.array([plan.velocidad for _, plan in planes], dtype=float)
+    else:
+        velocidad = np.asarray(velocidades, dtype=float).ravel()
+    velocidad = np.where(programado, 0.0, velocidad)
+    np.add.at(total_lotes, escenario, cantidad)
+
+    meses = np.arange(horizonte + 1)
+    if crecimientos is None:
+        crecimiento = np.array([s.crecimiento_precio_anual for s in lista_params])
+    else:
+        crecimiento = np.asarray(crecimientos, dtype=float)
+    factor_precio = (1 + crecimiento[:, None]) ** ((meses - 1) / 12.0)
+    factor_plan = factor_precio[escenario]
+
+    # Lotes vendidos por plan (P, horizonte + 1)
+    restantes = np.maximum(cantidad[:, None] - velocidad[:, None] * np.arange(horizonte), 0)
+    dinamico = np.minimum(velocidad[:, None], restantes)
+    en_bloque = np.where(meses[1:] == mes_inicio[:, None], cantidad[:, None], 0.0)
+    vendidos = np.zeros((len(planes), horizonte + 1))
+    vendidos[:, 1:] = np.where(programado[:, None], en_bloque, dinamico)
+    vendidos[cantidad <= 0] = 0.0
+    np.add.at(lotes_vendidos, escenario, vendidos)
+
+    monto_pie = np.array([plan.monto_pie for _, plan in planes], dtype=float)
+    np.add.at(cobros_pies, escenario, (monto_pie[:, None] * factor_plan) * vendidos)
+
+    # Cobros de cuotas: convolución como producto con una matriz de Toeplitz por núcleo
+    monto_cuota = np.array([plan.monto_cuota for _, plan in planes], dtype=float)
+    ventas_valorizadas = vendidos * (monto_cuota[:, None] * factor_plan)
+    grupos = {}
+    for k, (_, plan) in enumerate(planes):
+        firma = (plan.tipo, plan.cantidad_cuotas, plan.frecuencia)
+        grupos.setdefault(firma, []).append(k)
+    desplazamiento = meses[None, :] - meses[:, None]
+    for k_grupo in grupos.values():
+        kernel = _kernel_cuotas(planes[k_grupo[0]][1], horizonte)
+        if kernel.size == 0:
+            continue
+        valido = (desplazamiento >= 0) & (desplazamiento < kernel.size)
+        toeplitz = np.where(valido, kernel[np.clip(desplazamiento, 0, kernel.size - 1)], 0.0)
+        np.add.at(cobros_cuotas, escenario[k_grupo], ventas_valorizadas[k_grupo] @ toeplitz)
+
+    return lotes_vendidos, cobros_pies, cobros_cuotas, total_lotes
+
+def _compilar_items_periodicos(listas_items, horizonte, escalas=None):
+    """
+    Compila los ítems periódicos de N escenarios en máscaras de actividad por base de cálculo.
+
+    Los gastos "% Utilidad" dependen del EBITDA neto de los costos anteriores a ellos, así
+    que cada uno corta la lista en tramos: el tramo s suma linealmente todos los gastos
+    ubicados antes del s-ésimo "% Utilidad" (y después del anterior), y `utilidad[:, s]`
+    es el porcentaje de ese ítem. Todos los ítems se cargan juntos con np.add.at.
+
+    escalas: opcional, multiplicador del monto de cada ítem (array con un valor por ítem,
+      en el orden escenario -> ítem).
+
+    Returns:
+      dict con "otros_ingresos" (N, horizonte + 1) y "fijo", "pct_ventas", "por_lote",
+      "pct_utilidad" de forma (N, tramos, horizonte + 1); los porcentajes ya en fracción.
+    """
+    n = len(listas_items)
+    filas = []
+    for i, items in enumerate(listas_items):
+        tramo = 0
+        for item in items:
+            filas.append((i, tramo, item.tipo, item.base_calculo, item.monto, item.mes_inicio, item.mes_fin))
+            if item.tipo == TipoItem.GASTO and item.base_calculo == BaseCalculo.PCT_UTILIDAD:
+                tramo += 1
+    n_tramos = 1 + max((f[1] + (f[2] == TipoItem.GASTO and f[3] == BaseCalculo.PCT_UTILIDAD) for f in filas), default=0)
+
+    meses = np.arange(horizonte + 1)
+    compilado = {"otros_ingresos": np.zeros((n, horizonte + 1))}
+    for nombre in ("fijo", "pct_ventas", "por_lote", "pct_utilidad"):
+        compilado[nombre] = np.zeros((n, n_tramos, horizonte + 1))
+    if not filas:
+        return compilado
+
+    escenario, tramo, tipo, base, monto, mes_inicio, mes_fin = (np.array(c) for c in zip(*filas))
+    tipo, base, monto = tipo.astype(np.int8), base.astype(np.int8), monto.astype(float)
+    if escalas is not None:
+        monto = monto * np.asarray(escalas, dtype=float).ravel()
+    activo = (meses >= 1) & (meses >= mes_inicio[:, None]) & (meses <= mes_fin[:, None])
+    valor = np.where(activo, monto[:, None], 0.0)
+
+    ingreso = tipo == TipoItem.INGRESO
+    np.add.at(compilado["otros_ingresos"], escenario[ingreso], valor[ingreso])
+    gasto = tipo == TipoItem.GASTO
+    for nombre, codigo, escala in (("fijo", BaseCalculo.MONTO_FIJO, 1.0), ("pct_ventas", BaseCalculo.PCT_VENTAS, 0.01),
+                                   ("por_lote", BaseCalculo.POR_LOTE, 1.0), ("pct_utilidad", BaseCalculo.PCT_UTILIDAD, 0.01)):
+        sel = gasto & (base == codigo)
+        np.add.at(compilado[nombre], (escenario[sel], tramo[sel]), valor[sel] * escala)
+    return compilado
+
+def _proyeccion_operativa_batch(lista_params, ingresos_ventas, inventario, horizonte, escalas_items=None):
+    """
+    Ítems periódicos para N escenarios sobre los ítems compilados (ver
+    `_compilar_items_periodicos`): cada base de cálculo se aplica a la matriz completa de
+    meses y escenarios, y los "% Utilidad" se aplican en orden, uno por tramo.
+
+    Returns:
+      (otros_ingresos, costos_dinamicos): matrices (N, horizonte + 1); costos en positivo.
+    """
+    compilado = _compilar_items_periodicos([s.items_periodicos for s in lista_params], horizonte, escalas_items)
+    otros_ingresos = compilado["otros_ingresos"]
+    ingresos_totales = ingresos_ventas + otros_ingresos
+
+    costos = np.zeros_like(ingresos_totales)
+    for s in range(compilado["fijo"].shape[1]):
+        costos += (
+            compilado["fijo"][:, s]
+            + ingresos_totales * compilado["pct_ventas"][:, s]
+            + inventario * compilado["por_lote"][:, s]
+        )
+        costos += np.maximum(0, ingresos_totales - costos) * compilado["pct_utilidad"][:, s]
+    return otros_ingresos, costos
+
+def generar_modelo_financiero_batch(lista_params, montos_deuda=None):
+    """
+    Evalúa N escenarios con el mismo horizonte en una sola pasada vectorizada.
+
+    Equivale a correr `construir_cronograma_inversiones` -> `crear_tabla_amortizacion`
+    -> `generar_modelo_financiero_detallado` para cada escenario, pero cada línea del
+    flujo de caja se calcula como una matriz (N, horizonte + 1). Las partes que dependen
+    del orden temporal (inventario, pérdida arrastrable) se resuelven sobre el eje de escenarios.
+
+    Parameters:
+      lista_params: secuencia de diccionarios de parámetros o de proyectos compilados
+        (mismo `horizonte_meses`); cada escenario se compila una vez al entrar.
+      montos_deuda: monto de deuda por escenario; por defecto `financiamiento.monto_deuda`.
+
+    Returns:
+      (columnas, kpis): columnas mapea cada nombre de COLUMNAS_MODELO a una matriz
+      (N, horizonte + 1); kpis mapea "roi_estatico", "multiplo_capital" y "roi_total" a arrays (N,).
+    """
+    campos = ["horizonte_meses", "financiamiento.tasa_impuesto_renta", *_CAMPOS_DEUDA]
+    if montos_deuda is None:
+        campos.append("financiamiento.monto_deuda")
+    lista_params = [compilar_proyecto(p).exigir(*campos) for p in lista_params]
+    if not lista_params:
+        raise ValueError("Se requiere al menos un escenario")
+    horizontes = {s.horizonte_meses for s in lista_params}
+    if len(horizontes) != 1:
+        raise ValueError(f"Todos los escenarios deben compartir horizonte_meses (recibido: {sorted(horizontes)})")
+    horizonte = horizontes.pop()
+    if montos_deuda is None:
+        montos_deuda = [s.financiamiento.monto_deuda for s in lista_params]
+    montos_deuda = np.asarray(montos_deuda, dtype=float)
+    tasa_impuesto = np.array([s.financiamiento.tasa_impuesto_renta for s in lista_params], dtype=float)
+
+    # Cada etapa se resuelve por clave distinta (caché + deduplicación entre escenarios)
+    def subconjunto(indices):
+        return [lista_params[i] for i in indices]
+
+    (capex,) = _etapa_por_escenario(
+        "capex_lote", [_clave_capex(s) for s in lista_params],
+        lambda idx: (_capex_batch(subconjunto(idx), horizonte),),
+    )
+    deuda = _etapa_por_escenario(
+        "amortizacion_lote", [_clave_amortizacion(s, m) for s, m in zip(lista_params, montos_deuda)],
+        lambda idx: _amortizacion_batch(subconjunto(idx), montos_deuda[idx], horizonte),
+    )
+
+    claves_ventas = [_clave_ventas(s) for s in lista_params]
+    lotes_vendidos, cobros_pies, cobros_cuotas, total_lotes = _etapa_por_escenario(
+        "ventas_lote", claves_ventas, lambda idx: _proyectar_ventas_batch(subconjunto(idx), horizonte)
+    )
+    ventas = (lotes_vendidos, cobros_pies, cobros_cuotas, total_lotes[:, None] - np.cumsum(lotes_vendidos, axis=1))
+
+    ingresos_ventas = cobros_pies + cobros_cuotas
+    operativo = _etapa_por_escenario(
+        "operativo_lote", [_clave_operativa(s, c) for s, c in zip(lista_params, claves_ventas)],
+        lambda idx: _proyeccion_operativa_batch(subconjunto(idx), ingresos_ventas[idx], ventas[3][idx], horizonte),
+    )
+    return _ensamblar_bloque_batch(montos_deuda, tasa_impuesto, capex, deuda, ventas, operativo)
+
+def _ensamblar_bloque_batch(montos_deuda, tasa_impuesto, capex, deuda, ventas, operativo):
+    """
+    Arma las columnas del modelo para N escenarios a partir de las etapas ya resueltas y
+    completa impuestos, flujos y KPIs (ver `_completar_flujos`).
+
+    Parameters:
+      montos_deuda, tasa_impuesto: arrays (N,).
+      capex: (N, horizonte + 1) en positivo.
+      deuda: (interes, principal, saldo_pendiente) como `_amortizacion_batch`.
+      ventas: (lotes_vendidos, cobros_pies, cobros_cuotas, lotes_en_inventario).
+      operativo: (otros_ingresos, costos) como `_proyeccion_operativa_batch`.
+
+    Returns:
+      (columnas, kpis) como `generar_modelo_financiero_batch`.
+    """
+    n, meses = capex.shape
+    bloque = np.zeros((len(COLUMNAS_MODELO), n, meses))
+    col = {nombre: bloque[i] for nombre, i in IDX_COLUMNA.items()}
+
+    col["CAPEX"][:] = -capex
+    interes, principal, saldo = deuda
+    col["Intereses"][:] = interes
+    col["Amortización Principal"][:] = -principal
+    col["Saldo Deuda"][:] = saldo
+    col["Entrada Deuda"][:, 0] = montos_deuda
+
+    lotes_vendidos, cobros_pies, cobros_cuotas, inventario = ventas
+    col["Lotes Vendidos"][:] = lotes_vendidos
+    col["Lotes en Inventario"][:] = inventario
+    col["Ingresos Ventas Pies"][:] = cobros_pies
+    col["Ingresos Ventas Cuotas"][:] = cobros_cuotas
+
+    otros_ingresos, costos = operativo
+    col["Otros Ingresos"][:] = otros_ingresos
+    col["Ingresos Totales"][:] = cobros_pies + cobros_cuotas + otros_ingresos
+    col["Costos Operativos Dinámicos"][:, 1:] = -costos[:, 1:]
+    col["EBITDA"][:] = col["Ingresos Totales"] + col["Costos Operativos Dinámicos"]
+    col["EBIT"][:] = col["EBITDA"] - col["Depreciacion"]
+
+    kpis = _completar_flujos(col, tasa_impuesto)
+    return col, kpis
 
 
 # ==============================================================================
 # 4. FUNCIONES DE MÉTRICAS FINANCIERAS
 # ==============================================================================
 
+# log del menor denominador (1 + r)**t representable; por debajo se considera nulo
+_LOG_DENOM_MIN = np.log(np.finfo(float).tiny)
+
+def _npv_bloque(F, r):
+    """Núcleo de `_npv_matriz` sobre F 2D (flujos x meses) y r 1D; retorna (flujos x tasas)."""
+    n_flujos, n_meses = F.shape
+    if n_meses == 0:
+        return np.zeros((n_flujos, r.size))
+    t = np.arange(n_meses)
+
+    base = 1.0 + r
+    valida = base > 0
+    with np.errstate(divide="ignore", over="ignore", invalid="ignore", under="ignore"):
+        log_denom = t[:, None] * np.log1p(np.where(valida, r, 0.0))[None, :]
+        anulado = log_denom < _LOG_DENOM_MIN
+        descuento = np.where(anulado, 0.0, np.exp(-log_denom))
+        valores = F @ descuento
+
+        # Primer mes con denominador nulo por tasa y siguiente flujo no nulo desde ese mes
+        mes_anulado = np.where(anulado.any(axis=0), np.argmax(anulado, axis=0), n_meses)
+        indice_no_nulo = np.where(F != 0, t, n_meses)
+        siguiente_no_nulo = np.minimum.accumulate(indice_no_nulo[:, ::-1], axis=1)[:, ::-1]
+        siguiente_no_nulo = np.hstack([siguiente_no_nulo, np.full((n_flujos, 1), n_meses)])
+        primero = siguiente_no_nulo[:, mes_anulado]
+        F_ext = np.hstack([F, np.zeros((n_flujos, 1))])
+        signo = F_ext[np.arange(n_flujos)[:, None], primero]
+        valores = np.where(primero < n_meses, np.copysign(np.inf, signo), valores)
+        valores[:, ~valida] = np.inf
+    return valores
+
+def _npv_filas(F, r):
+    """
+    Como `_npv_bloque` pero emparejando cada fila de F (flujos x meses) con su propia tasa
+    mensual r[i], con los mismos casos límite; retorna (n_filas,).
+    """
+    n_filas, n_meses = F.shape
+    if n_meses == 0:
+        return np.zeros(n_filas)
+    t = np.arange(n_meses)
+
+    valida = 1.0 + r > 0
+    with np.errstate(divide="ignore", over="ignore", invalid="ignore", under="ignore"):
+        log_denom = np.log1p(np.where(valida, r, 0.0))[:, None] * t
+        anulado = log_denom < _LOG_DENOM_MIN
+        valores = np.einsum("ij,ij->i", F, np.where(anulado, 0.0, np.exp(-log_denom)))
+
+        # Sólo las filas con denominador nulo (r cercano a -1) necesitan el signo del flujo
+        con_anulado = np.flatnonzero(anulado[:, -1])
+        if con_anulado.size:
+            Fa = F[con_anulado]
+            mes_anulado = np.argmax(anulado[con_anulado], axis=1)
+            indice_no_nulo = np.where(Fa != 0, t, n_meses)
+            siguiente_no_nulo = np.minimum.accumulate(indice_no_nulo[:, ::-1], axis=1)[:, ::-1]
+            primero = siguiente_no_nulo[np.arange(con_anulado.size), mes_anulado]
+            hay_flujo = primero < n_meses
+            signo = Fa[np.arange(con_anulado.size), np.minimum(primero, n_meses - 1)]
+            valores[con_anulado[hay_flujo]] = np.copysign(np.inf, signo[hay_flujo])
+    return np.where(valida, valores, np.inf)
+
+def _npv_matriz(flujos, tasas):
+    """
+    Kernel de NPV: evalúa muchos flujos contra muchas tasas mensuales en una operación.
+
+    Los factores de descuento se arman en espacio logarítmico, (1 + r)**-t = exp(-t * log1p(r)),
+    como una matriz (meses x tasas) y el NPV es un producto matricial. Los casos límite se
+    resuelven con máscaras explícitas (misma convención histórica de `_npv_at_rate`):
+      - 1 + r <= 0: NPV = +inf.
+      - (1 + r)**t se anula por underflow (r cercano a -1): NPV = ±inf según el signo del
+        primer flujo no nulo desde ese mes.
+      - (1 + r)**t desborda (r grande): el término aporta cero.
+      - Los flujos nulos no aportan.
+
+    Parameters:
+      flujos: 1D (un flujo) o 2D (filas = flujos, columnas = meses).
+      tasas: escalar o 1D de tasas mensuales.
+
+    Returns:
+      array (n_flujos, n_tasas); se eliminan los ejes que se recibieron como 1D/escalar.
+    """
+    flujos_arr = np.asarray(flujos, dtype=float)
+    tasas_arr = np.asarray(tasas, dtype=float)
+    F = np.atleast_2d(flujos_arr)
+    r = np.atleast_1d(tasas_arr)
+    valores = _npv_bloque(F, r)
+    if tasas_arr.ndim == 0:
+        valores = valores[:, 0]
+    if flujos_arr.ndim == 1:
+        valores = valores[0]
+    return valores
+
 def _npv_at_rate(flujos, r):
     """
     Evaluate NPV for monthly rate r. r must be > -1 (denominator positive for t>=0).
-    Robust against overflow in power calculation.
+    Robust against overflow in power calculation (see `_npv_matriz`).
     """
     flujos_valores = flujos.values if hasattr(flujos, "values") else list(flujos)
-    
-    # Use loop for safety against overflow/div0 issues if r is extreme
-    denom_base = 1.0 + r
-    
-    if denom_base <= 0:
-         # Technically undefined for real log, but if r < -1 we flip signs violently or div by zero
-         # For finance, we just return infinity if we hit a zero denominator
-         return float('inf') 
-
-    val_actual = 0.0
-    # Suppress warnings for division/overflow as we handle them explicitly
-    with np.errstate(divide='ignore', over='ignore', invalid='ignore'):
-        for t, cf in enumerate(flujos_valores):
-            if cf == 0: continue
-            try:
-                denom = denom_base ** t
-                if denom == 0:
-                    return float('inf') if cf > 0 else -float('inf')
-                
-                term = cf / denom
-                val_actual += term
-            except (OverflowError, FloatingPointError, ZeroDivisionError):
-                 if abs(denom_base) > 1:
-                     pass 
-                 else:
-                     return float('inf') if cf > 0 else -float('inf')
-                 
-    return val_actual
-
-
-def _find_roots_by_bracketing(flujos, r_min=-0.9999, r_max=5.0, steps=2000, tol=1e-8, maxiter=200):
+    return float(_npv_matriz(flujos_valores, r))
+
+# Rango de búsqueda de la TIR mensual y resolución del escaneo para flujos con varias raíces
+_TIR_R_MIN, _TIR_R_MAX = -0.9999, 5.0
+_TIR_PASOS_ESCANEO = 2000
+
+def _van_y_derivada(flujos, r):
+    """
+    Función objetivo de la TIR y su derivada respecto de r.
+
+    Para r >= 0 es el NPV; para r < 0 es NPV * (1 + r)**n, que tiene el mismo signo y las
+    mismas raíces pero no desborda cerca de r = -1. Ambas coinciden en r = 0.
+    """
+    n = flujos.size - 1
+    t = np.arange(n + 1)
+    exponentes = (n - t) if r < 0 else -t
+    with np.errstate(over="ignore", under="ignore", invalid="ignore"):
+        factores = np.exp(exponentes * np.log1p(r))
+        valor = flujos @ factores
+        derivada = (flujos * exponentes) @ factores / (1.0 + r)
+    return valor, derivada
+
+def _recortar_ceros(flujos):
+    """
+    Quita los meses nulos del principio y del final: no cambian las raíces del NPV (los
+    iniciales sólo lo escalan por (1 + r)**-k), pero una cola larga de ceros hace que
+    NPV * (1 + r)**n se anule por underflow cerca de r = -1 y el extremo parezca una raíz.
+    """
+    no_nulos = np.flatnonzero(flujos)
+    if no_nulos.size == 0:
+        return flujos
+    return flujos[no_nulos[0]:no_nulos[-1] + 1]
+
+def _cambios_de_signo(flujos):
+    signos = np.sign(flujos[flujos != 0])
+    return int(np.count_nonzero(signos[1:] != signos[:-1]))
+
+def _tir_inicial(flujos):
+    """
+    Estimación inicial de la TIR mensual: múltiplo de los flujos positivos sobre los
+    negativos, anualizado por la distancia entre sus tiempos medios ponderados.
+    Opera sobre el último eje (un flujo 1D o una matriz de flujos por fila).
+    """
+    t = np.arange(flujos.shape[-1])
+    positivos = np.where(flujos > 0, flujos, 0.0)
+    negativos = np.where(flujos < 0, -flujos, 0.0)
+    suma_pos, suma_neg = positivos.sum(axis=-1), negativos.sum(axis=-1)
+    valido = (suma_pos > 0) & (suma_neg > 0)
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        duracion = np.maximum(np.abs((positivos @ t) / suma_pos - (negativos @ t) / suma_neg), 1.0)
+        estimacion = (suma_pos / suma_neg) ** (1.0 / duracion) - 1.0
+    return np.where(valido, estimacion, 0.0)[()]
+
+def _refinar_raiz(flujos, a, b, r0=None, tol=1e-12, maxiter=100):
+    """
+    Newton salvaguardado (rtsafe): pasos de Newton mientras caigan dentro del intervalo
+    [a, b] y reduzcan el error lo suficiente; en caso contrario, bisección.
+
+    Returns:
+      (raiz, iteraciones) o (None, 0) si [a, b] no encierra un cambio de signo.
+    """
+    flujos = _recortar_ceros(flujos)
+    fa, _ = _van_y_derivada(flujos, a)
+    fb, _ = _van_y_derivada(flujos, b)
+    if not (np.isfinite(fa) and np.isfinite(fb)):
+        return None, 0
+    if fa == 0:
+        return a, 0
+    if fb == 0:
+        return b, 0
+    if np.sign(fa) == np.sign(fb):
+        return None, 0
+
+    # Orientar para que f(lado_neg) < 0 < f(lado_pos)
+    lado_neg, lado_pos = (a, b) if fa < 0 else (b, a)
+    r = r0 if (r0 is not None and np.isfinite(r0) and min(a, b) < r0 < max(a, b)) else 0.5 * (a + b)
+    paso_anterior = paso = abs(b - a)
+    f, df = _van_y_derivada(flujos, r)
+
+    for iteracion in range(1, maxiter + 1):
+        fuera = ((r - lado_pos) * df - f) * ((r - lado_neg) * df - f) > 0
+        if not np.isfinite(df) or df == 0 or fuera or abs(2.0 * f) > abs(paso_anterior * df):
+            paso_anterior = paso
+            paso = 0.5 * (lado_pos - lado_neg)
+            r = lado_neg + paso
+        else:
+            paso_anterior = paso
+            paso = f / df
+            r -= paso
+        if abs(paso) <= tol * (1.0 + abs(r)):
+            return r, iteracion
+        f, df = _van_y_derivada(flujos, r)
+        if f == 0:
+            return r, iteracion
+        if f < 0:
+            lado_neg = r
+        else:
+            lado_pos = r
+    return r, maxiter
+
+def _find_roots_by_bracketing(flujos, r_min=-0.9999, r_max=5.0, steps=2000, tol=1e-8, maxiter=200,
+                              npv_grid=None, tir_inicial=None):
     """
     Scan r grid to find NPV sign-change intervals and apply bisection in each.
+    The whole grid is evaluated in one vectorized call (`_npv_matriz`); `npv_grid` lets a
+    caller pass it precomputed (e.g. for many flows at once).
+    If `tir_inicial` is given and the grid has a single sign-change interval (so that root
+    is the only candidate), it is refined by safeguarded Newton from that guess instead.
     Returns a list of monthly roots found.
     """
+    flujos = np.asarray(flujos, dtype=float)
     r_grid = np.linspace(r_min, r_max, steps)
-    npv_grid = np.array([_npv_at_rate(flujos, r) for r in r_grid])
+    if npv_grid is None:
+        npv_grid = _npv_matriz(flujos, r_grid)
 
-    roots = []
-    for i in range(len(r_grid) - 1):
-        y1, y2 = npv_grid[i], npv_grid[i+1]
-        if np.isfinite(y1) and np.isfinite(y2) and y1 == 0:
-            roots.append(r_grid[i])
-        # Use sign check to prevent overflow from y1 * y2
-        elif np.isfinite(y1) and np.isfinite(y2) and (np.sign(y1) != np.sign(y2)):
-            a, b = r_grid[i], r_grid[i+1]
-            fa, fb = y1, y2
-            # bisection
-            for _ in range(maxiter):
-                c = 0.5 * (a + b)
-                fc = _npv_at_rate(flujos, c)
-                if not np.isfinite(fc):
-                    # shrink interval
-                    a = 0.5*(a+c)
-                    b = 0.5*(b+c)
-                    continue
-                if abs(fc) <= tol or (b - a) / 2.0 < tol:
-                    roots.append(c)
-                    break
-                if fa * fc < 0:
-                    b, fb = c, fc
-                else:
-                    a, fa = c, fc
-            else:
-                roots.append(c)
-    return roots
+    y1, y2 = npv_grid[:-1], npv_grid[1:]
+    finitos = np.isfinite(y1) & np.isfinite(y2)
+    # Use sign check to prevent overflow from y1 * y2
+    exactos = finitos & (y1 == 0)
+    cambios = finitos & ~exactos & (np.sign(y1) != np.sign(y2))
 
-def _resolver_tir(flujos):
-    """
-    Robust IRR resolver returning a single monthly IRR or None.
-    Strategy:
-      - Validate cash flows (at least one positive and one negative).
-      - Find all real roots via bracketing/bisection.
-      - If multiple roots, prefer the root with smallest abs(NPV) and penalize unrealistic extremes.
-    """
-    flujos_list = flujos.values if hasattr(flujos, "values") else list(flujos)
-    if len(flujos_list) == 0:
-        return None
-    if not (any(f > 0 for f in flujos_list) and any(f < 0 for f in flujos_list)):
-        return None
+    if tir_inicial is not None and not exactos.any() and np.count_nonzero(cambios) == 1:
+        i = np.flatnonzero(cambios)[0]
+        raiz, _ = _refinar_raiz(flujos, r_grid[i], r_grid[i+1], r0=tir_inicial)
+        if raiz is not None:
+            return [raiz]
 
-    roots = _find_roots_by_bracketing(flujos_list, r_min=-0.9999, r_max=5.0, steps=2000, tol=1e-8)
+    roots = []
+    for i in np.flatnonzero(exactos | cambios):
+        if exactos[i]:
+            roots.append(r_grid[i])
+            continue
+        a, b = r_grid[i], r_grid[i+1]
+        fa, fb = y1[i], y2[i]
+        # bisection
+        for _ in range(maxiter):
+            c = 0.5 * (a + b)
+            fc = _npv_at_rate(flujos, c)
+            if not np.isfinite(fc):
+                # shrink interval
+                a = 0.5*(a+c)
+                b = 0.5*(b+c)
+                continue
+            if abs(fc) <= tol or (b - a) / 2.0 < tol:
+                roots.append(c)
+                break
+            if fa * fc < 0:
+                b, fb = c, fc
+            else:
+                a, fa = c, fc
+        else:
+            roots.append(c)
+    return roots
 
-    feasible = [r for r in roots if np.isfinite(r) and r > -0.9999]
+def _elegir_raiz(flujos, roots):
+    """
+    Among candidate monthly roots, prefer the one with smallest abs(NPV) and penalize
+    unrealistic extremes. Returns None if no root is feasible.
+    """
+    feasible = [r for r in roots if np.isfinite(r) and r > _TIR_R_MIN]
     if len(feasible) == 0:
         return None
 
     best_r = None
     best_score = float('inf')
     for r in feasible:
-        err = abs(_npv_at_rate(flujos_list, r))
+        err = abs(_npv_at_rate(flujos, r))
         # penalize astronomically large rates (optional)
         penalty = 0.0 if -0.99 < r < 10 else 1.0
         score = err + penalty * 1e6
@@ -512,10 +1823,41 @@ def _resolver_tir(flujos):
 
     return best_r
 
-def TIR_anual(flujos, return_structure=False):
+def _resolver_tir(flujos, tir_inicial=None):
+    """
+    Robust IRR resolver returning a single monthly IRR or None.
+    Strategy:
+      - Validate cash flows (at least one positive and one negative).
+      - One sign change (unique root): safeguarded Newton on [r_min, r_max] from an
+        initial estimate (`tir_inicial` if given, e.g. a previous root), no grid scan.
+      - Several sign changes: find all real roots via a vectorized bracketing scan.
+        A warm start is only used when the scan finds a single candidate, so it can
+        never select a different root than the cold path.
+      - If multiple roots, prefer the root with smallest abs(NPV) and penalize unrealistic extremes.
+    """
+    flujos_list = flujos.values if hasattr(flujos, "values") else list(flujos)
+    if len(flujos_list) == 0:
+        return None
+    if not (any(f > 0 for f in flujos_list) and any(f < 0 for f in flujos_list)):
+        return None
+
+    flujos_arr = np.asarray(flujos_list, dtype=float)
+    if _cambios_de_signo(flujos_arr) == 1:
+        r0 = _tir_inicial(flujos_arr) if tir_inicial is None else tir_inicial
+        r0 = min(max(r0, _TIR_R_MIN), _TIR_R_MAX)
+        raiz, _ = _refinar_raiz(flujos_arr, _TIR_R_MIN, _TIR_R_MAX, r0=r0)
+        roots = [] if raiz is None else [raiz]
+    else:
+        roots = _find_roots_by_bracketing(flujos_arr, r_min=_TIR_R_MIN, r_max=_TIR_R_MAX,
+                                          steps=_TIR_PASOS_ESCANEO, tol=1e-8, tir_inicial=tir_inicial)
+    return _elegir_raiz(flujos_arr, roots)
+
+def TIR_anual(flujos, return_structure=False, tir_inicial=None):
     """
     Calculate monthly IRR and annual equivalent.
 
+    tir_inicial: optional monthly IRR guess (e.g. the root of a neighbouring scenario) used
+    as Newton warm start; it does not change which root is returned.
     If return_structure is True return a dict with metadata.
     Otherwise return tir_anual_equivalente (float) or None.
     """
@@ -536,7 +1878,7 @@ def TIR_anual(flujos, return_structure=False):
         result["notes"] = "Cash flow must have at least one positive and one negative value"
         return result if return_structure else None
 
-    tir_m = _resolver_tir(flujos_list)
+    tir_m = _resolver_tir(flujos_list, tir_inicial=tir_inicial)
     if tir_m is None or not np.isfinite(tir_m) or tir_m <= -1:
         result["notes"] = "IRR solver did not converge or returned infeasible rate"
         return result if return_structure else None
@@ -547,6 +1889,239 @@ def TIR_anual(flujos, return_structure=False):
     result["converged"] = True
     return result if return_structure else tir_anual
 
+def _van_y_derivada_filas(F, r):
+    """`_van_y_derivada` por filas: F (filas x meses) con una tasa r por fila."""
+    t = np.arange(F.shape[1])
+    # Para r < 0 se escala por (1 + r)**n con n = último mes no nulo de la fila, así el
+    # término dominante cerca de r = -1 nunca es un cero de relleno
+    no_nulo = F != 0
+    n_efectivo = np.where(no_nulo.any(axis=1), F.shape[1] - 1 - no_nulo[:, ::-1].argmax(axis=1), 0)
+    exponentes = np.where(r[:, None] < 0, np.maximum(n_efectivo[:, None] - t, 0), -t)
+    with np.errstate(over="ignore", under="ignore", invalid="ignore"):
+        factores = np.exp(exponentes * np.log1p(r)[:, None])
+        valor = np.einsum("ij,ij->i", F, factores)
+        derivada = np.einsum("ij,ij->i", F * exponentes, factores) / (1.0 + r)
+    return valor, derivada
+
+def _recortar_ceros_filas(F):
+    """
+    `_recortar_ceros` por filas: corre cada fila para que empiece en su primer flujo no
+    nulo y descarta las columnas finales que son cero en todas las filas. Los ceros que
+    quedan al final de una fila más corta se compensan en `_van_y_derivada_filas` con el
+    último mes no nulo de esa fila (ver `n_efectivo`).
+    """
+    if F.size == 0:
+        return F
+    no_nulo = F != 0
+    n_meses = F.shape[1]
+    primero = np.where(no_nulo.any(axis=1), no_nulo.argmax(axis=1), 0)
+    columnas = (np.arange(n_meses) + primero[:, None]) % n_meses
+    desplazado = np.take_along_axis(F, columnas, axis=1)
+    # Lo que dio la vuelta al final son los ceros iniciales: se anulan explícitamente
+    desplazado[np.arange(n_meses) >= (n_meses - primero)[:, None]] = 0.0
+    largo = int((n_meses - no_nulo[:, ::-1].argmax(axis=1) - primero).max())
+    return desplazado[:, :max(largo, 1)]
+
+def _refinar_raices_filas(F, a, b, r0=None, tol=1e-12, maxiter=100):
+    """
+    `_refinar_raiz` vectorizado: un Newton salvaguardado por fila de F sobre [a, b] (escalares
+    o uno por fila), con máscaras de convergencia; cada iteración sólo evalúa las filas aún
+    activas. r0: estimación inicial por fila (NaN = usar `_tir_inicial`).
+
+    Returns:
+      (raices, iteraciones, convergido, acotada), arrays por fila. `acotada` es False si
+      [a, b] no encierra un cambio de signo; `convergido` es False si además se agotó maxiter.
+    """
+    F = _recortar_ceros_filas(F)
+    n_filas = F.shape[0]
+    raices = np.full(n_filas, np.nan)
+    iteraciones = np.zeros(n_filas, dtype=int)
+    convergido = np.zeros(n_filas, dtype=bool)
+
+    a = np.broadcast_to(np.asarray(a, dtype=float), (n_filas,))
+    b = np.broadcast_to(np.asarray(b, dtype=float), (n_filas,))
+    fa, _ = _van_y_derivada_filas(F, a)
+    fb, _ = _van_y_derivada_filas(F, b)
+    finitos = np.isfinite(fa) & np.isfinite(fb)
+    en_a = finitos & (fa == 0)
+    en_b = finitos & ~en_a & (fb == 0)
+    raices[en_a], raices[en_b] = a[en_a], b[en_b]
+    convergido[en_a | en_b] = True
+    acotada = finitos & (np.sign(fa) != np.sign(fb))
+
+    activas = np.flatnonzero(acotada & ~convergido)
+    F_act, a, b = F[activas], a[activas], b[activas]
+    lado_neg = np.where(fa[activas] < 0, a, b)
+    lado_pos = np.where(fa[activas] < 0, b, a)
+    r_ini = np.atleast_1d(_tir_inicial(F_act))
+    if r0 is not None:
+        r_ini = np.where(np.isfinite(r0[activas]), r0[activas], r_ini)
+    bajo, alto = np.minimum(a, b), np.maximum(a, b)
+    r0 = np.clip(r_ini, bajo, alto)
+    r = np.where((r0 > bajo) & (r0 < alto), r0, 0.5 * (a + b))
+    paso_anterior = paso = np.abs(b - a)
+    f, df = _van_y_derivada_filas(F_act, r)
+
+    for iteracion in range(1, maxiter + 1):
+        if activas.size == 0:
+            break
+        with np.errstate(invalid="ignore", divide="ignore", over="ignore"):
+            fuera = ((r - lado_pos) * df - f) * ((r - lado_neg) * df - f) > 0
+            biseccion = ~np.isfinite(df) | (df == 0) | fuera | (np.abs(2.0 * f) > np.abs(paso_anterior * df))
+            paso_anterior = paso
+            paso = np.where(biseccion, 0.5 * (lado_pos - lado_neg), f / df)
+        r = np.where(biseccion, lado_neg + paso, r - paso)
+        listas = np.abs(paso) <= tol * (1.0 + np.abs(r))
+        f, df = _van_y_derivada_filas(F_act, r)
+        listas |= f == 0
+        lado_neg = np.where(f < 0, r, lado_neg)
+        lado_pos = np.where(f < 0, lado_pos, r)
+
+        filas = activas[listas]
+        raices[filas], iteraciones[filas], convergido[filas] = r[listas], iteracion, True
+        seguir = ~listas
+        activas, F_act, r, f, df = activas[seguir], F_act[seguir], r[seguir], f[seguir], df[seguir]
+        lado_neg, lado_pos = lado_neg[seguir], lado_pos[seguir]
+        paso, paso_anterior = paso[seguir], paso_anterior[seguir]
+
+    iteraciones[activas] = maxiter
+    return raices, iteraciones, convergido, acotada
+
+def _raices_por_escaneo_filas(F, npv_grid, r_grid, r0=None, tol=1e-8, maxiter=200):
+    """
+    `_find_roots_by_bracketing` + `_elegir_raiz` para muchas filas a la vez: la bisección
+    avanza sobre los intervalos con cambio de signo de todas las filas juntos y cada
+    iteración evalúa sólo los que siguen activos (`_npv_filas`). Con r0 (por fila, NaN = sin
+    estimación), las filas con un único intervalo se refinan por Newton desde r0.
+
+    Returns:
+      array (n_filas,) con la raíz mensual elegida; NaN si no hay raíz factible.
+    """
+    y1, y2 = npv_grid[:, :-1], npv_grid[:, 1:]
+    finitos = np.isfinite(y1) & np.isfinite(y2)
+    exactos = finitos & (y1 == 0)
+    cambios = finitos & ~exactos & (np.sign(y1) != np.sign(y2))
+    # Pares (fila, intervalo) en el mismo orden que la versión por fila
+    fila_par, intervalo = np.nonzero(exactos | cambios)
+    raices = np.full(fila_par.size, np.nan)
+    exacto = exactos[fila_par, intervalo]
+    raices[exacto] = r_grid[intervalo[exacto]]
+
+    pendiente = ~exacto
+    if r0 is not None:
+        unico = ~exactos.any(axis=1) & (np.count_nonzero(cambios, axis=1) == 1) & np.isfinite(r0)
+        caliente = np.flatnonzero(unico[fila_par])
+        if caliente.size:
+            filas = fila_par[caliente]
+            raiz, _, convergido, _ = _refinar_raices_filas(
+                F[filas], r_grid[intervalo[caliente]], r_grid[intervalo[caliente] + 1], r0[filas])
+            raices[caliente[convergido]] = raiz[convergido]
+            pendiente[caliente[convergido]] = False
+
+    activos = np.flatnonzero(pendiente)
+    a, b = r_grid[intervalo[activos]], r_grid[intervalo[activos] + 1]
+    fa = y1[fila_par[activos], intervalo[activos]]
+    c = np.full(activos.size, np.nan)
+    for _ in range(maxiter):
+        if activos.size == 0:
+            break
+        c = 0.5 * (a + b)
+        fc = _npv_filas(F[fila_par[activos]], c)
+        finito = np.isfinite(fc)
+        listo = finito & ((np.abs(fc) <= tol) | ((b - a) / 2.0 < tol))
+        raices[activos[listo]] = c[listo]
+        with np.errstate(over="ignore", invalid="ignore"):
+            izquierda = finito & (fa * fc < 0)
+        derecha = finito & ~izquierda
+        # Valor no finito: se achica el intervalo hacia el punto medio
+        a, b = np.where(finito, a, 0.5 * (a + c)), np.where(finito, b, 0.5 * (b + c))
+        b = np.where(izquierda, c, b)
+        a, fa = np.where(derecha, c, a), np.where(derecha, fc, fa)
+        seguir = ~listo
+        activos, a, b, fa, c = activos[seguir], a[seguir], b[seguir], fa[seguir], c[seguir]
+    raices[activos] = c
+
+    # Elección por fila: menor |NPV| con penalidad para tasas extremas (como `_elegir_raiz`)
+    elegida = np.full(F.shape[0], np.nan)
+    factible = np.isfinite(raices) & (raices > _TIR_R_MIN)
+    if factible.any():
+        candidatos = np.flatnonzero(factible)
+        puntaje = np.abs(_npv_filas(F[fila_par[candidatos]], raices[candidatos]))
+        puntaje += np.where((raices[candidatos] > -0.99) & (raices[candidatos] < 10), 0.0, 1e6)
+        # El primer mínimo de cada fila (orden de lexsort estable)
+        orden = np.lexsort((puntaje, fila_par[candidatos]))
+        filas_ordenadas = fila_par[candidatos][orden]
+        primero = np.r_[True, filas_ordenadas[1:] != filas_ordenadas[:-1]]
+        elegida[filas_ordenadas[primero]] = raices[candidatos][orden][primero]
+    return elegida
+
+def TIR_anual_batch(flujos, tol=1e-12, maxiter=100, filas_por_bloque=256, tir_inicial=None):
+    """
+    TIR de muchos flujos a la vez (escenarios x meses), con los mismos criterios que `TIR_anual`.
+
+    - Filas con un solo cambio de signo: Newton salvaguardado vectorizado sobre todas ellas,
+      con máscara de convergencia por fila.
+    - Filas con varios cambios de signo, o que no convergen en `maxiter`: escaneo con
+      bisección como `_find_roots_by_bracketing` (ver `_raices_por_escaneo_filas`); la grilla
+      de NPV y la bisección se resuelven por bloques de `filas_por_bloque` filas.
+    - tir_inicial: TIR mensual de arranque (escalar o una por fila, NaN = sin estimación),
+      con la misma semántica que en `TIR_anual`.
+
+    Returns:
+      dict de arrays por fila: "tir_mensual" y "tir_anual_equivalente" (NaN si no hay TIR),
+      "converged" (bool) e "iteraciones" (pasos de Newton; 0 si se resolvió por escaneo).
+    """
+    F = np.atleast_2d(np.asarray(flujos.values if hasattr(flujos, "values") else flujos, dtype=float))
+    n_filas, n_meses = F.shape
+    tir_mensual = np.full(n_filas, np.nan)
+    iteraciones = np.zeros(n_filas, dtype=int)
+
+    valida = (F > 0).any(axis=1) & (F < 0).any(axis=1)
+    # Cambios de signo ignorando ceros: se arrastra el último signo no nulo de cada fila
+    signos = np.sign(F)
+    ultimo_no_nulo = np.maximum.accumulate(np.where(signos != 0, np.arange(n_meses), 0), axis=1)
+    signos = np.take_along_axis(signos, ultimo_no_nulo, axis=1)
+    cambios = np.count_nonzero((signos[:, 1:] != signos[:, :-1]) & (signos[:, :-1] != 0), axis=1)
+
+    r0 = None if tir_inicial is None else np.broadcast_to(np.asarray(tir_inicial, dtype=float), (n_filas,))
+
+    unica = np.flatnonzero(valida & (cambios == 1))
+    raices, iters, convergido, _ = _refinar_raices_filas(
+        F[unica], _TIR_R_MIN, _TIR_R_MAX, None if r0 is None else r0[unica], tol, maxiter)
+    factible = convergido & (raices > _TIR_R_MIN)
+    tir_mensual[unica[factible]] = raices[factible]
+    iteraciones[unica] = np.where(convergido, iters, 0)
+
+    escaneo = np.union1d(np.flatnonzero(valida & (cambios > 1)), unica[~convergido])
+    r_grid = np.linspace(_TIR_R_MIN, _TIR_R_MAX, _TIR_PASOS_ESCANEO)
+    for inicio in range(0, escaneo.size, filas_por_bloque):
+        bloque = escaneo[inicio:inicio + filas_por_bloque]
+        tir_mensual[bloque] = _raices_por_escaneo_filas(
+            F[bloque], _npv_matriz(F[bloque], r_grid), r_grid, None if r0 is None else r0[bloque])
+        iteraciones[bloque] = 0
+
+    return {
+        "tir_mensual": tir_mensual,
+        "tir_anual_equivalente": (1.0 + tir_mensual) ** 12.0 - 1.0,
+        "converged": np.isfinite(tir_mensual),
+        "iteraciones": iteraciones,
+    }
+
+def _tasas_por_periodo(tasas_descuento_anual, annual_rate_is_effective=True, periodo_meses=1):
+    """Convierte tasas anuales (escalar o array) en la tasa efectiva de cada período de los flujos."""
+    tasas = np.asarray(tasas_descuento_anual, dtype=float)
+
+    # 1. Calculate Monthly Effective Rate
+    if annual_rate_is_effective:
+        tasa_mensual = (1.0 + tasas) ** (1.0 / 12.0) - 1.0
+    else:
+        # standard convention: nominal / 12
+        tasa_mensual = tasas / 12.0
+
+    # 2. Adjust for period length
+    # If flows are every `periodo_meses`, the discount factor per step is (1 + tasa_mensual)**periodo_meses
+    return (1.0 + tasa_mensual) ** periodo_meses - 1.0
+
 def VAN(flujos, tasa_descuento_anual, annual_rate_is_effective=True, periodo_meses=1):
     """
     Calcula el Valor Actual Neto (VAN).
@@ -559,29 +2134,47 @@ def VAN(flujos, tasa_descuento_anual, annual_rate_is_effective=True, periodo_mes
       periodo_meses: duration of each period in the flows (default 1 = monthly).
     """
     flujos_valores = flujos.values if hasattr(flujos, "values") else list(flujos)
+    tasa_periodo = _tasas_por_periodo(tasa_descuento_anual, annual_rate_is_effective, periodo_meses)
+    return float(_npv_matriz(flujos_valores, tasa_periodo))
 
-    # 1. Calculate Monthly Effective Rate
-    if annual_rate_is_effective:
-        tasa_mensual = (1.0 + tasa_descuento_anual) ** (1.0 / 12.0) - 1.0
-    else:
-        # standard convention: nominal / 12
-        tasa_mensual = tasa_descuento_anual / 12.0
+def VAN_matriz(flujos, tasas_descuento_anual, annual_rate_is_effective=True, periodo_meses=1):
+    """
+    VAN de muchos flujos a muchas tasas en una sola operación (ver `_npv_matriz`).
 
-    # 2. Adjust for period length
-    # If flows are every `periodo_meses`, the discount factor per step is (1 + tasa_mensual)**periodo_meses
-    factor_periodo = (1.0 + tasa_mensual) ** periodo_meses
-    
-    val_actual = 0.0
-    for t, cf in enumerate(flujos_valores):
-        val_actual += cf / (factor_periodo ** t)
-    return val_actual
+    Parameters:
+      flujos: 1D (un flujo) o 2D (filas = escenarios, columnas = períodos).
+      tasas_descuento_anual: escalar o 1D de tasas anuales; mismas convenciones que `VAN`.
+
+    Returns:
+      array (n_flujos, n_tasas), sin los ejes recibidos como 1D/escalar.
+    """
+    flujos_valores = flujos.values if hasattr(flujos, "values") else flujos
+    tasas_periodo = _tasas_por_periodo(tasas_descuento_anual, annual_rate_is_effective, periodo_meses)
+    return _npv_matriz(flujos_valores, tasas_periodo)
+
+def VAN_filas(flujos, tasas_descuento_anual, annual_rate_is_effective=True, periodo_meses=1):
+    """
+    VAN de cada fila de `flujos` a su propia tasa (p.ej. un WACC por escenario), sin
+    armar la matriz flujos x tasas de `VAN_matriz`; mismas convenciones que `VAN`.
+
+    Returns:
+      array (n_filas,).
+    """
+    F = np.atleast_2d(np.asarray(flujos.values if hasattr(flujos, "values") else flujos, dtype=float))
+    r = np.broadcast_to(_tasas_por_periodo(tasas_descuento_anual, annual_rate_is_effective, periodo_meses), F.shape[:1])
+    return _npv_filas(F, r)
 
 def WACC(p):
-    cfg_fin = p["financiamiento"]
-    kd, ke = cfg_fin["costo_deuda_anual"], cfg_fin["costo_capital_propio_anual"]
-    wd = p["financiamiento"]["porcentaje_deuda"]
+    s = compilar_proyecto(p).exigir(
+        "financiamiento.costo_deuda_anual", "financiamiento.costo_capital_propio_anual",
+        "financiamiento.tasa_impuesto_renta", "financiamiento.porcentaje_deuda",
+    )
+    return _wacc(s.financiamiento, s.financiamiento.porcentaje_deuda)
+
+def _wacc(f, wd):
+    kd, ke = f.costo_deuda_anual, f.costo_capital_propio_anual
     we = 1 - wd
-    t = cfg_fin["tasa_impuesto_renta"]
+    t = f.tasa_impuesto_renta
     return (we * ke) + (wd * kd * (1 - t)) if wd > 0 else ke
 
 def calcular_total_intereses(tabla_amortizacion):
@@ -641,36 +2234,208 @@ def payback_descontado(flujos, tasa_anual):
       float: tiempo de recupero en meses (con decimales)
       None: si no se recupera la inversión
     """
-    flujos_valores = flujos.values if hasattr(flujos, "values") else list(flujos)
+    flujos_valores = np.asarray(flujos.values if hasattr(flujos, "values") else list(flujos), dtype=float)
     
     # Convertir tasa anual a mensual efectiva
     tasa_mensual = (1 + tasa_anual) ** (1 / 12) - 1
     
-    acumulado = 0.0
+    # Descontar todos los flujos y acumular de una vez
+    meses = np.arange(flujos_valores.size)
+    with np.errstate(over="ignore"):
+        flujos_descontados = flujos_valores / ((1 + tasa_mensual) ** meses)
+    acumulado = np.cumsum(flujos_descontados)
     
-    for mes in range(len(flujos_valores)):
-        # Descontar el flujo del mes actual
-        flujo_descontado = flujos_valores[mes] / ((1 + tasa_mensual) ** mes)
-        acumulado_anterior = acumulado
-        acumulado += flujo_descontado
-        
-        if acumulado >= 0:
-            # Interpolación lineal para el mes exacto
-            faltante = abs(acumulado_anterior)
-            if flujo_descontado != 0:
-                fraccion = faltante / abs(flujo_descontado)
-                return (mes - 1) + fraccion
-            else:
-                return float(mes)
+    recuperado = np.flatnonzero(acumulado >= 0)
+    if recuperado.size:
+        mes = int(recuperado[0])
+        flujo_descontado = flujos_descontados[mes]
+        # Interpolación lineal para el mes exacto
+        faltante = abs(acumulado[mes - 1]) if mes > 0 else 0.0
+        if flujo_descontado != 0:
+            fraccion = faltante / abs(flujo_descontado)
+            return (mes - 1) + fraccion
+        else:
+            return float(mes)
     
     return None  # No se recupera
 
+def estado_payback(acum_normal, acum_desc):
+    """
+    Columna "Estado" del detalle de payback a partir de los flujos acumulados (normal y
+    descontado): marca el mes de cada recupero y "✓ Ambos" en los meses posteriores.
+
+    Si los dos se recuperan en el mismo mes, ese mes queda como "✓ Recupero Normal" y el
+    descontado se marca en el siguiente mes con acumulado descontado >= 0.
+
+    Returns:
+      array de objetos (str) del largo de los acumulados; "" donde no hay estado.
+    """
+    acum_normal = np.asarray(acum_normal, dtype=float)
+    acum_desc = np.asarray(acum_desc, dtype=float)
+    estado = np.full(len(acum_normal), "", dtype=object)
+    meses = np.arange(len(acum_normal))
+    recupero_normal = np.flatnonzero(acum_normal >= 0)
+    mes_normal = recupero_normal[0] if recupero_normal.size else None
+    recupero_desc = np.flatnonzero((acum_desc >= 0) & (meses != mes_normal))
+    mes_desc = recupero_desc[0] if recupero_desc.size else None
+    if mes_normal is not None and mes_desc is not None:
+        estado[meses > max(mes_normal, mes_desc)] = "✓ Ambos"
+    if mes_normal is not None:
+        estado[mes_normal] = "✓ Recupero Normal"
+    if mes_desc is not None:
+        estado[mes_desc] = "✓ Recupero Desc."
+    return estado
+
+def payback_batch(flujos, tasas_anual=None):
+    """
+    Payback de muchos flujos a la vez (filas = escenarios), con la misma interpolación
+    que `payback_normal` o, si se indica `tasas_anual` (escalar o una por fila),
+    que `payback_descontado`.
+
+    Returns:
+      array (n_filas,) en meses; NaN donde la fila no se recupera.
+    """
+    F = np.atleast_2d(np.asarray(flujos, dtype=float))
+    if tasas_anual is not None:
+        tasa_mensual = (1 + np.asarray(tasas_anual, dtype=float)) ** (1 / 12) - 1
+        with np.errstate(over="ignore"):
+            F = F / (1 + np.reshape(tasa_mensual, (-1, 1))) ** np.arange(F.shape[1])
+    acumulado = np.cumsum(F, axis=1)
+    recuperado = acumulado >= 0
+    mes = recuperado.argmax(axis=1)
+    filas = np.arange(F.shape[0])
+    faltante = np.where(mes > 0, np.abs(acumulado[filas, mes - 1]), 0.0)
+    flujo = np.abs(F[filas, mes])
+    with np.errstate(divide="ignore", invalid="ignore"):
+        meses = np.where(flujo != 0, (mes - 1) + faltante / flujo, mes.astype(float))
+    return np.where(recuperado.any(axis=1), meses, np.nan)
+
 
 # ==============================================================================
 # 5. MÓDULO DE ANÁLISIS DE SENSIBILIDAD
 # ==============================================================================
 
-def analisis_de_sensibilidad(p_base):
+def construir_escenarios_sensibilidad(p_base, escenarios, variaciones):
+    """
+    Genera una capa de parámetros (ParametrosOverlay) por cada (variable, variación);
+    el caso base se comparte y cada escenario guarda sólo su cambio.
+
+    escenarios: {nombre: (sección, clave)}; si la sección es "cronograma_inversion" se
+    escalan los ítems cuyo tag_sensibilidad coincide con la clave.
+
+    Returns:
+      (etiquetas, escenarios_test): listas paralelas de (nombre, variación) y parámetros.
+    """
+    base = p_base if isinstance(p_base, ParametrosOverlay) else ParametrosOverlay(p_base)
+    etiquetas = []
+    escenarios_test = []
+    for nombre_variable, (seccion, clave) in escenarios.items():
+        for variacion in variaciones:
+            if seccion == "cronograma_inversion":
+                p_test = base.con(multiplicadores_tag={clave: 1 + variacion})
+            else:
+                valor_base = base[seccion][clave]
+                p_test = base.con({(seccion, clave): valor_base * (1 + variacion)})
+
+            etiquetas.append((nombre_variable, variacion))
+            escenarios_test.append(p_test)
+    return etiquetas, escenarios_test
+
+class CalculoCancelado(Exception):
+    """Un cálculo en curso se abandonó porque su función `cancelado()` devolvió True."""
+
+def _revisar_cancelacion(cancelado):
+    if cancelado is not None and cancelado():
+        raise CalculoCancelado()
+
+def _esperar_resultados(pool, futuros, cancelado, intervalo=0.1):
+    """Resultados de `futuros` en orden; revisa `cancelado` cada `intervalo` segundos."""
+    pendientes = set(futuros)
+    while pendientes:
+        _, pendientes = wait(pendientes, timeout=intervalo, return_when=FIRST_COMPLETED)
+        if pendientes and cancelado is not None and cancelado():
+            pool.shutdown(wait=False, cancel_futures=True)
+            raise CalculoCancelado()
+    return [futuro.result() for futuro in futuros]
+
+def _evaluar_bloque_escenarios(tarea):
+    """Tarea de un proceso del pool: evalúa un bloque de escenarios y devuelve sólo arrays."""
+    lista_params, montos_deuda, columnas = tarea
+    col, kpis = generar_modelo_financiero_batch(lista_params, montos_deuda)
+    return {nombre: col[nombre] for nombre in columnas}, kpis
+
+# Con menos escenarios por proceso el arranque del pool cuesta más que evaluarlos en serie
+# (un escenario por lotes toma ~0.5 ms; crear el pool, decenas de ms)
+_MIN_ESCENARIOS_POR_PROCESO = 256
+
+def generar_modelo_financiero_paralelo(lista_params, montos_deuda=None, columnas=None,
+                                       max_workers=None, escenarios_por_tarea=None, cancelado=None):
+    """
+    `generar_modelo_financiero_batch` repartido en un pool de procesos.
+
+    Los escenarios se compilan (y validan) antes de repartirse en bloques contiguos; cada
+    proceso recibe sólo los proyectos compilados y los montos de deuda de su bloque, y
+    devuelve sólo las columnas pedidas como arrays (nunca DataFrames). Los resultados se concatenan en el
+    orden de `lista_params`, sin importar qué proceso termine primero.
+
+    Parameters:
+      columnas: nombres de COLUMNAS_MODELO a devolver (por defecto todas).
+      max_workers: procesos a usar. Por defecto os.cpu_count(), pero sin bajar de
+        _MIN_ESCENARIOS_POR_PROCESO escenarios por proceso: con pocos escenarios no se crea
+        el pool. Con 1 (o si no se pueden crear procesos) se evalúa todo en serie en una
+        sola pasada vectorizada.
+      escenarios_por_tarea: tamaño de bloque; por defecto un bloque por proceso.
+      cancelado: función sin argumentos; si devuelve True entre bloques (o mientras se
+        espera al pool) se abandonan los bloques pendientes y se lanza CalculoCancelado.
+
+    Returns:
+      (columnas, kpis) con la misma forma que `generar_modelo_financiero_batch`.
+    """
+    # multiprocessing se importa sólo si de verdad se va a crear un pool
+    from concurrent.futures import ProcessPoolExecutor
+    from concurrent.futures.process import BrokenProcessPool
+
+    lista_params = [compilar_proyecto(p) for p in lista_params]
+    if montos_deuda is None:
+        montos_deuda = [s.exigir("financiamiento.monto_deuda").financiamiento.monto_deuda for s in lista_params]
+    montos_deuda = [float(m) for m in montos_deuda]
+    columnas = tuple(COLUMNAS_MODELO if columnas is None else columnas)
+
+    n = len(lista_params)
+    if max_workers is None:
+        max_workers = min(os.cpu_count() or 1, n // _MIN_ESCENARIOS_POR_PROCESO)
+    max_workers = max(1, min(max_workers, n))
+    if escenarios_por_tarea is None:
+        escenarios_por_tarea = -(-n // max_workers)
+    escenarios_por_tarea = max(1, escenarios_por_tarea)
+    tareas = [
+        (lista_params[i:i + escenarios_por_tarea], montos_deuda[i:i + escenarios_por_tarea], columnas)
+        for i in range(0, n, escenarios_por_tarea)
+    ]
+
+    resultados = None
+    if max_workers > 1 and len(tareas) > 1:
+        try:
+            with ProcessPoolExecutor(max_workers=max_workers) as pool:
+                futuros = [pool.submit(_evaluar_bloque_escenarios, tarea) for tarea in tareas]
+                resultados = _esperar_resultados(pool, futuros, cancelado)
+        except (OSError, NotImplementedError, BrokenProcessPool):
+            # Entorno sin procesos disponibles: se continúa en serie
+            resultados = None
+    if resultados is None and cancelado is None:
+        resultados = [_evaluar_bloque_escenarios((lista_params, montos_deuda, columnas))]
+    elif resultados is None:
+        # En serie pero cancelable: bloque a bloque, revisando entre cada uno
+        resultados = []
+        for tarea in tareas:
+            _revisar_cancelacion(cancelado)
+            resultados.append(_evaluar_bloque_escenarios(tarea))
+
+    col = {nombre: np.concatenate([r[0][nombre] for r in resultados]) for nombre in columnas}
+    kpis = {clave: np.concatenate([r[1][clave] for r in resultados]) for clave in resultados[0][1]}
+    return col, kpis
+
+def analisis_de_sensibilidad(p_base, max_workers=None):
     print("\n" + "="*70)
     print(" ANÁLISIS DE SENSIBILIDAD")
     print("="*70)
@@ -681,39 +2446,37 @@ def analisis_de_sensibilidad(p_base):
         "OPEX Mensual": ("costos_operativos", "costo_operativo_mensual"),
     }
     variaciones = [-0.20, -0.10, 0.0, 0.10, 0.20]
-    resultados_sensibilidad = []
+    etiquetas, escenarios_test = construir_escenarios_sensibilidad(p_base, escenarios, variaciones)
+    escenarios_test = [
+        compilar_proyecto(p_test).exigir("financiamiento.porcentaje_deuda", "financiamiento.costo_capital_propio_anual")
+        for p_test in escenarios_test
+    ]
 
-    for nombre_variable, (seccion, clave) in escenarios.items():
-        for variacion in variaciones:
-            p_test = copy.deepcopy(p_base)
-            
-            if seccion == "cronograma_inversion":
-                for item in p_test[seccion]:
-                    if item.get("tag_sensibilidad") == clave:
-                        item["monto"] *= (1 + variacion)
-            else:
-                valor_base = p_test[seccion][clave]
-                p_test[seccion][clave] = valor_base * (1 + variacion)
-
-            # Re-correr el modelo con los nuevos parámetros
-            inv_total_test = calcular_inversion_total(p_test)
-            monto_deuda_test = inv_total_test * p_test["financiamiento"]["porcentaje_deuda"]
-            capex_test = construir_cronograma_inversiones(p_test)
-            deuda_test = crear_tabla_amortizacion(p_test, monto_deuda_test)
-            modelo_test = generar_modelo_financiero_detallado(p_test, capex_test, deuda_test, monto_deuda_test)
-            
-            flujo_inv_test = modelo_test["Flujo Caja Neto Inversionista"]
-            
-            costo_capital_test = p_test["financiamiento"]["costo_capital_propio_anual"]
-            van_inv_test = VAN(flujo_inv_test, costo_capital_test)
-            tir_inv_test = TIR_anual(flujo_inv_test)
-            
-            resultados_sensibilidad.append({
-                "Variable": nombre_variable,
-                "Variación": f"{variacion:.0%}",
-                "VAN Inversionista": van_inv_test,
-                "TIR Inversionista": tir_inv_test
-            })
+    # Re-correr el modelo para todas las variaciones (en serie: son pocas para un pool)
+    montos_deuda = [s.inversion_total * s.financiamiento.porcentaje_deuda for s in escenarios_test]
+    columnas, _ = generar_modelo_financiero_paralelo(
+        escenarios_test, montos_deuda, columnas=("Flujo Caja Neto Inversionista",), max_workers=max_workers
+    )
+    flujos_inv = columnas["Flujo Caja Neto Inversionista"]
+
+    # La TIR del caso base (variación 0%) sirve de arranque para las variaciones vecinas
+    fila_base = [variacion for _, variacion in etiquetas].index(0.0)
+    tir_base = _resolver_tir(flujos_inv[fila_base])
+    tir_inv = TIR_anual_batch(flujos_inv, tir_inicial=tir_base)
+
+    resultados_sensibilidad = []
+    for (nombre_variable, variacion), p_test, flujo_inv_test, tir_inv_test, convergido in zip(
+            etiquetas, escenarios_test, flujos_inv, tir_inv["tir_anual_equivalente"], tir_inv["converged"]):
+        costo_capital_test = p_test.financiamiento.costo_capital_propio_anual
+        van_inv_test = VAN(flujo_inv_test, costo_capital_test)
+        tir_inv_test = float(tir_inv_test) if convergido else None
+        
+        resultados_sensibilidad.append({
+            "Variable": nombre_variable,
+            "Variación": f"{variacion:.0%}",
+            "VAN Inversionista": van_inv_test,
+            "TIR Inversionista": tir_inv_test
+        })
 
     df_sensibilidad = pd.DataFrame(resultados_sensibilidad)
     
@@ -728,10 +2491,1304 @@ def analisis_de_sensibilidad(p_base):
     print(df_pivot_tir.to_string(float_format="{:.2%}".format))
     print("="*70)
 
+# ------------------------------------------------------------------------------
+# 5.1 Recálculo incremental: grafo de dependencias del modelo
+# ------------------------------------------------------------------------------
+
+def _leer_ruta(p, ruta):
+    """Valor de p[ruta[0]][ruta[1]]...; None si alguna clave no existe."""
+    valor = p
+    for clave in ruta:
+        try:
+            valor = valor[clave]
+        except (KeyError, IndexError, TypeError):
+            return None
+    return valor
+
+class GrafoModelo:
+    """
+    Pipeline del modelo como grafo de nodos con nombre y marcado de nodos sucios.
+
+    Cada nodo declara los nodos de los que depende y las rutas de parámetros que lee.
+    `actualizar(p)` compara la huella canónica de esas rutas con la anterior y marca sucios
+    sólo los nodos cuyos parámetros cambiaron y todo lo que está aguas abajo de ellos;
+    `obtener(nombre)` recalcula perezosamente lo sucio y reutiliza el resto.
+
+    Los nodos se agregan en orden topológico (sus dependencias deben existir antes) y
+    pueden leer `proyecto`, los parámetros compilados una sola vez por `actualizar`.
+    Un cálculo cancelado (CalculoCancelado) deja el grafo consistente: lo ya recalculado
+    queda válido y el resto sigue sucio.
+    """
+
+    def __init__(self):
+        self._nodos = {}
+        self._valores = {}
+        self._huellas = {}
+        self._sucios = set()
+        self.params = None
+        self._proyecto = None
+        self.recalculados = []
+        self.cancelado = None
+
+    def agregar(self, nombre, funcion, depende_de=(), parametros=()):
+        """funcion(p, *valores_de_dependencias); parametros: rutas (tuplas) que el nodo lee de p."""
+        for dependencia in depende_de:
+            if dependencia not in self._nodos:
+                raise ValueError(f"Nodo '{nombre}': la dependencia '{dependencia}' no existe")
+        self._nodos[nombre] = (funcion, tuple(depende_de), tuple(tuple(r) for r in parametros))
+        self._sucios.add(nombre)
+        return self
+
+    def __contains__(self, nombre):
+        return nombre in self._nodos
+
+    def aguas_abajo(self, nombres):
+        """Los nodos indicados más todos los que dependen de ellos, directa o indirectamente."""
+        afectados = set(nombres)
+        for nombre, (_, depende_de, _) in self._nodos.items():
+            if any(d in afectados for d in depende_de):
+                afectados.add(nombre)
+        return afectados
+
+    def actualizar(self, p):
+        """
+        Registra un nuevo juego de parámetros y marca sucio lo que corresponda.
+
+        Returns:
+          set con los nodos sucios después de la actualización.
+        """
+        cambiados = set()
+        for nombre, (_, _, rutas) in self._nodos.items():
+            huella = _clave_canonica(*(_leer_ruta(p, ruta) for ruta in rutas))
+            if self._huellas.get(nombre) != huella:
+                self._huellas[nombre] = huella
+                cambiados.add(nombre)
+        self._sucios |= self.aguas_abajo(cambiados)
+        self.params = p
+        self._proyecto = None
+        self.recalculados = []
+        return set(self._sucios)
+
+    @property
+    def proyecto(self):
+        """ProyectoCompilado de los parámetros actuales (se compila al primer uso)."""
+        if self._proyecto is None:
+            self._proyecto = compilar_proyecto(self.params)
+        return self._proyecto
+
+    def invalidar(self, *nombres):
+        self._sucios |= self.aguas_abajo(nombres)
+
+    def obtener(self, nombre):
+        if nombre in self._sucios or nombre not in self._valores:
+            funcion, depende_de, _ = self._nodos[nombre]
+            argumentos = [self.obtener(d) for d in depende_de]
+            _revisar_cancelacion(self.cancelado)
+            self._valores[nombre] = funcion(self.params, *argumentos)
+            self._sucios.discard(nombre)
+            self.recalculados.append(nombre)
+        return self._valores[nombre]
+
+    def evaluar(self, nombres=None, cancelado=None, al_avanzar=None):
+        """
+        Valores de los nodos pedidos (por defecto todos), recalculando sólo lo sucio.
+
+        Parameters:
+          cancelado: función sin argumentos revisada antes de cada nodo (y por los nodos
+            largos, como la sensibilidad); si devuelve True se lanza CalculoCancelado.
+          al_avanzar: al_avanzar(nombre, hechos, total) tras obtener cada nodo pedido.
+        """
+        nombres = list(nombres or self._nodos)
+        valores = {}
+        self.cancelado = cancelado
+        try:
+            for hechos, nombre in enumerate(nombres, start=1):
+                valores[nombre] = self.obtener(nombre)
+                if al_avanzar is not None:
+                    al_avanzar(nombre, hechos, len(nombres))
+        finally:
+            self.cancelado = None
+        return valores
+
+_RUTAS_DEUDA = [
+    ("horizonte_meses",), ("financiamiento", "monto_deuda"), ("financiamiento", "costo_deuda_anual"),
+    ("financiamiento", "plazo_deuda_meses"), ("financiamiento", "capitalizacion"),
+]
+
+def _tabla_sensibilidad(etiquetas, valores):
+    """Pivot Variable x variación (etiqueta "+10%") de un valor por escenario."""
+    df = pd.DataFrame({
+        "Variable": [nombre for nombre, _ in etiquetas],
+        "Var": [f"{variacion:+.0%}" for _, variacion in etiquetas],
+        "Valor": valores,
+    })
+    return df.pivot(index="Variable", columns="Var", values="Valor")
+
+def construir_grafo_modelo(escenarios_sensibilidad=None, variaciones=None):
+    """
+    Grafo estándar del modelo:
+
+      inversion_total, capex, deuda, ventas, opex -> flujos (impuestos, FCFF, FCFE)
+      -> fcff, fcfe -> wacc, van/tir del proyecto y del inversionista, paybacks, rentabilidad
+      -> (opcional) sensibilidad_flujos -> sensibilidad_van, sensibilidad_tir
+
+    Así, p.ej., cambiar costo_capital_propio_anual sólo recalcula wacc, los VAN, el payback
+    descontado y los VAN de la sensibilidad; la proyección mensual se reutiliza.
+
+    Parameters:
+      escenarios_sensibilidad, variaciones: como en `construir_escenarios_sensibilidad`;
+        si se omiten, el grafo no incluye los nodos de sensibilidad.
+    """
+    g = GrafoModelo()
+    # Los nodos trabajan sobre g.proyecto: los parámetros se compilan una vez por evaluación
+    def monto_deuda():
+        return g.proyecto.exigir("financiamiento.monto_deuda").financiamiento.monto_deuda
+
+    g.agregar("inversion_total", lambda p: g.proyecto.inversion_total, parametros=[("cronograma_inversion",)])
+    g.agregar("capex", lambda p: _cronograma_inversiones(g.proyecto),
+              parametros=[("horizonte_meses",), ("cronograma_inversion",)])
+    g.agregar("deuda", lambda p: _tabla_amortizacion(g.proyecto, monto_deuda()), parametros=_RUTAS_DEUDA)
+    g.agregar("ventas", lambda p: _etapa_ventas(g.proyecto),
+              parametros=[("horizonte_meses",), ("ventas",), ("planes_venta",)])
+    g.agregar("opex", lambda p, ventas: _etapa_operativa(g.proyecto, ventas),
+              depende_de=["ventas"], parametros=[("items_periodicos",)])
+    # "flujos" (ResultadoModelo) lee ventas y opex desde cache_etapas (mismas claves que los nodos)
+    g.agregar("flujos", lambda p, capex, deuda, ventas, opex: evaluar_proyecto(
+                  g.proyecto, monto_deuda(), capex, deuda, metricas=False),
+              depende_de=["capex", "deuda", "ventas", "opex"],
+              parametros=[("financiamiento", "tasa_impuesto_renta"), ("financiamiento", "monto_deuda")])
+    g.agregar("fcff", lambda p, modelo: modelo.fcff, depende_de=["flujos"])
+    g.agregar("fcfe", lambda p, modelo: modelo.fcfe, depende_de=["flujos"])
+
+    def wacc(p, inversion_total):
+        f = g.proyecto.exigir("financiamiento.monto_deuda", "financiamiento.costo_capital_propio_anual").financiamiento
+        porcentaje = f.monto_deuda / inversion_total if inversion_total > 0 else 0
+        return _wacc(f, porcentaje)
+
+    g.agregar("wacc", wacc, depende_de=["inversion_total"], parametros=[
+        ("financiamiento", "monto_deuda"), ("financiamiento", "costo_deuda_anual"),
+        ("financiamiento", "costo_capital_propio_anual"), ("financiamiento", "tasa_impuesto_renta"),
+    ])
+    g.agregar("van_proyecto", lambda p, fcff, tasa: VAN(fcff, tasa), depende_de=["fcff", "wacc"])
+    g.agregar("tir_proyecto", lambda p, fcff: TIR_anual(fcff), depende_de=["fcff"])
+    g.agregar("van_inversionista", lambda p, fcfe: VAN(fcfe, p["financiamiento"]["costo_capital_propio_anual"]),
+              depende_de=["fcfe"], parametros=[("financiamiento", "costo_capital_propio_anual")])
+    g.agregar("tir_inversionista", lambda p, fcfe: TIR_anual(fcfe, return_structure=True), depende_de=["fcfe"])
+    g.agregar("payback_normal", lambda p, fcfe: payback_normal(fcfe), depende_de=["fcfe"])
+    g.agregar("payback_descontado", lambda p, fcfe, tasa: payback_descontado(fcfe, tasa), depende_de=["fcfe", "wacc"])
+    g.agregar("rentabilidad", lambda p, modelo: {clave: modelo.kpis[clave] for clave in ("roi_total", "multiplo_capital")},
+              depende_de=["flujos"])
+    g.agregar("total_intereses", lambda p, deuda: calcular_total_intereses(deuda), depende_de=["deuda"])
+
+    if escenarios_sensibilidad:
+        def sensibilidad_flujos(p, _flujos):
+            etiquetas, escenarios_test = construir_escenarios_sensibilidad(p, escenarios_sensibilidad, variaciones)
+            # En el mismo proceso: el grafo corre en el hilo de cálculo de la GUI (no se debe
+            # hacer fork de un proceso Tk con hilos) y reutiliza las etapas de cache_etapas
+            columnas, _ = generar_modelo_financiero_paralelo(
+                escenarios_test, columnas=("FCF Apalancado (FCFE)",), max_workers=1, cancelado=g.cancelado)
+            return etiquetas, columnas["FCF Apalancado (FCFE)"]
+
+        def sensibilidad_tir(p, sens, tir_base):
+            etiquetas, flujos = sens
+            tir = TIR_anual_batch(flujos, tir_inicial=tir_base["tir_mensual"])
+            valores = np.where(tir["converged"], tir["tir_anual_equivalente"], np.nan)
+            return _tabla_sensibilidad(etiquetas, valores)
+
+        def sensibilidad_van(p, sens):
+            etiquetas, flujos = sens
+            return _tabla_sensibilidad(etiquetas, VAN_matriz(flujos, p["financiamiento"]["costo_capital_propio_anual"]))
+
+        # Los flujos de las variaciones dependen de los mismos insumos que "flujos"
+        g.agregar("sensibilidad_flujos", sensibilidad_flujos, depende_de=["flujos"])
+        g.agregar("sensibilidad_tir", sensibilidad_tir, depende_de=["sensibilidad_flujos", "tir_inversionista"])
+        g.agregar("sensibilidad_van", sensibilidad_van, depende_de=["sensibilidad_flujos"],
+                  parametros=[("financiamiento", "costo_capital_propio_anual")])
+    return g
+
+# ------------------------------------------------------------------------------
+# 5.2 Simulación Monte Carlo
+# ------------------------------------------------------------------------------
+# Cada variable incierta es un multiplicador del valor base (como el 1 + variación de la
+# sensibilidad) muestreado de una distribución. Las muestras se evalúan por bloques con el
+# motor por lotes, sin construir un proyecto por muestra, y los resultados se agregan en
+# histogramas de tamaño fijo: la memoria no crece con la cantidad de simulaciones.
+
+class HistogramaStreaming:
+    """
+    Distribución aproximada de una o varias series con memoria fija.
+
+    Cada serie tiene `bins` cubetas de igual ancho más conteo, media, varianza (fusión de
+    Chan), mínimo y máximo exactos. El primer bloque define el rango; si llega un valor
+    fuera de él, el ancho de las cubetas de esa serie se duplica (fusionando pares vecinos)
+    hasta cubrirlo. Los valores no finitos (TIR sin solución, payback no alcanzado) se
+    cuentan aparte en `nulos`.
+
+    Con una sola serie las propiedades y `percentiles` devuelven escalares.
+    """
+
+    def __init__(self, series=1, bins=1024):
+        if bins < 2 or bins % 2:
+            raise ValueError("bins debe ser un entero par >= 2")
+        self.bins = bins
+        self.conteos = np.zeros((series, bins), dtype=np.int64)
+        self.inicio = np.zeros(series)
+        self.ancho = np.zeros(series)  # 0 = la serie todavía no tiene rango
+        self._n = np.zeros(series, dtype=np.int64)
+        self._nulos = np.zeros(series, dtype=np.int64)
+        self._media = np.zeros(series)
+        self._m2 = np.zeros(series)
+        self._minimo = np.full(series, np.inf)
+        self._maximo = np.full(series, -np.inf)
+
+    def _forma(self, valores):
+        return valores[..., 0] if self.conteos.shape[0] == 1 else valores
+
+    @property
+    def n(self):
+        return self._forma(self._n)
+
+    @property
+    def nulos(self):
+        return self._forma(self._nulos)
+
+    @property
+    def media(self):
+        return self._forma(np.where(self._n > 0, self._media, np.nan))
+
+    @property
+    def desviacion(self):
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return self._forma(np.where(self._n > 1, np.sqrt(self._m2 / (self._n - 1)), np.nan))
+
+    @property
+    def minimo(self):
+        return self._forma(np.where(self._n > 0, self._minimo, np.nan))
+
+    @property
+    def maximo(self):
+        return self._forma(np.where(self._n > 0, self._maximo, np.nan))
+
+    @property
+    def nbytes(self):
+        return sum(a.nbytes for a in (self.conteos, self.inicio, self.ancho, self._n, self._nulos,
+                                       self._media, self._m2, self._minimo, self._maximo))
+
+    def agregar(self, valores):
+        """Agrega un bloque: array (m,) con una serie o (m, series)."""
+        series, bins = self.conteos.shape
+        x = np.asarray(valores, dtype=float).reshape(-1, series)
+        finito = np.isfinite(x)
+        cuenta = finito.sum(axis=0)
+        self._nulos += x.shape[0] - cuenta
+        if not cuenta.any():
+            return self
+
+        x = np.where(finito, x, 0.0)
+        media_bloque = x.sum(axis=0) / np.maximum(cuenta, 1)
+        m2_bloque = np.where(finito, (x - media_bloque) ** 2, 0.0).sum(axis=0)
+        total = self._n + cuenta
+        delta = media_bloque - self._media
+        peso = cuenta / np.maximum(total, 1)
+        self._media += delta * peso
+        self._m2 += m2_bloque + delta ** 2 * self._n * peso
+        self._n = total
+
+        bajo = np.where(finito, x, np.inf).min(axis=0)
+        alto = np.where(finito, x, -np.inf).max(axis=0)
+        self._minimo = np.minimum(self._minimo, bajo)
+        self._maximo = np.maximum(self._maximo, alto)
+        self._cubrir(bajo, alto, cuenta > 0)
+
+        with np.errstate(invalid="ignore", over="ignore"):
+            cubeta = np.floor((x - self.inicio) / np.where(self.ancho > 0, self.ancho, 1.0))
+        cubeta = np.clip(np.nan_to_num(cubeta), 0, bins - 1).astype(np.int64) + np.arange(series) * bins
+        self.conteos += np.bincount(cubeta[finito], minlength=series * bins).reshape(series, bins)
+        return self
+
+    def _cubrir(self, bajo, alto, con_datos):
+        """Ajusta el rango de cada serie con datos para que incluya [bajo, alto]."""
+        bins = self.bins
+        nuevas = con_datos & (self.ancho == 0)
+        rango = alto - bajo
+        self.inicio[nuevas] = bajo[nuevas]
+        self.ancho[nuevas] = np.where(rango > 0, rango * (1 + 1e-9) / bins, np.maximum(np.abs(bajo), 1.0) * 1e-9)[nuevas]
+        for j in np.flatnonzero(con_datos):
+            while bajo[j] < self.inicio[j] or alto[j] >= self.inicio[j] + bins * self.ancho[j]:
+                fusion = self.conteos[j, 0::2] + self.conteos[j, 1::2]
+                self.conteos[j] = 0
+                if bajo[j] < self.inicio[j]:
+                    # El rango viejo pasa a ser la mitad superior
+                    self.conteos[j, bins // 2:] = fusion
+                    self.inicio[j] -= bins * self.ancho[j]
+                else:
+                    self.conteos[j, :bins // 2] = fusion
+                self.ancho[j] *= 2
+
+    def percentiles(self, q):
+        """
+        Percentiles aproximados (q de 0 a 100, escalar o secuencia) interpolando dentro de
+        la cubeta; el error es a lo sumo el ancho de una cubeta. NaN en series sin datos.
+
+        Returns:
+          array (len(q), series), sin los ejes recibidos como escalar o serie única.
+        """
+        q_arr = np.asarray(q, dtype=float)
+        fracciones = np.atleast_1d(q_arr) / 100.0
+        series, bins = self.conteos.shape
+        valores = np.full((fracciones.size, series), np.nan)
+        acumulado = np.cumsum(self.conteos, axis=1)
+        for j in np.flatnonzero(self._n > 0):
+            objetivo = fracciones * self._n[j]
+            cubeta = np.minimum(np.searchsorted(acumulado[j], objetivo, side="left"), bins - 1)
+            previo = np.where(cubeta > 0, acumulado[j, cubeta - 1], 0)
+            en_cubeta = self.conteos[j, cubeta]
+            fraccion = np.divide(objetivo - previo, en_cubeta, out=np.zeros_like(objetivo), where=en_cubeta > 0)
+            valores[:, j] = np.clip(self.inicio[j] + (cubeta + fraccion) * self.ancho[j], self._minimo[j], self._maximo[j])
+        valores = self._forma(valores)
+        return valores[0] if q_arr.ndim == 0 else valores
+
+    def fraccion_bajo(self, umbral):
+        """Fracción aproximada de los valores finitos menores que `umbral` (NaN sin datos)."""
+        series, bins = self.conteos.shape
+        fraccion = np.full(series, np.nan)
+        acumulado = np.cumsum(self.conteos, axis=1)
+        for j in np.flatnonzero(self._n > 0):
+            posicion = np.clip((umbral - self.inicio[j]) / self.ancho[j], 0, bins)
+            cubeta = min(int(posicion), bins - 1)
+            previo = acumulado[j, cubeta - 1] if cubeta > 0 else 0
+            fraccion[j] = (previo + self.conteos[j, cubeta] * (posicion - cubeta)) / self._n[j]
+        return self._forma(fraccion)
+
+# Distribuciones de los multiplicadores: (nombre, parámetros...) -> muestras
+_DISTRIBUCIONES = {
+    "normal": lambda rng, n, media, desviacion: rng.normal(media, desviacion, n),
+    "uniforme": lambda rng, n, minimo, maximo: rng.uniform(minimo, maximo, n),
+    "triangular": lambda rng, n, minimo, moda, maximo: rng.triangular(minimo, moda, maximo, n),
+    "lognormal": lambda rng, n, media_log, desviacion_log: rng.lognormal(media_log, desviacion_log, n),
+}
+
+METRICAS_MONTE_CARLO = [
+    "van_proyecto", "tir_proyecto", "van_inversionista", "tir_inversionista",
+    "payback_normal", "payback_descontado", "multiplo_capital",
+]
+
+def _indices_ruta(nombre, ruta, cantidad):
+    """Índices de plan/ítem de una ruta: todos si la ruta no trae índice, o el indicado."""
+    if len(ruta) == 2:
+        return np.arange(cantidad)
+    indice = ruta[1]
+    if not isinstance(indice, numbers.Integral) or not 0 <= indice < cantidad:
+        raise ValueError(f"{nombre}: índice {indice!r} fuera de rango en {ruta!r}")
+    return np.array([indice])
+
+def _resolver_variables(s, variables):
+    """
+    Traduce {nombre: (ruta, distribución)} a una lista de (destino, índices, distribución,
+    parámetros) sobre el proyecto compilado; índices es None para los destinos escalares.
+    """
+    resueltas = []
+    for nombre, (ruta, distribucion) in variables.items():
+        ruta = tuple(ruta)
+        tipo, *argumentos = distribucion
+        if tipo not in _DISTRIBUCIONES:
+            raise ValueError(f"{nombre}: distribución desconocida {tipo!r} (opciones: {', '.join(_DISTRIBUCIONES)})")
+        try:
+            _DISTRIBUCIONES[tipo](np.random.default_rng(0), 1, *argumentos)
+        except (TypeError, ValueError) as e:
+            raise ValueError(f"{nombre}: parámetros inválidos para {tipo!r}: {e}") from None
+
+        if ruta == ("ventas", "crecimiento_precio_anual"):
+            destino, indices = "crecimiento", None
+        elif ruta == ("financiamiento", "costo_deuda_anual"):
+            destino, indices = "tasa_deuda", None
+        elif ruta[0] == "planes_venta" and ruta[-1] == "velocidad" and len(ruta) in (2, 3):
+            destino, indices = "velocidad", _indices_ruta(nombre, ruta, len(s.planes_venta))
+        elif ruta[0] == "items_periodicos" and ruta[-1] == "monto" and len(ruta) in (2, 3):
+            destino, indices = "items", _indices_ruta(nombre, ruta, len(s.items_periodicos))
+        elif ruta[0] == "cronograma_inversion" and len(ruta) == 2:
+            destino = "capex"
+            indices = np.array([k for k, evento in enumerate(s.inversiones) if evento.tag == ruta[1]], dtype=int)
+            if indices.size == 0:
+                raise ValueError(f"{nombre}: ninguna inversión tiene tag_sensibilidad {ruta[1]!r}")
+        else:
+            raise ValueError(f"{nombre}: ruta no soportada {ruta!r}")
+        resueltas.append((destino, indices, tipo, tuple(argumentos)))
+    return resueltas
+
+def _simular_bloque(tarea):
+    """
+    Tarea de un bloque (en serie o en un proceso del pool): muestrea los multiplicadores
+    con su propia semilla, evalúa el bloque con el motor por lotes y devuelve sólo arrays.
+
+    Returns:
+      ({métrica: array (n,)}, fcfe (n, horizonte + 1))
+    """
+    s, resueltas, n, semilla, tir_base = tarea
+    rng = np.random.default_rng(semilla)
+    f = s.financiamiento
+    horizonte = s.horizonte_meses
+    mult = {
+        "crecimiento": np.ones(n), "tasa_deuda": np.ones(n),
+        "velocidad": np.ones((n, len(s.planes_venta))), "items": np.ones((n, len(s.items_periodicos))),
+        "capex": np.ones((n, len(s.inversiones))),
+    }
+    for destino, indices, tipo, argumentos in resueltas:
+        muestra = _DISTRIBUCIONES[tipo](rng, n, *argumentos)
+        if indices is None:
+            mult[destino] *= muestra
+        else:
+            mult[destino][:, indices] *= muestra[:, None]
+
+    # CAPEX e inversión total por muestra (mismo recorrido que `_capex_batch`)
+    montos = mult["capex"] * np.array([evento.monto for evento in s.inversiones])
+    capex = np.zeros((n, horizonte + 1))
+    for k, evento in enumerate(s.inversiones):
+        if evento.mes > horizonte:
+            break
+        capex[:, evento.mes] += montos[:, k]
+    inversion_total = montos.sum(axis=1)
+
+    tasas_deuda = f.costo_deuda_anual * mult["tasa_deuda"]
+    cubo = calcular_amortizacion_batch(f.monto_deuda, tasas_deuda, f.plazo_deuda_meses, int(f.capitalizacion), horizonte)
+
+    lista = [s] * n
+    velocidades = np.maximum(mult["velocidad"] * np.array([plan.velocidad for plan in s.planes_venta]), 0.0)
+    lotes_vendidos, cobros_pies, cobros_cuotas, total_lotes = _proyectar_ventas_batch(
+        lista, horizonte, velocidades=velocidades, crecimientos=s.crecimiento_precio_anual * mult["crecimiento"])
+    inventario = total_lotes[:, None] - np.cumsum(lotes_vendidos, axis=1)
+    operativo = _proyeccion_operativa_batch(lista, cobros_pies + cobros_cuotas, inventario, horizonte, mult["items"])
+    col, kpis = _ensamblar_bloque_batch(
+        np.full(n, f.monto_deuda), np.full(n, f.tasa_impuesto_renta), capex, (cubo[1], cubo[2], cubo[3]),
+        (lotes_vendidos, cobros_pies, cobros_cuotas, inventario), operativo,
+    )
+
+    fcff = col["FCF No Apalancado (FCFF)"]
+    fcfe = col["FCF Apalancado (FCFE)"]
+    ke, t = f.costo_capital_propio_anual, f.tasa_impuesto_renta
+    porcentaje = np.divide(f.monto_deuda, inversion_total, out=np.zeros(n), where=inversion_total > 0)
+    wacc = np.where(porcentaje > 0, (1 - porcentaje) * ke + porcentaje * tasas_deuda * (1 - t), ke)
+    tir_proyecto = TIR_anual_batch(fcff)
+    tir_inversionista = TIR_anual_batch(fcfe, tir_inicial=tir_base)
+    metricas = {
+        "van_proyecto": VAN_filas(fcff, wacc),
+        "tir_proyecto": np.where(tir_proyecto["converged"], tir_proyecto["tir_anual_equivalente"], np.nan),
+        "van_inversionista": VAN_matriz(fcfe, ke),
+        "tir_inversionista": np.where(tir_inversionista["converged"], tir_inversionista["tir_anual_equivalente"], np.nan),
+        "payback_normal": payback_batch(fcfe),
+        "payback_descontado": payback_batch(fcfe, wacc),
+        "multiplo_capital": kpis["multiplo_capital"],
+    }
+    return metricas, fcfe
+
+def simular_monte_carlo(p, variables, n_simulaciones=100_000, semilla=None, simulaciones_por_bloque=2_000,
+                        max_workers=None, bins=1024, cancelado=None, al_avanzar=None):
+    """
+    Simulación Monte Carlo del modelo con agregación en streaming.
+
+    Parameters:
+      variables: {nombre: (ruta, distribución)}. Cada muestra es un multiplicador del valor
+        base; la misma muestra se aplica a todo lo que cubre la ruta:
+          ("ventas", "crecimiento_precio_anual"), ("financiamiento", "costo_deuda_anual"),
+          ("planes_venta", "velocidad") o ("planes_venta", i, "velocidad"),
+          ("items_periodicos", "monto") o ("items_periodicos", i, "monto"),
+          ("cronograma_inversion", tag): las inversiones con ese tag_sensibilidad.
+        distribución: ("normal", media, desv), ("uniforme", min, max),
+        ("triangular", min, moda, max) o ("lognormal", media_log, desv_log).
+      semilla: entero o None. Cada bloque usa su propio hijo de SeedSequence(semilla).spawn,
+        así que el resultado no depende de cuántos procesos se usen.
+      simulaciones_por_bloque: muestras evaluadas juntas (memoria por bloque ~ 30 x 8 bytes x
+        muestras x meses). Con la misma semilla, cambiarlo cambia las muestras.
+      max_workers: procesos; por defecto os.cpu_count(). Con 1 se evalúa en serie.
+      bins: cubetas de cada HistogramaStreaming.
+      cancelado: función sin argumentos; si devuelve True entre bloques se lanza CalculoCancelado.
+      al_avanzar: función (simulaciones_hechas, n_simulaciones) llamada tras cada bloque.
+
+    La deuda de todas las muestras es financiamiento.monto_deuda (como en la GUI y el grafo):
+    si una variable mueve las inversiones, el monto prestado no la sigue y el cambio lo
+    absorbe el capital propio. `indices_sobol` usa la misma convención.
+
+    Returns:
+      dict con "simulaciones", "semilla" (entropía de la SeedSequence, para repetir la corrida),
+      "metricas" ({nombre de METRICAS_MONTE_CARLO: HistogramaStreaming}) y "fcfe_mensual"
+      (HistogramaStreaming con una serie por mes, para bandas de percentiles).
+    """
+    from concurrent.futures import ProcessPoolExecutor
+    from concurrent.futures.process import BrokenProcessPool
+
+    s = compilar_proyecto(p).exigir(
+        "financiamiento.monto_deuda", "financiamiento.tasa_impuesto_renta",
+        "financiamiento.costo_capital_propio_anual", *_CAMPOS_DEUDA,
+    )
+    resueltas = _resolver_variables(s, variables)
+    if n_simulaciones < 1 or simulaciones_por_bloque < 1:
+        raise ValueError("n_simulaciones y simulaciones_por_bloque deben ser >= 1")
+
+    secuencia = np.random.SeedSequence(semilla)
+    n_bloques = -(-n_simulaciones // simulaciones_por_bloque)
+    tamanos = [min(simulaciones_por_bloque, n_simulaciones - b * simulaciones_por_bloque) for b in range(n_bloques)]
+    # La TIR del caso base sirve de arranque para todas las muestras
+    tir_base = _resolver_tir(evaluar_proyecto(s, metricas=False).fcfe)
+    tareas = [(s, resueltas, n, hija, tir_base) for n, hija in zip(tamanos, secuencia.spawn(n_bloques))]
+
+    def agregar(bloques):
+        metricas = {nombre: HistogramaStreaming(bins=bins) for nombre in METRICAS_MONTE_CARLO}
+        fcfe_mensual = HistogramaStreaming(series=s.horizonte_meses + 1, bins=bins)
+        hechas = 0
+        for valores, fcfe in bloques:
+            for nombre, histograma in metricas.items():
+                histograma.agregar(valores[nombre])
+            fcfe_mensual.agregar(fcfe)
+            hechas += len(fcfe)
+            if al_avanzar is not None:
+                al_avanzar(hechas, n_simulaciones)
+        return {"simulaciones": hechas, "semilla": secuencia.entropy, "metricas": metricas, "fcfe_mensual": fcfe_mensual}
+
+    max_workers = max(1, min(max_workers or os.cpu_count() or 1, n_bloques))
+    if max_workers > 1:
+        try:
+            with ProcessPoolExecutor(max_workers=max_workers) as pool:
+                def en_pool():
+                    # Ventana acotada de bloques en vuelo, agregados en orden de bloque: los
+                    # histogramas no dependen de qué proceso termina primero
+                    en_vuelo = deque()
+                    for tarea in tareas:
+                        en_vuelo.append(pool.submit(_simular_bloque, tarea))
+                        if len(en_vuelo) >= 2 * max_workers:
+                            yield _esperar_resultados(pool, [en_vuelo.popleft()], cancelado)[0]
+                    while en_vuelo:
+                        yield _esperar_resultados(pool, [en_vuelo.popleft()], cancelado)[0]
+                return agregar(en_pool())
+        except (OSError, NotImplementedError, BrokenProcessPool):
+            pass  # Entorno sin procesos disponibles: se repite en serie
+
+    def en_serie():
+        for tarea in tareas:
+            _revisar_cancelacion(cancelado)
+            yield _simular_bloque(tarea)
+    return agregar(en_serie())
+
+def resumen_monte_carlo(resultado, percentiles=(5, 50, 95)):
+    """DataFrame métrica x (media, desviación, percentiles, % sin valor) de `simular_monte_carlo`."""
+    filas = {}
+    for nombre, histograma in resultado["metricas"].items():
+        fila = {"Media": histograma.media, "Desv.": histograma.desviacion}
+        for q, valor in zip(percentiles, np.atleast_1d(histograma.percentiles(percentiles))):
+            fila[f"P{q:g}"] = valor
+        fila["Sin valor"] = histograma.nulos / resultado["simulaciones"]
+        filas[nombre] = fila
+    return pd.DataFrame.from_dict(filas, orient="index")
+
+def analisis_monte_carlo(p_base, n_simulaciones=20_000, semilla=2024, max_workers=None):
+    print("\n" + "="*70)
+    print(" SIMULACIÓN MONTE CARLO")
+    print("="*70)
+
+    variables = {
+        "Crecimiento Precio": (("ventas", "crecimiento_precio_anual"), ("triangular", 0.6, 1.0, 1.2)),
+        "Velocidad de Venta": (("planes_venta", "velocidad"), ("triangular", 0.6, 1.0, 1.15)),
+        "Tasa Préstamo": (("financiamiento", "costo_deuda_anual"), ("normal", 1.0, 0.10)),
+        "Costo Urbanización": (("cronograma_inversion", "costo_urbanizacion"), ("lognormal", 0.0, 0.10)),
+    }
+    resultado = simular_monte_carlo(p_base, variables, n_simulaciones, semilla=semilla, max_workers=max_workers)
+    resumen = resumen_monte_carlo(resultado)
+
+    print(f"\n--- {resultado['simulaciones']:,} simulaciones (semilla {resultado['semilla']}) ---")
+    formatos = {"van_proyecto": "{:,.0f}", "van_inversionista": "{:,.0f}", "tir_proyecto": "{:.2%}",
+                "tir_inversionista": "{:.2%}", "payback_normal": "{:.1f}", "payback_descontado": "{:.1f}",
+                "multiplo_capital": "{:.2f}x"}
+    for nombre, fila in resumen.iterrows():
+        formato = formatos[nombre]
+        valores = "  ".join(f"{col}: {formato.format(fila[col])}" for col in resumen.columns if col.startswith("P"))
+        print(f"{nombre:<20} {valores}  (sin valor: {fila['Sin valor']:.1%})")
+    print(f"Probabilidad de VAN del inversionista < 0: {resultado['metricas']['van_inversionista'].fraccion_bajo(0.0):.1%}")
+    print("="*70)
+
+# ------------------------------------------------------------------------------
+# 5.3 Sensibilidad global: índices de Sobol (esquema de Saltelli)
+# ------------------------------------------------------------------------------
+
+METRICAS_SOBOL = ["VAN Inversionista", "TIR Inversionista"]
+
+def _diseno_unitario(n, dimension, muestreo, semilla):
+    """
+    Puntos en [0, 1)^dimension para el diseño de Saltelli.
+
+    "sobol" usa scipy.stats.qmc (secuencia de Sobol con scrambling; n se redondea a la
+    potencia de 2 siguiente). Si scipy no está instalado se usa "lhs": hipercubo latino,
+    un punto por estrato en cada columna con estratos permutados al azar.
+
+    Returns:
+      (puntos (n, dimension), muestreo efectivamente usado)
+    """
+    rng = np.random.default_rng(semilla)
+    if muestreo == "sobol":
+        try:
+            from scipy.stats import qmc
+        except ImportError:
+            muestreo = "lhs"
+        else:
+            try:
+                generador = qmc.Sobol(dimension, scramble=True, rng=rng)
+            except TypeError:  # scipy < 1.15
+                generador = qmc.Sobol(dimension, scramble=True, seed=rng)
+            return generador.random_base2(max(0, int(np.ceil(np.log2(n))))), muestreo
+    if muestreo == "lhs":
+        estratos = np.argsort(rng.random((n, dimension)), axis=0)
+        return (estratos + rng.random((n, dimension))) / n, muestreo
+    if muestreo == "aleatorio":
+        return rng.random((n, dimension)), muestreo
+    raise ValueError(f"muestreo desconocido {muestreo!r} (opciones: sobol, lhs, aleatorio)")
+
+def _resolver_rangos(base, variables):
+    """
+    Valida {nombre: (ruta, (variación_min, variación_max))} contra el proyecto base y
+    devuelve [(ruta, valor_base, variación_min, variación_max)]; valor_base es None para
+    las rutas ("cronograma_inversion", tag), que se aplican como multiplicador de tag.
+    """
+    resueltas = []
+    for nombre, (ruta, (minimo, maximo)) in variables.items():
+        ruta = tuple(ruta)
+        if not minimo <= maximo or minimo <= -1:
+            raise ValueError(f"{nombre}: rango de variación inválido ({minimo}, {maximo})")
+        resueltas.append((ruta, _valor_en_ruta(base, nombre, ruta), float(minimo), float(maximo)))
+    return resueltas
+
+def _con_valor(capa, ruta, valor):
+    """Nueva capa con `ruta` = valor; con ("cronograma_inversion", tag) el valor multiplica esos montos."""
+    if len(ruta) == 2 and ruta[0] == "cronograma_inversion" and isinstance(ruta[1], str):
+        return capa.con(multiplicadores_tag={ruta[1]: valor})
+    return capa.con({ruta: valor})
+
+def _valor_en_ruta(base, nombre, ruta):
+    """
+    Valor numérico de `ruta` en el proyecto base, o None si la ruta es
+    ("cronograma_inversion", tag) y algún ítem tiene ese tag; ValueError en otro caso.
+    """
+    if len(ruta) == 2 and ruta[0] == "cronograma_inversion" and isinstance(ruta[1], str):
+        if not any(item.get("tag_sensibilidad") == ruta[1] for item in base.get("cronograma_inversion", [])):
+            raise ValueError(f"{nombre}: ninguna inversión tiene tag_sensibilidad {ruta[1]!r}")
+        return None
+    valor_base = _leer_ruta(base, ruta)
+    if isinstance(valor_base, bool) or not isinstance(valor_base, numbers.Real):
+        raise ValueError(f"{nombre}: la ruta {ruta!r} no es un valor numérico del proyecto")
+    return valor_base
+
+def _evaluar_bloque_sobol(tarea):
+    """
+    Tarea de un bloque (en serie o en un proceso del pool): arma los escenarios de las
+    matrices A, B y AB_i de sus filas y devuelve {métrica: array (filas, d + 2)} con las
+    columnas [f(A), f(B), f(AB_1), ..., f(AB_d)].
+    """
+    base, resueltas, puntos, tir_base = tarea
+    filas, d = len(puntos), len(resueltas)
+    A, B = puntos[:, :d], puntos[:, d:]
+    matrices = [A, B]
+    for i in range(d):
+        AB = A.copy()
+        AB[:, i] = B[:, i]
+        matrices.append(AB)
+    minimos = np.array([r[2] for r in resueltas])
+    variaciones = minimos + np.vstack(matrices) * (np.array([r[3] for r in resueltas]) - minimos)
+
+    capa = base if isinstance(base, ParametrosOverlay) else ParametrosOverlay(base)
+    escenarios = []
+    for fila in variaciones:
+        cambios, tags = {}, {}
+        for (ruta, valor_base, _, _), variacion in zip(resueltas, fila):
+            if valor_base is None:
+                tags[ruta[1]] = tags.get(ruta[1], 1.0) * (1 + variacion)
+            else:
+                cambios[ruta] = valor_base * (1 + variacion)
+        escenarios.append(compilar_proyecto(capa.con(cambios, tags)).exigir(
+            "financiamiento.monto_deuda", "financiamiento.costo_capital_propio_anual"))
+
+    # Deuda fija en financiamiento.monto_deuda, como en la GUI, el grafo y `simular_monte_carlo`
+    montos_deuda = [s.financiamiento.monto_deuda for s in escenarios]
+    col, _ = generar_modelo_financiero_batch(escenarios, montos_deuda)
+    flujos = col["Flujo Caja Neto Inversionista"]
+    ke = np.array([s.financiamiento.costo_capital_propio_anual for s in escenarios])
+    tir = TIR_anual_batch(flujos, tir_inicial=tir_base)
+    valores = {
+        "VAN Inversionista": VAN_filas(flujos, ke),
+        "TIR Inversionista": np.where(tir["converged"], tir["tir_anual_equivalente"], np.nan),
+    }
+    # Filas apiladas como [A; B; AB_1; ...; AB_d] -> una fila por punto base
+    return {nombre: v.reshape(d + 2, filas).T for nombre, v in valores.items()}
+
+class _AcumuladorSobol:
+    """
+    Sumas en streaming para los estimadores de Saltelli (2010) de primer orden y de Jansen
+    para el efecto total; guarda O(d) números sin importar cuántos puntos se evalúen.
+
+    Las salidas se centran con la media del primer bloque (los estimadores no cambian en
+    esperanza y se evita la cancelación numérica de sumar cuadrados de VANs grandes).
+    """
+
+    def __init__(self, d):
+        self.n = 0
+        self.descartadas = 0
+        self._centro = None
+        self._suma_f = self._suma_f2 = 0.0
+        self._suma_u, self._suma_u2 = np.zeros(d), np.zeros(d)
+        self._suma_w, self._suma_w2 = np.zeros(d), np.zeros(d)
+
+    def agregar(self, valores):
+        completas = np.isfinite(valores).all(axis=1)
+        self.descartadas += int((~completas).sum())
+        valores = valores[completas]
+        if not len(valores):
+            return
+        if self._centro is None:
+            self._centro = float(valores[:, 0].mean())
+        valores = valores - self._centro
+        fA, fB, fAB = valores[:, 0], valores[:, 1], valores[:, 2:]
+        u = fB[:, None] * (fAB - fA[:, None])
+        w = 0.5 * (fA[:, None] - fAB) ** 2
+        self.n += len(valores)
+        self._suma_f += fA.sum() + fB.sum()
+        self._suma_f2 += (fA ** 2).sum() + (fB ** 2).sum()
+        self._suma_u += u.sum(axis=0)
+        self._suma_u2 += (u ** 2).sum(axis=0)
+        self._suma_w += w.sum(axis=0)
+        self._suma_w2 += (w ** 2).sum(axis=0)
+
+    def indices(self, z):
+        """(S1, semiancho S1, ST, semiancho ST); NaN si no hay varianza o faltan puntos."""
+        nan = np.full(len(self._suma_u), np.nan)
+        if self.n < 2:
+            return nan, nan, nan, nan
+        m = 2 * self.n
+        varianza = (self._suma_f2 - self._suma_f ** 2 / m) / (m - 1)
+        if not varianza > 0:
+            return nan, nan, nan, nan
+
+        def estimar(suma, suma2):
+            media = suma / self.n
+            desviacion = np.sqrt(np.maximum(suma2 / self.n - media ** 2, 0.0) * self.n / (self.n - 1))
+            return media / varianza, z * desviacion / np.sqrt(self.n) / varianza
+
+        return (*estimar(self._suma_u, self._suma_u2), *estimar(self._suma_w, self._suma_w2))
+
+def indices_sobol(p, variables, n_base=1024, muestreo="sobol", semilla=None, confianza=0.95,
+                  filas_por_bloque=256, max_workers=None, cancelado=None, al_avanzar=None):
+    """
+    Índices de Sobol de primer orden (S1) y de efecto total (ST) de VAN y TIR del
+    inversionista, con el esquema de Saltelli: n_base x (d + 2) evaluaciones del modelo.
+
+    S1 mide cuánto de la varianza explica la variable sola; ST incluye sus interacciones
+    con las demás (ST - S1 grande = la variable importa sobre todo combinada).
+
+    Parameters:
+      variables: {nombre: (ruta, (variación_min, variación_max))}, con variación uniforme
+        sobre el valor base como en `construir_escenarios_sensibilidad`. La ruta es
+        cualquier valor numérico del proyecto, p.ej. ("financiamiento", "costo_deuda_anual")
+        o ("planes_venta", 0, "velocidad"), o ("cronograma_inversion", tag) para escalar
+        las inversiones con ese tag_sensibilidad.
+      muestreo: "sobol" (requiere scipy; si falta se usa "lhs"), "lhs" o "aleatorio".
+      confianza: nivel de los intervalos (normales por TLC; la varianza total se toma
+        como conocida, así que son algo optimistas con n_base chico).
+      filas_por_bloque: puntos base por tarea; cada tarea evalúa filas x (d + 2) escenarios
+        y el resultado se acumula en sumas, sin guardar la matriz de salidas.
+      max_workers, cancelado, al_avanzar: como en `simular_monte_carlo`.
+
+    La deuda de cada escenario es financiamiento.monto_deuda (salvo que sea una de las
+    variables), como en `simular_monte_carlo`: si una variable mueve las inversiones, el
+    monto prestado no la sigue y el cambio lo absorbe el capital propio.
+
+    Returns:
+      dict con "variables", "muestreo" (el usado), "n_base", "evaluaciones" y "metricas":
+      {métrica de METRICAS_SOBOL: {"S1", "S1_ic", "ST", "ST_ic" (arrays (d,)) y
+      "descartadas" (puntos sin TIR, excluidos del estimador)}}.
+    """
+    from concurrent.futures import ProcessPoolExecutor
+    from concurrent.futures.process import BrokenProcessPool
+    from statistics import NormalDist
+
+    if not variables:
+        raise ValueError("Se requiere al menos una variable")
+    if n_base < 2 or filas_por_bloque < 1:
+        raise ValueError("n_base debe ser >= 2 y filas_por_bloque >= 1")
+    if not 0 < confianza < 1:
+        raise ValueError("confianza debe estar entre 0 y 1")
+    resueltas = _resolver_rangos(p, variables)
+    d = len(resueltas)
+    puntos, muestreo = _diseno_unitario(n_base, 2 * d, muestreo, semilla)
+    n_base = len(puntos)
+
+    tir_base = _resolver_tir(evaluar_proyecto(p, metricas=False).fcfe)
+    tareas = [(p, resueltas, puntos[i:i + filas_por_bloque], tir_base) for i in range(0, n_base, filas_por_bloque)]
+
+    def acumular(bloques):
+        acumuladores = {nombre: _AcumuladorSobol(d) for nombre in METRICAS_SOBOL}
+        hechas = 0
+        for valores in bloques:
+            for nombre, acumulador in acumuladores.items():
+                acumulador.agregar(valores[nombre])
+            hechas += len(valores[METRICAS_SOBOL[0]])
+            if al_avanzar is not None:
+                al_avanzar(hechas * (d + 2), n_base * (d + 2))
+        z = NormalDist().inv_cdf(0.5 + confianza / 2)
+        metricas = {}
+        for nombre, acumulador in acumuladores.items():
+            s1, s1_ic, st, st_ic = acumulador.indices(z)
+            metricas[nombre] = {"S1": s1, "S1_ic": s1_ic, "ST": st, "ST_ic": st_ic,
+                                "descartadas": acumulador.descartadas}
+        return {"variables": list(variables), "muestreo": muestreo, "n_base": n_base,
+                "evaluaciones": n_base * (d + 2), "metricas": metricas}
+
+    max_workers = max(1, min(max_workers or os.cpu_count() or 1, len(tareas)))
+    if max_workers > 1:
+        try:
+            with ProcessPoolExecutor(max_workers=max_workers) as pool:
+                def en_pool():
+                    en_vuelo = deque()
+                    for tarea in tareas:
+                        en_vuelo.append(pool.submit(_evaluar_bloque_sobol, tarea))
+                        if len(en_vuelo) >= 2 * max_workers:
+                            yield _esperar_resultados(pool, [en_vuelo.popleft()], cancelado)[0]
+                    while en_vuelo:
+                        yield _esperar_resultados(pool, [en_vuelo.popleft()], cancelado)[0]
+                return acumular(en_pool())
+        except (OSError, NotImplementedError, BrokenProcessPool):
+            pass  # Entorno sin procesos disponibles: se repite en serie
+
+    def en_serie():
+        for tarea in tareas:
+            _revisar_cancelacion(cancelado)
+            yield _evaluar_bloque_sobol(tarea)
+    return acumular(en_serie())
+
+def resumen_sobol(resultado):
+    """DataFrame (métrica, variable) x (S1, ±S1, ST, ±ST) de `indices_sobol`."""
+    filas = {}
+    for metrica, indices in resultado["metricas"].items():
+        for k, variable in enumerate(resultado["variables"]):
+            filas[(metrica, variable)] = {"S1": indices["S1"][k], "±S1": indices["S1_ic"][k],
+                                          "ST": indices["ST"][k], "±ST": indices["ST_ic"][k]}
+    return pd.DataFrame.from_dict(filas, orient="index")
+
+def analisis_sensibilidad_global(p_base, n_base=1024, semilla=2024, max_workers=None):
+    print("\n" + "="*70)
+    print(" SENSIBILIDAD GLOBAL (ÍNDICES DE SOBOL)")
+    print("="*70)
+
+    variables = {
+        "Crecimiento Precio": (("ventas", "crecimiento_precio_anual"), (-0.20, 0.20)),
+        "Velocidad Preventa": (("planes_venta", 0, "velocidad"), (-0.20, 0.20)),
+        "Tasa Préstamo": (("financiamiento", "costo_deuda_anual"), (-0.20, 0.20)),
+        "Costo Urbanización": (("cronograma_inversion", "costo_urbanizacion"), (-0.20, 0.20)),
+    }
+    resultado = indices_sobol(p_base, variables, n_base, semilla=semilla, max_workers=max_workers)
+    resumen = resumen_sobol(resultado)
+
+    print(f"\n--- {resultado['evaluaciones']:,} evaluaciones ({resultado['muestreo']}, "
+          f"{resultado['n_base']:,} puntos base, IC 95%) ---")
+    for metrica in resultado["metricas"]:
+        print(f"\n{metrica}:")
+        print(resumen.loc[metrica].to_string(float_format="{:.3f}".format))
+    print("="*70)
+
+# ------------------------------------------------------------------------------
+# 5.4 Tablas de sensibilidad de dos variables
+# ------------------------------------------------------------------------------
+
+def tabla_sensibilidad_2d(p_base, eje_filas, eje_columnas, max_workers=1, cancelado=None):
+    """
+    Tabla de datos de dos variables (como las de Excel): VAN y TIR del inversionista para
+    cada combinación de valores de dos parámetros.
+
+    Todas las celdas se evalúan juntas en este proceso con el motor por lotes; cada etapa
+    se calcula una vez por clave distinta y queda en `cache_etapas`, así que lo que no
+    depende de ningún eje (p.ej. el CAPEX en una tabla crecimiento x velocidad) se resuelve
+    una sola vez para toda la grilla y se reutiliza en las tablas siguientes.
+
+    Parameters:
+      eje_filas, eje_columnas: (ruta, valores). La ruta es un valor numérico del proyecto,
+        p.ej. ("ventas", "crecimiento_precio_anual") o ("planes_venta", 0, "velocidad"), y
+        los valores son absolutos; con ("cronograma_inversion", tag) los valores son
+        multiplicadores de los montos con ese tag_sensibilidad.
+      max_workers: por defecto 1 (en serie). Con más, la grilla se reparte en un pool de
+        procesos como en `generar_modelo_financiero_paralelo`; cada proceso arranca con su
+        propia caché vacía, así que sólo conviene para grillas muy grandes.
+      cancelado: como en `generar_modelo_financiero_paralelo`.
+
+    Returns:
+      dict con "filas" y "columnas" (arrays de valores de cada eje), "van" y "tir" (arrays
+      (filas, columnas); NaN donde la TIR no converge).
+    """
+    (ruta_filas, valores_filas), (ruta_columnas, valores_columnas) = eje_filas, eje_columnas
+    ruta_filas, ruta_columnas = tuple(ruta_filas), tuple(ruta_columnas)
+    if ruta_filas == ruta_columnas:
+        raise ValueError("Los dos ejes deben usar rutas distintas")
+    valores_filas = np.asarray(valores_filas, dtype=float).ravel()
+    valores_columnas = np.asarray(valores_columnas, dtype=float).ravel()
+    if not valores_filas.size or not valores_columnas.size:
+        raise ValueError("Cada eje necesita al menos un valor")
+    _valor_en_ruta(p_base, "eje de filas", ruta_filas)
+    _valor_en_ruta(p_base, "eje de columnas", ruta_columnas)
+
+    capa = p_base if isinstance(p_base, ParametrosOverlay) else ParametrosOverlay(p_base)
+    escenarios = []
+    # Orden por filas: los bloques contiguos del pool comparten el valor del eje de filas
+    for valor_fila in valores_filas:
+        capa_fila = _con_valor(capa, ruta_filas, float(valor_fila))
+        for valor_columna in valores_columnas:
+            escenarios.append(compilar_proyecto(_con_valor(capa_fila, ruta_columnas, float(valor_columna))).exigir(
+                "financiamiento.monto_deuda", "financiamiento.costo_capital_propio_anual"))
+
+    columnas, _ = generar_modelo_financiero_paralelo(
+        escenarios, columnas=("FCF Apalancado (FCFE)",), max_workers=max_workers, cancelado=cancelado)
+    flujos = columnas["FCF Apalancado (FCFE)"]
+    ke = np.array([s.financiamiento.costo_capital_propio_anual for s in escenarios])
+    tir = TIR_anual_batch(flujos, tir_inicial=_resolver_tir(evaluar_proyecto(p_base, metricas=False).fcfe))
+    forma = (valores_filas.size, valores_columnas.size)
+    return {
+        "filas": valores_filas,
+        "columnas": valores_columnas,
+        "van": VAN_filas(flujos, ke).reshape(forma),
+        "tir": np.where(tir["converged"], tir["tir_anual_equivalente"], np.nan).reshape(forma),
+    }
+
+# ------------------------------------------------------------------------------
+# 5.5 Búsqueda de objetivo (goal seek)
+# ------------------------------------------------------------------------------
+
+METRICAS_OBJETIVO = METRICAS_MONTE_CARLO
+
+def _metricas_escenarios(escenarios, nombres, max_workers=1, cancelado=None):
+    """
+    Métricas de `evaluar_proyecto` (sólo las pedidas) para muchos escenarios compilados,
+    evaluados juntos con el motor por lotes. Devuelve {nombre: array (N,)}; NaN donde la
+    TIR no converge o el payback no se alcanza.
+    """
+    columnas, kpis = generar_modelo_financiero_paralelo(
+        escenarios, columnas=("FCF No Apalancado (FCFF)", "FCF Apalancado (FCFE)"),
+        max_workers=max_workers, cancelado=cancelado)
+    fcff, fcfe = columnas["FCF No Apalancado (FCFF)"], columnas["FCF Apalancado (FCFE)"]
+    if {"van_proyecto", "payback_descontado"} & set(nombres):
+        wacc = np.array([
+            _wacc(s.financiamiento, s.financiamiento.monto_deuda / s.inversion_total if s.inversion_total > 0 else 0)
+            for s in escenarios
+        ])
+
+    def tir(flujos):
+        # Sin arranque en caliente: la raíz debe coincidir con la de `TIR_anual`
+        resultado = TIR_anual_batch(flujos)
+        return np.where(resultado["converged"], resultado["tir_anual_equivalente"], np.nan)
+
+    calculos = {
+        "van_proyecto": lambda: VAN_filas(fcff, wacc),
+        "tir_proyecto": lambda: tir(fcff),
+        "van_inversionista": lambda: VAN_filas(fcfe, [s.financiamiento.costo_capital_propio_anual for s in escenarios]),
+        "tir_inversionista": lambda: tir(fcfe),
+        "payback_normal": lambda: payback_batch(fcfe),
+        "payback_descontado": lambda: payback_batch(fcfe, wacc),
+        "multiplo_capital": lambda: kpis["multiplo_capital"],
+    }
+    return {nombre: np.asarray(calculos[nombre](), dtype=float) for nombre in nombres}
+
+def _brent(a, fa, b, fb, xtol, rtol, maxiter):
+    """
+    Método de Brent (bisección + secante + interpolación cuadrática inversa) como
+    generador: produce [x] a evaluar y recibe [f(x)]. Requiere fa y fb de signo opuesto.
+
+    Returns (vía StopIteration): (x, f(x), convergido)
+    """
+    pre, fpre, cur, fcur = a, fa, b, fb
+    blk, fblk, spre, scur = 0.0, 0.0, 0.0, 0.0
+    for _ in range(maxiter):
+        if fpre * fcur < 0:
+            blk, fblk = pre, fpre
+            spre = scur = cur - pre
+        if abs(fblk) < abs(fcur):
+            pre, cur, blk = cur, blk, cur
+            fpre, fcur, fblk = fcur, fblk, fcur
+
+        delta = (xtol + rtol * abs(cur)) / 2
+        sbis = (blk - cur) / 2
+        if fcur == 0 or abs(sbis) < delta:
+            return cur, fcur, True
+
+        if abs(spre) > delta and abs(fcur) < abs(fpre):
+            if pre == blk:
+                paso = -fcur * (cur - pre) / (fcur - fpre)  # secante
+            else:
+                dpre = (fpre - fcur) / (pre - cur)
+                dblk = (fblk - fcur) / (blk - cur)
+                paso = -fcur * (fblk * dblk - fpre * dpre) / (dblk * dpre * (fblk - fpre))
+            if 2 * abs(paso) < min(abs(spre), 3 * abs(sbis) - delta):
+                spre, scur = scur, paso
+            else:
+                spre = scur = sbis
+        else:
+            spre = scur = sbis
+
+        pre, fpre = cur, fcur
+        cur += scur if abs(scur) > delta else (delta if sbis > 0 else -delta)
+        (fcur,) = yield [cur]
+        if np.isnan(fcur):
+            return cur, fcur, False
+    return cur, fcur, False
+
+def _buscar_raiz(x0, intervalo, limites, xtol, rtol, maxiter, paso=None, max_expansiones=40):
+    """
+    Generador que busca g(x) = 0: produce listas de x a evaluar y recibe la lista de g(x).
+
+    Con `intervalo` se evalúan sus extremos; sin él se parte de x0 y se abre un intervalo
+    hacia ambos lados (por defecto paso inicial 10% de |x0|, duplicándose) hasta encontrar un cambio
+    de signo, sin salir de `limites`. Un lado se abandona al llegar al límite o si la
+    métrica deja de estar definida (NaN). Luego se refina con `_brent`.
+
+    Returns (vía StopIteration): (x, g(x), convergido, mensaje)
+    """
+    if intervalo is not None:
+        a, b = intervalo
+        ga, gb = yield [a, b]
+        if np.isnan(ga) or np.isnan(gb):
+            return None, np.nan, False, "la métrica no está definida en un extremo del intervalo"
+        if ga == 0 or gb == 0:
+            return (a, ga, True, "") if ga == 0 else (b, gb, True, "")
+        if np.sign(ga) == np.sign(gb):
+            return None, np.nan, False, "el objetivo no cambia de signo en el intervalo"
+    else:
+        (g0,) = yield [x0]
+        if g0 == 0:
+            return x0, g0, True, ""
+        if np.isnan(g0):
+            return None, np.nan, False, "la métrica no está definida en el valor base"
+        inferior, superior = limites
+        if not paso:
+            paso = 0.1 * abs(x0) if x0 != 0 else 0.1
+        # Último punto evaluado de cada lado (ambos arrancan en x0)
+        lados = {-1: (x0, g0), 1: (x0, g0)}
+        intervalo = None
+        for _ in range(max_expansiones):
+            candidatos = {}
+            for lado, (x, _g) in lados.items():
+                nuevo = min(max(x0 + lado * paso, inferior), superior)
+                if nuevo != x:
+                    candidatos[lado] = nuevo
+            if not candidatos:
+                break
+            valores = yield list(candidatos.values())
+            encontrados = []
+            for (lado, x), g in zip(candidatos.items(), valores):
+                x_previo, g_previo = lados[lado]
+                if np.isnan(g):
+                    del lados[lado]
+                    continue
+                if g == 0:
+                    return x, g, True, ""
+                if np.sign(g) != np.sign(g_previo):
+                    encontrados.append(((x_previo, g_previo), (x, g)))
+                lados[lado] = (x, g)
+            if encontrados:
+                # El cambio de signo más cercano al valor base
+                (a, ga), (b, gb) = min(encontrados, key=lambda par: abs(par[1][0] - x0))
+                intervalo = (a, b)
+                break
+            paso *= 2
+        if intervalo is None:
+            return None, np.nan, False, "no se encontró un valor que alcance el objetivo"
+
+    x, g, convergido = yield from _brent(a, ga, b, gb, xtol, rtol, maxiter)
+    return x, g, convergido, "" if convergido else "no convergió en maxiter iteraciones"
+
+def buscar_objetivos(p, problemas, xtol=1e-6, rtol=1e-10, maxiter=100, max_workers=1, cancelado=None):
+    """
+    Búsqueda de objetivo para muchos problemas a la vez: cada ronda junta los puntos que
+    piden todos los problemas activos y los evalúa en una sola llamada al motor por lotes,
+    en este proceso. Las etapas que no dependen de la variable que se resuelve se calculan
+    en la primera ronda y las siguientes las toman de `cache_etapas`.
+
+    Parameters:
+      problemas: lista de dicts con
+        ruta: valor numérico del proyecto, p.ej. ("planes_venta", 0, "monto_pie") o
+          ("financiamiento", "monto_deuda"); ("cronograma_inversion", tag) resuelve un
+          multiplicador de los montos con ese tag_sensibilidad (base 1).
+        metrica: una de METRICAS_OBJETIVO (las de `evaluar_proyecto`).
+        objetivo: valor buscado de la métrica (las TIR como fracción anual: 0.20 = 20%).
+        intervalo: opcional, (a, b) con el objetivo de distinto lado en cada extremo.
+        limites: opcional, (mínimo, máximo) para abrir el intervalo; por defecto
+          (0, inf) si el valor base es >= 0 y sin límites si es negativo.
+        inicial, paso: opcionales, punto de partida (por defecto el valor base) y paso
+          inicial para abrir el intervalo.
+        fijos: opcional, {ruta: valor} aplicados al proyecto sólo en este problema.
+      xtol, rtol: tolerancia de la variable (|x - raíz| < (xtol + rtol |x|) / 2).
+      maxiter: iteraciones de Brent por problema.
+      max_workers: por defecto 1. Con más, cada ronda se reparte en un pool de procesos
+        nuevo (ver `generar_modelo_financiero_paralelo`) cuyos procesos no comparten la
+        caché de etapas; sólo conviene con muchísimos problemas a la vez.
+      cancelado: función sin argumentos revisada en cada ronda; si devuelve True se lanza
+        CalculoCancelado.
+
+    Returns:
+      lista de dicts (en el orden de `problemas`) con "valor" (None si no se alcanzó),
+      "metrica" (valor de la métrica en "valor"), "convergido", "evaluaciones" y "mensaje".
+    """
+    capa = p if isinstance(p, ParametrosOverlay) else ParametrosOverlay(p)
+    preparados = []
+    for k, problema in enumerate(problemas):
+        ruta, metrica = tuple(problema["ruta"]), problema["metrica"]
+        if metrica not in METRICAS_OBJETIVO:
+            raise ValueError(f"problema {k}: métrica desconocida {metrica!r} (opciones: {', '.join(METRICAS_OBJETIVO)})")
+        capa_k = capa
+        for ruta_fija, valor in (problema.get("fijos") or {}).items():
+            _valor_en_ruta(capa, f"problema {k}", tuple(ruta_fija))
+            capa_k = _con_valor(capa_k, tuple(ruta_fija), valor)
+        x0 = _valor_en_ruta(capa_k, f"problema {k}", ruta)
+        x0 = 1.0 if x0 is None else float(x0)
+        limites = problema.get("limites") or ((0.0, np.inf) if x0 >= 0 else (-np.inf, np.inf))
+        if problema.get("inicial") is not None:
+            x0 = float(problema["inicial"])
+        resolutor = _buscar_raiz(x0, problema.get("intervalo"), limites, xtol, rtol, maxiter, problema.get("paso"))
+        preparados.append((ruta, capa_k, metrica, float(problema["objetivo"]), resolutor))
+
+    resultados = [None] * len(preparados)
+    evaluaciones = [0] * len(preparados)
+    pedidos = {}
+    for k, (*_, resolutor) in enumerate(preparados):
+        pedidos[k] = next(resolutor)
+
+    while pedidos:
+        _revisar_cancelacion(cancelado)
+        escenarios, duenos = [], []
+        for k, xs in pedidos.items():
+            ruta, capa_k = preparados[k][:2]
+            for x in xs:
+                escenarios.append(compilar_proyecto(_con_valor(capa_k, ruta, x)))
+                duenos.append(k)
+        nombres = sorted({preparados[k][2] for k in pedidos})
+        valores = _metricas_escenarios(escenarios, nombres, max_workers, cancelado)
+
+        respuestas = {}
+        for i, k in enumerate(duenos):
+            _, _, metrica, objetivo, _ = preparados[k]
+            respuestas.setdefault(k, []).append(valores[metrica][i] - objetivo)
+        siguientes = {}
+        for k, gs in respuestas.items():
+            evaluaciones[k] += len(gs)
+            try:
+                siguientes[k] = preparados[k][4].send(gs)
+            except StopIteration as fin:
+                x, g, convergido, mensaje = fin.value
+                resultados[k] = {
+                    "valor": None if x is None else float(x),
+                    "metrica": float(g + preparados[k][3]) if x is not None else None,
+                    "convergido": bool(convergido),
+                    "evaluaciones": evaluaciones[k],
+                    "mensaje": mensaje,
+                }
+        pedidos = siguientes
+    return resultados
+
+def buscar_objetivo(p, ruta, metrica, objetivo, intervalo=None, limites=None, xtol=1e-6, rtol=1e-10, maxiter=100):
+    """
+    Valor de `ruta` con el que `metrica` alcanza `objetivo`, p.ej. el monto_pie que da
+    una TIR del inversionista de 20% o el monto_deuda con VAN del inversionista = 0.
+    Ver `buscar_objetivos` para los parámetros y el resultado.
+    """
+    problema = {"ruta": ruta, "metrica": metrica, "objetivo": objetivo, "intervalo": intervalo, "limites": limites}
+    return buscar_objetivos(p, [problema], xtol=xtol, rtol=rtol, maxiter=maxiter, max_workers=1)[0]
+
+def trazar_contorno(p, eje_x, ruta_y, metrica="van_inversionista", objetivo=0.0, limites_y=None,
+                    cada=8, xtol=1e-6, rtol=1e-10, max_workers=1, cancelado=None):
+    """
+    Curva de nivel metrica(x, y) = objetivo entre dos entradas (p.ej. el VAN del
+    inversionista = 0 en crecimiento_precio_anual x costo_deuda_anual): para cada x se
+    busca el y que alcanza el objetivo con `buscar_objetivos`.
+
+    En dos pasadas por lotes: primero se resuelve uno de cada `cada` valores de x (y el
+    último) partiendo del valor base de y; después todos los demás a la vez, cada uno
+    arrancando de la interpolación entre sus vecinos ya resueltos y con un paso inicial del
+    orden de la diferencia entre ellos. Así cada punto intermedio cuesta pocas evaluaciones,
+    mucho menos que recorrer una grilla completa del plano.
+
+    Parameters:
+      eje_x: (ruta, valores) del eje que se recorre (valores absolutos; multiplicadores si
+        la ruta es ("cronograma_inversion", tag)).
+      ruta_y: ruta que se resuelve para cada x.
+      metrica, objetivo: como en `buscar_objetivos`.
+      limites_y: (mínimo, máximo) para y; por defecto los de `buscar_objetivos`.
+      max_workers, cancelado: como en `buscar_objetivos` (por defecto en este proceso, para
+        que las dos pasadas compartan las etapas de `cache_etapas`).
+
+    Returns:
+      dict con "x", "y" (NaN donde no se alcanza el objetivo), "convergido" (bool),
+      "evaluaciones" (total de escenarios evaluados) y "polilinea" (array (k, 2) con los
+      puntos (x, y) alcanzados, en el orden de x).
+    """
+    ruta_x, valores_x = tuple(eje_x[0]), np.asarray(eje_x[1], dtype=float).ravel()
+    ruta_y = tuple(ruta_y)
+    if ruta_x == ruta_y:
+        raise ValueError("El eje recorrido y el resuelto deben usar rutas distintas")
+    if not valores_x.size:
+        raise ValueError("El eje x necesita al menos un valor")
+    if cada < 1:
+        raise ValueError("cada debe ser >= 1")
+
+    n = valores_x.size
+    y = np.full(n, np.nan)
+    convergido = np.zeros(n, dtype=bool)
+    evaluaciones = 0
+
+    def resolver(indices, iniciales=None, pasos=None):
+        nonlocal evaluaciones
+        problemas = []
+        for j, i in enumerate(indices):
+            problemas.append({
+                "ruta": ruta_y, "metrica": metrica, "objetivo": objetivo, "limites": limites_y,
+                "fijos": {ruta_x: float(valores_x[i])},
+                "inicial": None if iniciales is None else iniciales[j],
+                "paso": None if pasos is None else pasos[j],
+            })
+        for i, r in zip(indices, buscar_objetivos(p, problemas, xtol, rtol, max_workers=max_workers, cancelado=cancelado)):
+            evaluaciones += r["evaluaciones"]
+            if r["convergido"]:
+                y[i], convergido[i] = r["valor"], True
+
+    gruesos = sorted(set(range(0, n, cada)) | {n - 1})
+    resolver(gruesos)
+
+    # Puntos intermedios: arranque en caliente desde los vecinos resueltos
+    intermedios, iniciales, pasos = [], [], []
+    for izquierdo, derecho in zip(gruesos[:-1], gruesos[1:]):
+        vecinos = [k for k in (izquierdo, derecho) if convergido[k]]
+        for i in range(izquierdo + 1, derecho):
+            intermedios.append(i)
+            if len(vecinos) == 2:
+                peso = (i - izquierdo) / (derecho - izquierdo)
+                iniciales.append(y[izquierdo] + peso * (y[derecho] - y[izquierdo]))
+                pasos.append(abs(y[derecho] - y[izquierdo]) / (derecho - izquierdo) or None)
+            elif vecinos:
+                iniciales.append(y[vecinos[0]])
+                pasos.append(None)
+            else:
+                iniciales.append(None)
+                pasos.append(None)
+    if intermedios:
+        resolver(intermedios, iniciales, pasos)
+
+    return {
+        "x": valores_x,
+        "y": y,
+        "convergido": convergido,
+        "evaluaciones": evaluaciones,
+        "polilinea": np.column_stack([valores_x[convergido], y[convergido]]),
+    }
+
 # ==============================================================================
 # 6. EJECUCIÓN DEL MODELO Y REPORTE DE RESULTADOS (SI SE EJECUTA COMO SCRIPT)
 # ==============================================================================
 if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Caso base y sensibilidad del proyecto de ejemplo.")
+    parser.add_argument("--monte-carlo", action="store_true", help="agrega la simulación Monte Carlo")
+    parser.add_argument("--sobol", action="store_true", help="agrega los índices de Sobol (sensibilidad global)")
+    args = parser.parse_args()
+
     # --- Parámetros Base del Proyecto ---
     parametros = {
         "horizonte_meses": 120,
@@ -829,4 +3886,12 @@ if __name__ == "__main__":
     print(f"Múltiplo sobre Capital (MOIC): {multiplo:.2f}x")
 
     # --- Ejecución del Análisis de Sensibilidad ---
-    analisis_de_sensibilidad(parametros)
\ No newline at end of file
+    analisis_de_sensibilidad(parametros)
+
+    # --- Simulación Monte Carlo (opcional: --monte-carlo) ---
+    if args.monte_carlo:
+        analisis_monte_carlo(parametros)
+
+    # --- Sensibilidad global (opcional: --sobol) ---
+    if args.sobol:
+        analisis_sensibilidad_global(parametros)
\ No newline at end of file
@@ -1,9 +1,10 @@
+import queue
+import threading
 import customtkinter as ctk
 from tkinter import ttk
 from tkinter import messagebox
 import calculadora_financiera as cf
-import pandas as pd
-import copy
+import numpy as np
 
 # --- --- --- --- --- --- --- --- --- --- --- --- --- --- --- --- --- ---
 # VENTANA DE DIÁLOGO PARA AÑADIR/EDITAR INVERSIONES
@@ -60,13 +61,138 @@ class InvestmentItemDialog(ctk.CTkToplevel):
         except ValueError:
             messagebox.showerror("Error de Entrada", "Por favor, introduce valores numéricos válidos para Monto y Mes.")
 
+# --- --- --- --- --- --- --- --- --- --- --- --- --- --- --- --- --- ---
+# TABLA VIRTUALIZADA (SÓLO SE DIBUJAN LAS FILAS VISIBLES)
+# --- --- --- --- --- --- --- --- --- --- --- --- --- --- --- --- --- ---
+class TablaVirtual:
+    """
+    Treeview virtualizado para tablas mes a mes.
+
+    Guarda las columnas como arrays NumPy y mantiene en el Treeview sólo tantos ítems como
+    filas caben en pantalla; al desplazarse se reescriben los valores de esos ítems,
+    formateando en el momento únicamente la ventana visible. Refrescar la tabla cuesta lo
+    que el viewport, no lo que el horizonte.
+    """
+
+    def __init__(self, parent, columns, height=20):
+        self.frame = ctk.CTkFrame(parent, fg_color="transparent")
+        self.frame.pack(pady=5, padx=5, fill="both", expand=True)
+
+        self.tree = ttk.Treeview(self.frame, columns=columns, show="headings", height=height)
+        for col in columns:
+            self.tree.heading(col, text=col)
+            self.tree.column(col, width=80, anchor="center")
+        self.scrollbar = ttk.Scrollbar(self.frame, orient="vertical", command=self._al_desplazar)
+        self.scrollbar.pack(side="right", fill="y")
+        self.tree.pack(side="left", fill="both", expand=True)
+
+        self.tree.bind("<Configure>", self._al_redimensionar)
+        self.tree.bind("<MouseWheel>", lambda e: self._mover(-1 if e.delta > 0 else 1, "units"))
+        self.tree.bind("<Button-4>", lambda e: self._mover(-1, "units"))
+        self.tree.bind("<Button-5>", lambda e: self._mover(1, "units"))
+
+        self._columnas = []
+        self._n = 0
+        self._inicio = 0
+        self._visibles = height
+        self._dibujar()
+
+    def mostrar(self, columnas):
+        """columnas: lista de (array, formato) en el orden de las columnas del Treeview."""
+        self._columnas = [(np.asarray(valores), formato) for valores, formato in columnas]
+        self._n = len(self._columnas[0][0]) if self._columnas else 0
+        self._inicio = 0
+        self._dibujar()
+
+    def _al_redimensionar(self, event):
+        alto_fila = int(ttk.Style().lookup("Treeview", "rowheight") or 20)
+        visibles = max(1, (event.height - alto_fila) // alto_fila)
+        if visibles != self._visibles:
+            self._visibles = visibles
+            self._dibujar()
+
+    def _al_desplazar(self, accion, cantidad, unidad=None):
+        if accion == "moveto":
+            self._ir_a(int(round(float(cantidad) * self._n)))
+        else:
+            self._mover(int(cantidad), unidad)
+
+    def _mover(self, cantidad, unidad):
+        paso = self._visibles if unidad == "pages" else 3
+        self._ir_a(self._inicio + cantidad * paso)
+        return "break"
+
+    def _ir_a(self, inicio):
+        inicio = max(0, min(inicio, self._n - self._visibles))
+        if inicio != self._inicio:
+            self._inicio = inicio
+            self._dibujar()
+
+    def _dibujar(self):
+        filas = range(self._inicio, min(self._inicio + self._visibles, self._n))
+        items = list(self.tree.get_children())
+        # Se crean o eliminan a lo más tantos ítems como filas tiene el viewport
+        for item in items[len(filas):]:
+            self.tree.delete(item)
+        for _ in range(len(items), len(filas)):
+            items.append(self.tree.insert("", "end"))
+        for item, fila in zip(items, filas):
+            self.tree.item(item, values=[formato(valores[fila]) for valores, formato in self._columnas])
+
+        if self._n > 0:
+            self.scrollbar.set(self._inicio / self._n, (self._inicio + len(filas)) / self._n)
+        else:
+            self.scrollbar.set(0, 1)
+
 # --- --- --- --- --- --- --- --- --- --- --- --- --- --- --- --- --- ---
 # CLASE PRINCIPAL DE LA APLICACIÓN
 # --- --- --- --- --- --- --- --- --- --- --- --- --- --- --- --- --- ---
 class App(ctk.CTk):
+    SENSIBILIDAD_ESCENARIOS = {
+        "Crecimiento Precio": ("ventas", "crecimiento_precio_anual"),
+        "Tasa Préstamo": ("financiamiento", "costo_deuda_anual"),
+        "Monto Préstamo": ("financiamiento", "monto_deuda"),
+    }
+    SENSIBILIDAD_VARIACIONES = [-0.2, -0.1, 0.0, 0.1, 0.2]
+    # Etapas del cálculo (con su barra de progreso) y los nodos del grafo de cada una
+    ETAPAS_CALCULO = [
+        ("Modelo", ["inversion_total", "capex", "deuda", "ventas", "opex", "flujos", "fcff", "fcfe"]),
+        ("Métricas", ["wacc", "van_proyecto", "tir_proyecto", "van_inversionista", "tir_inversionista",
+                      "payback_normal", "payback_descontado", "rentabilidad", "total_intereses"]),
+        ("Sensibilidad", ["sensibilidad_flujos", "sensibilidad_van", "sensibilidad_tir"]),
+    ]
+    # Variables de la tabla de dos variables: ruta y escala de la GUI (los % se ingresan x100)
+    TABLA_2D_VARIABLES = {
+        "Crecimiento Precio (%)": (("ventas", "crecimiento_precio_anual"), 100),
+        "Velocidad Plan 1 (lotes/mes)": (("planes_venta", 0, "velocidad"), 1),
+        "Tasa Préstamo (%)": (("financiamiento", "costo_deuda_anual"), 100),
+        "Monto Préstamo": (("financiamiento", "monto_deuda"), 1),
+        "Costo Capital Propio (%)": (("financiamiento", "costo_capital_propio_anual"), 100),
+    }
+    TABLA_2D_EJES = [
+        ("Filas", "Crecimiento Precio (%)", 0, 10, 20),
+        ("Columnas", "Velocidad Plan 1 (lotes/mes)", 2, 8, 20),
+    ]
+
     def __init__(self):
         super().__init__()
 
+        # Grafo de dependencias del modelo; persiste entre cálculos para recalcular sólo lo editado.
+        # Sólo el hilo de cálculo lo toca.
+        self.grafo = cf.construir_grafo_modelo(self.SENSIBILIDAD_ESCENARIOS, self.SENSIBILIDAD_VARIACIONES)
+
+        # Hilo de cálculo: toma siempre la solicitud más reciente y devuelve mensajes por una cola
+        # que el hilo de Tk revisa con after(); una solicitud nueva cancela la que está en curso.
+        self._mensajes = queue.Queue()
+        self._hay_trabajo = threading.Condition()
+        self._pendiente = None
+        self._cancelar_actual = None
+        self._generacion = 0
+        self._esperando = False
+        self._revisando = False
+        self._nodos_sin_dibujar = set()
+        threading.Thread(target=self._bucle_calculo, daemon=True).start()
+
         self.title("Calculadora Financiera de Proyectos Inmobiliarios")
         self.geometry(f"{1800}x950")
 
@@ -91,8 +217,25 @@ class App(ctk.CTk):
         self.entries = {}
         self.create_input_widgets()
 
-        self.calculate_button = ctk.CTkButton(self.sidebar_frame, text="Calcular Análisis", command=self.calculate_analysis, font=ctk.CTkFont(size=14, weight="bold"))
-        self.calculate_button.grid(row=2, column=0, padx=20, pady=10)
+        # Cálculo: botones y progreso por etapa
+        self.calc_frame = ctk.CTkFrame(self.sidebar_frame, fg_color="transparent")
+        self.calc_frame.grid(row=2, column=0, padx=20, pady=10, sticky="ew")
+        self.calc_frame.grid_columnconfigure(tuple(range(len(self.ETAPAS_CALCULO))), weight=1)
+
+        self.calculate_button = ctk.CTkButton(self.calc_frame, text="Calcular Análisis", command=self.calculate_analysis, font=ctk.CTkFont(size=14, weight="bold"))
+        self.calculate_button.grid(row=0, column=0, columnspan=2, padx=5, pady=5, sticky="e")
+        self.cancel_button = ctk.CTkButton(self.calc_frame, text="Cancelar", command=self.cancel_analysis, state="disabled", fg_color="#8b0000", hover_color="#5c0000")
+        self.cancel_button.grid(row=0, column=2, padx=5, pady=5, sticky="w")
+
+        self.progress_bars = {}
+        for col, (etapa, _) in enumerate(self.ETAPAS_CALCULO):
+            ctk.CTkLabel(self.calc_frame, text=etapa).grid(row=1, column=col, padx=5)
+            barra = ctk.CTkProgressBar(self.calc_frame)
+            barra.set(0)
+            barra.grid(row=2, column=col, padx=5, sticky="ew")
+            self.progress_bars[etapa] = barra
+        self.progress_label = ctk.CTkLabel(self.calc_frame, text="")
+        self.progress_label.grid(row=3, column=0, columnspan=len(self.ETAPAS_CALCULO), pady=(2, 0))
 
         # Firebase Load Section
         self.firebase_frame = ctk.CTkFrame(self.sidebar_frame, corner_radius=10)
@@ -128,8 +271,12 @@ class App(ctk.CTk):
         self.output_tabview.add("Detalle Payback")
         self.output_tabview.add("Sensibilidad VAN")
         self.output_tabview.add("Sensibilidad TIR")
+        self.output_tabview.add("Tabla 2D")
 
         self._create_output_widgets()
+        # Las pestañas de detalle se construyen cuando la ventana ya está en pantalla
+        self._detalle_creado = False
+        self.after_idle(self._ensure_detail_widgets)
 
     def _create_output_widgets(self):
         # --- Pestaña de Resumen ---
@@ -157,7 +304,12 @@ class App(ctk.CTk):
             "payback_normal": self._create_result_label(base_results_frame, "Payback Normal (meses):", 11),
             "payback_descontado": self._create_result_label(base_results_frame, "Payback Descontado (meses):", 12),
         }
-        
+
+    def _ensure_detail_widgets(self):
+        if self._detalle_creado:
+            return
+        self._detalle_creado = True
+
         # --- Pestañas de Sensibilidad ---
         van_sens_frame = self.output_tabview.tab("Sensibilidad VAN")
         ctk.CTkLabel(van_sens_frame, text="Sensibilidad del VAN del Inversionista", font=ctk.CTkFont(weight="bold")).pack(pady=5)
@@ -166,7 +318,35 @@ class App(ctk.CTk):
         tir_sens_frame = self.output_tabview.tab("Sensibilidad TIR")
         ctk.CTkLabel(tir_sens_frame, text="Sensibilidad de la TIR del Inversionista", font=ctk.CTkFont(weight="bold")).pack(pady=5)
         self.tir_sensitivity_tree = self._create_treeview(tir_sens_frame, ["Variable", "-20%", "-10%", "0%", "10%", "20%"])
-        
+
+        # --- Pestaña de Tabla 2D (dos variables, como las tablas de datos de Excel) ---
+        tabla_frame = self.output_tabview.tab("Tabla 2D")
+        ctk.CTkLabel(tabla_frame, text="Tabla de Sensibilidad de Dos Variables", font=ctk.CTkFont(weight="bold")).pack(pady=5)
+        ejes_frame = ctk.CTkFrame(tabla_frame)
+        ejes_frame.pack(pady=5, padx=20, fill="x")
+        self.tabla_2d_ejes = []
+        for fila, (eje, variable, desde, hasta, pasos) in enumerate(self.TABLA_2D_EJES):
+            ctk.CTkLabel(ejes_frame, text=f"{eje}:").grid(row=fila, column=0, padx=5, pady=2, sticky="w")
+            variable_var = ctk.StringVar(value=variable)
+            ctk.CTkOptionMenu(ejes_frame, variable=variable_var, values=list(self.TABLA_2D_VARIABLES), width=220).grid(row=fila, column=1, padx=5, pady=2)
+            entradas = []
+            for col, (etiqueta, valor) in enumerate((("Desde", desde), ("Hasta", hasta), ("Pasos", pasos))):
+                ctk.CTkLabel(ejes_frame, text=etiqueta).grid(row=fila, column=2 + 2 * col, padx=(10, 2), pady=2)
+                entrada = ctk.CTkEntry(ejes_frame, width=90)
+                entrada.insert(0, str(valor))
+                entrada.grid(row=fila, column=3 + 2 * col, padx=2, pady=2)
+                entradas.append(entrada)
+            self.tabla_2d_ejes.append((variable_var, *entradas))
+        self.tabla_2d_metrica = ctk.StringVar(value="VAN Inversionista")
+        ctk.CTkSegmentedButton(ejes_frame, values=["VAN Inversionista", "TIR Inversionista"], variable=self.tabla_2d_metrica,
+                               command=lambda _: self._dibujar_tabla_2d()).grid(row=0, column=8, padx=10, pady=2)
+        ctk.CTkButton(ejes_frame, text="Calcular Tabla", command=self.calcular_tabla_2d).grid(row=1, column=8, padx=10, pady=2)
+        self.tabla_2d_resultado = None
+        self.tabla_2d_tree = self._create_treeview(tabla_frame, [""], height=20)
+        desplazamiento = ttk.Scrollbar(tabla_frame, orient="horizontal", command=self.tabla_2d_tree.xview)
+        desplazamiento.pack(padx=5, fill="x")
+        self.tabla_2d_tree.configure(xscrollcommand=desplazamiento.set)
+
         # --- Pestaña de Detalle Deuda ---
         deuda_frame = self.output_tabview.tab("Detalle Deuda")
         ctk.CTkLabel(deuda_frame, text="Cronograma de Amortización (Sistema Alemán)", font=ctk.CTkFont(weight="bold")).pack(pady=5)
@@ -197,14 +377,14 @@ class App(ctk.CTk):
         self.payback_desc_label = ctk.CTkLabel(self.payback_summary_frame, text="Payback Descontado: -", font=ctk.CTkFont(weight="bold", size=14))
         self.payback_desc_label.pack(side="left", padx=20)
         
-        self.payback_tree = self._create_treeview(payback_frame, [
+        self.payback_tree = TablaVirtual(payback_frame, [
             "Mes", "Flujo Mensual", "Acum. Normal", "Flujo Descontado", "Acum. Descontado", "Estado"
         ])
         
         # --- Pestaña de Proyección Operativa ---
         proy_frame = self.output_tabview.tab("Proyección Operativa")
         ctk.CTkLabel(proy_frame, text="Proyección Mensual de Ventas y Gastos", font=ctk.CTkFont(weight="bold")).pack(pady=5)
-        self.proy_tree = self._create_treeview(proy_frame, [
+        self.proy_tree = TablaVirtual(proy_frame, [
             "Mes", "Lotes Vendidos", "Inventario", "Ingr. Pies", "Ingr. Cuotas (V)", "Otros Ingr.", "Ingr. Totales",
             "Gastos Dinámicos", "EBITDA"
         ])
@@ -393,20 +573,159 @@ class App(ctk.CTk):
     def calculate_analysis(self):
         try:
             params = self._get_params_from_gui()
-            
-            # Ejecutar modelo
-            inv_total = cf.calcular_inversion_total(params)
+            # Se valida aquí, antes de mandar el trabajo al hilo de cálculo
+            cf.compilar_proyecto(params)
+        except cf.ParametrosInvalidos as e:
+            messagebox.showerror("Parámetros inválidos", str(e))
+            return
+        except Exception as e:
+            messagebox.showerror("Error", f"Error en el cálculo: {str(e)}")
+            return
+
+        self._encolar_trabajo(lambda generacion, cancelar: self._ejecutar_calculo(generacion, params, cancelar))
+        for barra in self.progress_bars.values():
+            barra.set(0)
+        self.progress_label.configure(text="Calculando...")
+
+    def calcular_tabla_2d(self):
+        try:
+            params = self._get_params_from_gui()
+            cf.compilar_proyecto(params)
+            ejes = []
+            for variable_var, desde, hasta, pasos in self.tabla_2d_ejes:
+                ruta, escala = self.TABLA_2D_VARIABLES[variable_var.get()]
+                n = int(pasos.get())
+                if n < 1:
+                    raise ValueError("La cantidad de pasos debe ser al menos 1")
+                ejes.append((ruta, np.linspace(float(desde.get()), float(hasta.get()), n) / escala))
+        except cf.ParametrosInvalidos as e:
+            messagebox.showerror("Parámetros inválidos", str(e))
+            return
+        except ValueError as e:
+            messagebox.showerror("Error", f"Datos de la tabla inválidos: {str(e)}")
+            return
+
+        etiquetas = [variable_var.get() for variable_var, *_ in self.tabla_2d_ejes]
+        def trabajo(generacion, cancelar):
+            try:
+                resultado = cf.tabla_sensibilidad_2d(params, *ejes, cancelado=cancelar.is_set)
+                self._mensajes.put(("tabla_2d", generacion, [], (etiquetas, resultado)))
+            except cf.CalculoCancelado:
+                self._mensajes.put(("cancelado", generacion, [], None))
+            except Exception as e:
+                self._mensajes.put(("error", generacion, [], str(e)))
+        self._encolar_trabajo(trabajo)
+        self.progress_label.configure(text="Calculando tabla 2D...")
+
+    def _encolar_trabajo(self, trabajo):
+        """Manda `trabajo(generacion, cancelar)` al hilo de cálculo."""
+        with self._hay_trabajo:
+            # La solicitud nueva reemplaza a la pendiente y cancela la que está en curso
+            self._generacion += 1
+            self._pendiente = (self._generacion, trabajo, threading.Event())
+            if self._cancelar_actual is not None:
+                self._cancelar_actual.set()
+            self._hay_trabajo.notify()
+
+        self.cancel_button.configure(state="normal")
+        self._esperando = True
+        self._programar_revision()
+
+    def cancel_analysis(self):
+        with self._hay_trabajo:
+            self._generacion += 1  # todo lo que siga en vuelo queda obsoleto
+            self._pendiente = None
+            if self._cancelar_actual is not None:
+                self._cancelar_actual.set()
+        self._esperando = False
+        self.cancel_button.configure(state="disabled")
+        self.progress_label.configure(text="Cálculo cancelado")
+
+    # --- Hilo de cálculo (no toca widgets: sólo el grafo y la cola de mensajes) ---
+    def _bucle_calculo(self):
+        while True:
+            with self._hay_trabajo:
+                while self._pendiente is None:
+                    self._hay_trabajo.wait()
+                generacion, trabajo, cancelar = self._pendiente
+                self._pendiente = None
+                self._cancelar_actual = cancelar
+            trabajo(generacion, cancelar)
+            with self._hay_trabajo:
+                self._cancelar_actual = None
+
+    def _ejecutar_calculo(self, generacion, params, cancelar):
+        grafo = self.grafo
+        try:
+            # El grafo sólo recalcula los nodos afectados por lo que se editó
+            grafo.actualizar(params)
+            resultados = {}
+            for etapa, nodos in self.ETAPAS_CALCULO:
+                def avance(nombre, hechos, total, etapa=etapa):
+                    self._mensajes.put(("progreso", generacion, etapa, hechos / total))
+                resultados.update(grafo.evaluar(nodos, cancelado=cancelar.is_set, al_avanzar=avance))
+            self._mensajes.put(("resultado", generacion, list(grafo.recalculados), (params, resultados)))
+        except cf.CalculoCancelado:
+            self._mensajes.put(("cancelado", generacion, list(grafo.recalculados), None))
+        except Exception as e:
+            # Tras un error el estado del grafo no es confiable: se recalcula todo la próxima vez
+            self.grafo = cf.construir_grafo_modelo(self.SENSIBILIDAD_ESCENARIOS, self.SENSIBILIDAD_VARIACIONES)
+            self._mensajes.put(("error", generacion, list(grafo.recalculados), str(e)))
+
+    # --- Hilo de Tk: revisa la cola con after() ---
+    def _programar_revision(self):
+        if not self._revisando:
+            self._revisando = True
+            self.after(50, self._procesar_mensajes)
+
+    def _procesar_mensajes(self):
+        while True:
+            try:
+                tipo, generacion, *datos = self._mensajes.get_nowait()
+            except queue.Empty:
+                break
+            if tipo == "progreso":
+                if generacion == self._generacion:
+                    etapa, fraccion = datos
+                    self.progress_bars[etapa].set(fraccion)
+                    self.progress_label.configure(text=f"{etapa}...")
+                continue
+            # Nodos recalculados por cualquier corrida, aunque haya quedado obsoleta:
+            # sus tablas siguen pendientes de dibujar
+            recalculados, carga = datos
+            self._nodos_sin_dibujar.update(recalculados)
+            if generacion != self._generacion:
+                continue
+            self._esperando = False
+            self.cancel_button.configure(state="disabled")
+            if tipo == "resultado":
+                self._mostrar_resultados(*carga)
+            elif tipo == "tabla_2d":
+                self._mostrar_tabla_2d(*carga)
+            elif tipo == "error":
+                self.progress_label.configure(text="Error en el cálculo")
+                messagebox.showerror("Error", f"Error en el cálculo: {carga}")
+            else:
+                self.progress_label.configure(text="Cálculo cancelado")
+
+        if self._esperando:
+            self.after(50, self._procesar_mensajes)
+        else:
+            self._revisando = False
+
+    def _mostrar_resultados(self, params, resultados):
+        try:
+            self._ensure_detail_widgets()
+            recalculados = self._nodos_sin_dibujar
+            self._nodos_sin_dibujar = set()
+
+            inv_total = resultados["inversion_total"]
             monto_deuda = params["financiamiento"]["monto_deuda"]
             monto_equity = inv_total - monto_deuda
-            porc_deuda = monto_deuda / inv_total if inv_total > 0 else 0
-            params["financiamiento"]["porcentaje_deuda"] = porc_deuda
-            
-            capex = cf.construir_cronograma_inversiones(params)
-            deuda = cf.crear_tabla_amortizacion(params, monto_deuda)
-            modelo_df = cf.generar_modelo_financiero_detallado(params, capex, deuda, monto_deuda)
+            modelo = resultados["flujos"]
 
-            fcf_proyecto = modelo_df["FCF No Apalancado (FCFF)"]
-            fcf_inversionista = modelo_df["FCF Apalancado (FCFE)"]
+            fcf_proyecto = resultados["fcff"]
+            fcf_inversionista = resultados["fcfe"]
 
             # DEBUGGING: Imprimir diagnostico de flujos
             print("\n--- DIAGNÓSTICO DE FLUJOS (GUI) ---")
@@ -416,39 +735,22 @@ class App(ctk.CTk):
             print(f"Inversión Total: {inv_total:,.2f}")
             print("-----------------------------------")
 
-            wacc = cf.WACC(params)
-            ke = params["financiamiento"]["costo_capital_propio_anual"]
-            
-            van_p = cf.VAN(fcf_proyecto, wacc)
-            tir_p = cf.TIR_anual(fcf_proyecto)
-            van_i = cf.VAN(fcf_inversionista, ke)
-            tir_i = cf.TIR_anual(fcf_inversionista)
-
-            # Cálculo de Métricas Adicionales (ROI y Múltiplo)
-            # --------------------------------------------------------------------------
-            # ROI Total y MOIC (Múltiplo de Capital Investido)
-            # Estas métricas son ACUMULADAS sobre toda la vida del proyecto, no anualizadas.
-            # - Invested Equity: Suma de todos los flujos negativos (aportes de capital).
-            # - Total Retornado: Suma de todos los flujos positivos (distribuciones).
-            # - MOIC = Total Retornado / Invested Equity
-            # - ROI Total = (Total Retornado - Invested Equity) / Invested Equity = MOIC - 1
-            # --------------------------------------------------------------------------
-            flujos_inv = fcf_inversionista.values
-            invested_equity = sum(-f for f in flujos_inv if f < 0)  
-            
-            # Total retornado es la suma de todas las distribuciones positivas
-            total_retornado = sum(f for f in flujos_inv if f > 0)
-            
-            multiplo = (total_retornado / invested_equity) if invested_equity > 0 else 0
-            roi_total = ((total_retornado - invested_equity) / invested_equity) if invested_equity > 0 else 0
+            wacc = resultados["wacc"]
+            van_p = resultados["van_proyecto"]
+            tir_p = resultados["tir_proyecto"]
+            van_i = resultados["van_inversionista"]
+            tir_i = resultados["tir_inversionista"]["tir_anual_equivalente"]
+
+            # ROI Total y MOIC: métricas ACUMULADAS sobre toda la vida del proyecto, no anualizadas
+            # (MOIC = Total Retornado / Invested Equity, ROI Total = MOIC - 1); ya vienen en los KPIs del modelo
+            roi_total = modelo.kpis["roi_total"]
+            multiplo = modelo.kpis["multiplo_capital"]
 
             # Calcular Inversión Total con Intereses
-            total_intereses = cf.calcular_total_intereses(deuda)
-            inversion_con_intereses = inv_total + total_intereses
+            inversion_con_intereses = inv_total + resultados["total_intereses"]
 
-            # Calcular Payback Periods
-            payback_n = cf.payback_normal(fcf_inversionista)
-            payback_d = cf.payback_descontado(fcf_inversionista, wacc)
+            payback_n = resultados["payback_normal"]
+            payback_d = resultados["payback_descontado"]
 
             # Actualizar GUI
             self.base_results_labels["inv_total"].configure(text=f"$ {inv_total:,.0f}")
@@ -460,40 +762,46 @@ class App(ctk.CTk):
             self.base_results_labels["van_inversionista"].configure(text=f"$ {van_i:,.0f}")
             self.base_results_labels["tir_inversionista"].configure(text=f"{tir_i:.2%}" if tir_i is not None else "N/A")
             self.base_results_labels["roi_total"].configure(text=f"{roi_total:.2%}")
-            self.base_results_labels["multiplo_capital"].configure(text=f"{multiplo:.2f}x")
+            self.base_results_labels["multiplo_capital"].configure(text=f"{multiplo:.2f}x" if not np.isnan(multiplo) else "N/A")
             self.base_results_labels["payback_normal"].configure(text=f"{payback_n:.2f}" if payback_n is not None else "N/A")
             self.base_results_labels["payback_descontado"].configure(text=f"{payback_d:.2f}" if payback_d is not None else "N/A")
 
-            # Sensibilidad
-            df_van, df_tir = self._run_sensitivity_analysis(params)
-            self._update_sensitivity_treeview(self.van_sensitivity_tree, df_van, lambda x: f"$ {x:,.0f}")
-            self._update_sensitivity_treeview(self.tir_sensitivity_tree, df_tir, lambda x: f"{x:.2%}" if pd.notna(x) else "N/A")
+            # Sensibilidad (sólo se redibuja la tabla cuyo nodo se recalculó)
+            if "sensibilidad_van" in recalculados:
+                self._update_sensitivity_treeview(self.van_sensitivity_tree, resultados["sensibilidad_van"], lambda x: f"$ {x:,.0f}")
+            if "sensibilidad_tir" in recalculados:
+                self._update_sensitivity_treeview(self.tir_sensitivity_tree, resultados["sensibilidad_tir"], lambda x: f"{x:.2%}" if not np.isnan(x) else "N/A")
             
             self.output_tabview.set("Resumen")
             
-            # 5. Actualizar Detalle de Deuda
-            self._update_deuda_treeview(modelo_df)
+            if "flujos" in recalculados:
+                # 5. Actualizar Detalle de Deuda
+                self._update_deuda_treeview(modelo)
+                # 7. Actualizar Proyección Operativa
+                self._update_proy_treeview(modelo)
             
             # 6. Actualizar Detalle Payback
-            self._update_payback_treeview(fcf_inversionista, wacc, payback_n, payback_d)
-            
-            # 7. Actualizar Proyección Operativa
-            self._update_proy_treeview(modelo_df)
+            if recalculados & {"fcfe", "wacc"}:
+                self._update_payback_treeview(fcf_inversionista, wacc, payback_n, payback_d)
             
+            self.progress_label.configure(
+                text=f"Análisis completado (recalculado: {', '.join(sorted(recalculados)) or 'nada'})"
+            )
             messagebox.showinfo("Éxito", "Análisis financiero completado.")
 
         except Exception as e:
             messagebox.showerror("Error", f"Error en el cálculo: {str(e)}")
 
     def _get_params_from_gui(self):
-        params = copy.deepcopy(cf.parametros)
+        # Capa sobre los parámetros por defecto: sólo se registran los valores leídos
+        params = cf.ParametrosOverlay(cf.parametros)
         params["horizonte_meses"] = int(self.entries["horizonte_meses"].get())
         params["ventas"]["crecimiento_precio_anual"] = float(self.entries[("ventas", "crecimiento_precio_anual")].get()) / 100
         
-        params["planes_venta"] = []
+        planes_venta = []
         for item_id in self.planes_tree.get_children():
             v = self.planes_tree.item(item_id, "values")
-            params["planes_venta"].append({
+            planes_venta.append({
                 "nombre": v[0],
                 "tipo": v[1],
                 "mes_inicio": int(v[2]),
@@ -504,6 +812,7 @@ class App(ctk.CTk):
                 "frecuencia": int(v[7]),
                 "cantidad_cuotas": int(v[8])
             })
+        params["planes_venta"] = planes_venta
         params["financiamiento"]["monto_deuda"] = float(self.entries[("financiamiento", "monto_deuda")].get())
         params["financiamiento"]["costo_deuda_anual"] = float(self.entries[("financiamiento", "costo_deuda_anual")].get()) / 100
         params["financiamiento"]["plazo_deuda_meses"] = int(self.entries[("financiamiento", "plazo_deuda_meses")].get())
@@ -511,15 +820,16 @@ class App(ctk.CTk):
         params["financiamiento"]["costo_capital_propio_anual"] = float(self.entries[("financiamiento", "costo_capital_propio_anual")].get()) / 100
         params["financiamiento"]["tasa_impuesto_renta"] = float(self.entries[("financiamiento", "tasa_impuesto_renta")].get()) / 100
         
-        params["cronograma_inversion"] = []
+        cronograma = []
         for item_id in self.investment_tree.get_children():
             v = self.investment_tree.item(item_id, "values")
-            params["cronograma_inversion"].append({"item": v[0], "monto": float(v[1]), "mes": int(v[2]), "tag_sensibilidad": v[3] if v[3] else None})
+            cronograma.append({"item": v[0], "monto": float(v[1]), "mes": int(v[2]), "tag_sensibilidad": v[3] if v[3] else None})
+        params["cronograma_inversion"] = cronograma
             
-        params["items_periodicos"] = []
+        items_periodicos = []
         for item_id in self.periodic_tree.get_children():
             v = self.periodic_tree.item(item_id, "values")
-            params["items_periodicos"].append({
+            items_periodicos.append({
                 "nombre": v[0], 
                 "monto": float(v[1]), 
                 "base_calculo": v[2],
@@ -527,6 +837,7 @@ class App(ctk.CTk):
                 "mes_fin": int(v[4]), 
                 "tipo": v[5]
             })
+        params["items_periodicos"] = items_periodicos
             
         return params
 
@@ -603,42 +914,32 @@ class App(ctk.CTk):
                 item["tipo"]
             ))
 
-    def _update_deuda_treeview(self, df):
+    def _update_deuda_treeview(self, modelo):
         for item in self.deuda_tree.get_children():
             self.deuda_tree.delete(item)
+
+        # Columnas del resultado compacto del modelo; Saldo Deuda inicial está en t=0
+        saldo_final = modelo.column("Saldo Deuda")
+        saldo_inicial = np.concatenate([[0.0], saldo_final[:-1]])
+        interes = modelo.column("Intereses")
+        amort = np.abs(modelo.column("Amortización Principal"))
+        meses = np.arange(len(saldo_final))
+
+        # Mostrar solo si hay deuda o si es el mes de entrada (t=0)
+        for mes in np.flatnonzero((meses == 0) | (saldo_inicial > 0) | (amort > 0)):
+            self.deuda_tree.insert("", "end", values=(
+                mes,
+                f"$ {saldo_inicial[mes]:,.0f}",
+                f"$ {interes[mes]:,.0f}",
+                f"$ {amort[mes]:,.0f}",
+                f"$ {saldo_final[mes]:,.0f}"
+            ))
         
-        total_interes = 0
-        total_amort = 0
-        
-        # Filtrar solo meses con saldo o actividad de deuda
-        # Saldo Deuda inicial está en t=0
-        for mes in df.index:
-            saldo_inicial = df.loc[mes-1, "Saldo Deuda"] if mes > 0 else 0
-            interes = df.loc[mes, "Intereses"]
-            amort = abs(df.loc[mes, "Amortización Principal"])
-            saldo_final = df.loc[mes, "Saldo Deuda"]
-            
-            total_interes += interes
-            total_amort += amort
-            
-            # Mostrar solo si hay deuda o si es el mes de entrada (t=0)
-            if mes == 0 or saldo_inicial > 0 or amort > 0:
-                self.deuda_tree.insert("", "end", values=(
-                    mes,
-                    f"$ {saldo_inicial:,.0f}",
-                    f"$ {interes:,.0f}",
-                    f"$ {amort:,.0f}",
-                    f"$ {saldo_final:,.0f}"
-                ))
-        
-        self.total_interes_label.configure(text=f"Total Intereses: $ {total_interes:,.0f}")
-        self.total_amort_label.configure(text=f"Total Amortización: $ {total_amort:,.0f}")
+        self.total_interes_label.configure(text=f"Total Intereses: $ {interes.sum():,.0f}")
+        self.total_amort_label.configure(text=f"Total Amortización: $ {amort.sum():,.0f}")
 
     def _update_payback_treeview(self, flujos, tasa_anual, payback_n, payback_d):
         """Actualiza la tabla de detalle de payback con análisis mes a mes."""
-        for item in self.payback_tree.get_children():
-            self.payback_tree.delete(item)
-        
         # Actualizar labels de resumen
         if payback_n is not None:
             self.payback_normal_label.configure(text=f"Payback Normal: {payback_n:.2f} meses")
@@ -650,71 +951,23 @@ class App(ctk.CTk):
         else:
             self.payback_desc_label.configure(text="Payback Descontado: No se recupera")
         
-        # Calcular flujos acumulados mes a mes
-        flujos_valores = flujos.values if hasattr(flujos, "values") else list(flujos)
+        # Flujos acumulados mes a mes (vectorizado); la tabla formatea sólo las filas visibles
+        flujos_valores = np.asarray(flujos, dtype=float)
         tasa_mensual = (1 + tasa_anual) ** (1 / 12) - 1
-        
-        acum_normal = 0.0
-        acum_desc = 0.0
-        recuperado_normal = False
-        recuperado_desc = False
-        
-        for mes in range(len(flujos_valores)):
-            flujo = flujos_valores[mes]
-            flujo_desc = flujo / ((1 + tasa_mensual) ** mes)
-            
-            acum_normal += flujo
-            acum_desc += flujo_desc
-            
-            # Determinar estado
-            estado = ""
-            if not recuperado_normal and acum_normal >= 0:
-                estado = "✓ Recupero Normal"
-                recuperado_normal = True
-            elif not recuperado_desc and acum_desc >= 0:
-                estado = "✓ Recupero Desc."
-                recuperado_desc = True
-            elif recuperado_normal and recuperado_desc:
-                estado = "✓ Ambos"
-            
-            # Mostrar todos los meses
-            self.payback_tree.insert("", "end", values=(
-                mes,
-                f"$ {flujo:,.0f}",
-                f"$ {acum_normal:,.0f}",
-                f"$ {flujo_desc:,.0f}",
-                f"$ {acum_desc:,.0f}",
-                estado
-            ))
-
-
-    def _run_sensitivity_analysis(self, p_base):
-        escenarios = {
-            "Crecimiento Precio": ("ventas", "crecimiento_precio_anual"),
-            "Tasa Préstamo": ("financiamiento", "costo_deuda_anual"),
-            "Monto Préstamo": ("financiamiento", "monto_deuda"),
-        }
-        variaciones = [-0.2, -0.1, 0.0, 0.1, 0.2]
-        res = []
-        for var_name, (sec, key) in escenarios.items():
-            for v in variaciones:
-                p = copy.deepcopy(p_base)
-                if sec == "cronograma_inversion":
-                    for item in p[sec]:
-                        if item.get("tag_sensibilidad") == key: item["monto"] *= (1+v)
-                else: p[sec][key] = p[sec][key] * (1+v)
-                
-                inv = cf.calcular_inversion_total(p)
-                mto_d = p["financiamiento"]["monto_deuda"]
-                cpx = cf.construir_cronograma_inversiones(p)
-                deu = cf.crear_tabla_amortizacion(p, mto_d)
-                mod = cf.generar_modelo_financiero_detallado(p, cpx, deu, mto_d)
-                flj = mod["FCF Apalancado (FCFE)"]
-                ke = p["financiamiento"]["costo_capital_propio_anual"]
-                res.append({"Variable": var_name, "Var": f"{v:+.0%}", "VAN": cf.VAN(flj, ke), "TIR": cf.TIR_anual(flj)})
-        
-        df = pd.DataFrame(res)
-        return df.pivot(index="Variable", columns="Var", values="VAN"), df.pivot(index="Variable", columns="Var", values="TIR")
+        meses = np.arange(len(flujos_valores))
+        flujos_desc = flujos_valores / ((1 + tasa_mensual) ** meses)
+        acum_normal = np.cumsum(flujos_valores)
+        acum_desc = np.cumsum(flujos_desc)
+
+        moneda = lambda x: f"$ {x:,.0f}"
+        self.payback_tree.mostrar([
+            (meses, str),
+            (flujos_valores, moneda),
+            (acum_normal, moneda),
+            (flujos_desc, moneda),
+            (acum_desc, moneda),
+            (cf.estado_payback(acum_normal, acum_desc), str),
+        ])
 
     def _update_sensitivity_treeview(self, tree, df, format_func):
         tree["columns"] = ["Variable"] + df.columns.tolist()
@@ -726,24 +979,54 @@ class App(ctk.CTk):
         for idx, row in df.iterrows():
             tree.insert("", "end", values=[idx] + [format_func(x) for x in row.values])
 
-    def _update_proy_treeview(self, df):
-        for item in self.proy_tree.get_children():
-            self.proy_tree.delete(item)
-            
-        for mes in df.index:
-            # Mostrar solo si hay actividad o es el principio
-            if mes == 0 or df.loc[mes, "Ingresos Totales"] != 0 or df.loc[mes, "Costos Operativos Dinámicos"] != 0:
-                self.proy_tree.insert("", "end", values=(
-                    mes,
-                    f"{df.loc[mes, 'Lotes Vendidos']:.0f}",
-                    f"{df.loc[mes, 'Lotes en Inventario']:.0f}",
-                    f"$ {df.loc[mes, 'Ingresos Ventas Pies']:,.0f}",
-                    f"$ {df.loc[mes, 'Ingresos Ventas Cuotas']:,.0f}",
-                    f"$ {df.loc[mes, 'Otros Ingresos']:,.0f}",
-                    f"$ {df.loc[mes, 'Ingresos Totales']:,.0f}",
-                    f"$ {df.loc[mes, 'Costos Operativos Dinámicos']:,.0f}",
-                    f"$ {df.loc[mes, 'EBITDA']:,.0f}"
-                ))
+    def _mostrar_tabla_2d(self, etiquetas, resultado):
+        self._ensure_detail_widgets()
+        self.tabla_2d_resultado = (etiquetas, resultado)
+        self._dibujar_tabla_2d()
+        self.output_tabview.set("Tabla 2D")
+        self.progress_label.configure(text="Tabla 2D completada")
+
+    def _dibujar_tabla_2d(self):
+        if self.tabla_2d_resultado is None:
+            return
+        (etiqueta_filas, etiqueta_columnas), resultado = self.tabla_2d_resultado
+        escala_filas = self.TABLA_2D_VARIABLES[etiqueta_filas][1]
+        escala_columnas = self.TABLA_2D_VARIABLES[etiqueta_columnas][1]
+        if self.tabla_2d_metrica.get() == "VAN Inversionista":
+            valores, formato = resultado["van"], lambda x: f"$ {x:,.0f}"
+        else:
+            valores, formato = resultado["tir"], lambda x: f"{x:.2%}" if not np.isnan(x) else "N/A"
+
+        tree = self.tabla_2d_tree
+        encabezados = [f"{etiqueta_filas} / {etiqueta_columnas}"] + [f"{v * escala_columnas:,.4g}" for v in resultado["columnas"]]
+        ids = [f"c{i}" for i in range(len(encabezados))]
+        tree["columns"] = ids
+        for id_columna, texto in zip(ids, encabezados):
+            tree.heading(id_columna, text=texto)
+            tree.column(id_columna, width=90, anchor="center", stretch=False)
+        tree.column(ids[0], width=220, anchor="w")
+        tree.delete(*tree.get_children())
+        for valor_fila, fila in zip(resultado["filas"], valores):
+            tree.insert("", "end", values=[f"{valor_fila * escala_filas:,.4g}"] + [formato(x) for x in fila])
+
+    def _update_proy_treeview(self, modelo):
+        ingresos = modelo.column("Ingresos Totales")
+        costos = modelo.column("Costos Operativos Dinámicos")
+        # Mostrar solo si hay actividad o es el principio
+        meses = np.flatnonzero((np.arange(len(ingresos)) == 0) | (ingresos != 0) | (costos != 0))
+        entero = lambda x: f"{x:.0f}"
+        moneda = lambda x: f"$ {x:,.0f}"
+        self.proy_tree.mostrar([
+            (meses, str),
+            (modelo.column("Lotes Vendidos")[meses], entero),
+            (modelo.column("Lotes en Inventario")[meses], entero),
+            (modelo.column("Ingresos Ventas Pies")[meses], moneda),
+            (modelo.column("Ingresos Ventas Cuotas")[meses], moneda),
+            (modelo.column("Otros Ingresos")[meses], moneda),
+            (ingresos[meses], moneda),
+            (costos[meses], moneda),
+            (modelo.column("EBITDA")[meses], moneda),
+        ])
 
 class VentaPlanDialog(ctk.CTkToplevel):
     def __init__(self, parent):
@@ -185,5 +185,875 @@ class TestCalculadoraFinanciera(unittest.TestCase):
         # It should return one of the valid roots (approx 0.10 or 0.20)
         self.assertTrue(abs(tir_m - 0.10) < 1e-4 or abs(tir_m - 0.20) < 1e-4)
 
+    def test_motor_cobranza_vs_bucle(self):
+        """
+        The convolution-based collection engine must match the per-lot, per-cuota loop.
+        """
+        from calculadora_financiera import _proyectar_ventas, compilar_proyecto
+        horizonte = 60
+        p = {
+            "ventas": {"crecimiento_precio_anual": 0.07},
+            "planes_venta": [
+                {"cantidad_lotes": 23, "velocidad": 4, "monto_pie": 1000, "monto_cuota": 150,
+                 "frecuencia": 2, "cantidad_cuotas": 20, "tipo": "Dinámico", "mes_inicio": 1},
+                {"cantidad_lotes": 50, "velocidad": 0, "monto_pie": 5000, "monto_cuota": 300,
+                 "frecuencia": 3, "cantidad_cuotas": 12, "tipo": "Programado", "mes_inicio": 30},
+            ],
+        }
+
+        pies = np.zeros(horizonte + 1)
+        cuotas = np.zeros(horizonte + 1)
+        vendidos_ref = np.zeros(horizonte + 1)
+        restantes = [plan["cantidad_lotes"] for plan in p["planes_venta"]]
+        for mes in range(1, horizonte + 1):
+            factor = 1.07 ** ((mes - 1) / 12.0)
+            for i, plan in enumerate(p["planes_venta"]):
+                if plan["tipo"] == "Programado":
+                    vendidos = restantes[i] if mes == plan["mes_inicio"] else 0
+                else:
+                    vendidos = min(plan["velocidad"], restantes[i])
+                restantes[i] -= vendidos
+                vendidos_ref[mes] += vendidos
+                pies[mes] += plan["monto_pie"] * factor * vendidos
+                desfase = 0 if plan["tipo"] == "Programado" else 1
+                for _ in range(vendidos):
+                    for c in range(plan["cantidad_cuotas"]):
+                        mes_cobro = mes + c * plan["frecuencia"] + desfase
+                        if mes_cobro <= horizonte:
+                            cuotas[mes_cobro] += plan["monto_cuota"] * factor
+
+        lotes, cobros_pies, cobros_cuotas = _proyectar_ventas(compilar_proyecto(p), horizonte)
+        self.assertTrue(np.array_equal(lotes, vendidos_ref))
+        self.assertTrue(np.allclose(cobros_pies, pies, rtol=1e-12))
+        self.assertTrue(np.allclose(cobros_cuotas, cuotas, rtol=1e-12))
+
+    def test_flujos_modelo_sin_dataframe(self):
+        """
+        The array-only path returns the same cash flows as the DataFrame model.
+        """
+        import copy
+        import calculadora_financiera as cf
+        p = copy.deepcopy(cf.parametros)
+        monto = p["financiamiento"]["monto_deuda"]
+        capex = cf.construir_cronograma_inversiones(p)
+        tabla = cf.crear_tabla_amortizacion(p, monto)
+        df = cf.generar_modelo_financiero_detallado(p, capex, tabla, monto)
+        flujos = cf.calcular_flujos_modelo(p, capex, tabla, monto)
+
+        self.assertEqual(list(df.columns), cf.COLUMNAS_MODELO)
+        self.assertTrue(np.array_equal(flujos["FCF Apalancado (FCFE)"], df["FCF Apalancado (FCFE)"].values))
+        self.assertTrue(np.array_equal(flujos["FCF No Apalancado (FCFF)"], df["FCF No Apalancado (FCFF)"].values))
+
+    def test_modelo_batch_vs_individual(self):
+        """
+        Each row of the batched model must equal the single-scenario model.
+        """
+        import copy
+        import calculadora_financiera as cf
+        base = copy.deepcopy(cf.parametros)
+        base["items_periodicos"] = [
+            {"nombre": "Renta", "tipo": "Ingreso", "monto": 20000, "mes_inicio": 1, "mes_fin": 12, "base_calculo": "Monto Fijo"},
+            {"nombre": "Comisión", "tipo": "Gasto", "monto": 3, "mes_inicio": 1, "mes_fin": 120, "base_calculo": "% Ventas"},
+            {"nombre": "Mantención", "tipo": "Gasto", "monto": 100, "mes_inicio": 1, "mes_fin": 60, "base_calculo": "Por Lote Inventario"},
+            {"nombre": "Bono", "tipo": "Gasto", "monto": 10, "mes_inicio": 1, "mes_fin": 120, "base_calculo": "% Utilidad"},
+        ]
+        escenarios = []
+        for factor in (0.8, 1.0, 1.2):
+            p = copy.deepcopy(base)
+            p["ventas"]["crecimiento_precio_anual"] *= factor
+            p["financiamiento"]["costo_deuda_anual"] *= factor
+            p["planes_venta"][0]["velocidad"] = int(p["planes_venta"][0]["velocidad"] * factor)
+            escenarios.append(p)
+        escenarios[2]["financiamiento"]["capitalizacion"] = "Trimestral"
+
+        columnas, kpis = cf.generar_modelo_financiero_batch(escenarios)
+        for i, p in enumerate(escenarios):
+            monto = p["financiamiento"]["monto_deuda"]
+            df = cf.generar_modelo_financiero_detallado(
+                p, cf.construir_cronograma_inversiones(p), cf.crear_tabla_amortizacion(p, monto), monto
+            )
+            for nombre in cf.COLUMNAS_MODELO:
+                self.assertTrue(np.allclose(columnas[nombre][i], df[nombre].values, rtol=1e-11), nombre)
+            self.assertAlmostEqual(kpis["roi_estatico"][i], df.attrs["roi_estatico"])
+
+        otro_horizonte = copy.deepcopy(base)
+        otro_horizonte["horizonte_meses"] = 60
+        with self.assertRaises(ValueError):
+            cf.generar_modelo_financiero_batch([base, otro_horizonte])
+
+    def test_modelo_sin_tabla_amortizacion(self):
+        """
+        tabla_amortizacion=None keeps its original meaning in the public model functions:
+        no debt schedule, so no interest or principal (only the debt inflow at t=0).
+        """
+        import copy
+        import calculadora_financiera as cf
+        p = copy.deepcopy(cf.parametros)
+        p["financiamiento"]["monto_deuda"] = 5e6
+        capex = cf.construir_cronograma_inversiones(p)
+        df = cf.generar_modelo_financiero_detallado(p, capex, None, 5e6)
+        self.assertEqual(df["Intereses"].abs().sum(), 0.0)
+        self.assertEqual(df["Amortización Principal"].abs().sum(), 0.0)
+        self.assertEqual(df["Saldo Deuda"].abs().sum(), 0.0)
+        self.assertEqual(df["Entrada Deuda"].iloc[0], 5e6)
+        flujos = cf.calcular_flujos_modelo(p, capex, None, 5e6)
+        np.testing.assert_array_equal(flujos["FCF Apalancado (FCFE)"], df["FCF Apalancado (FCFE)"].to_numpy())
+
+        con_tabla = cf.generar_modelo_financiero_detallado(p, capex, cf.crear_tabla_amortizacion(p, 5e6), 5e6)
+        self.assertGreater(con_tabla["Intereses"].sum(), 0.0)
+
+    def test_tir_newton_vs_escaneo(self):
+        """
+        For flows with a single sign change the Newton path must find the same root
+        as the full bracketing scan.
+        """
+        from calculadora_financiera import _find_roots_by_bracketing
+        rng = np.random.default_rng(7)
+        for _ in range(20):
+            flujos = np.abs(rng.normal(1000, 400, 121))
+            flujos[:4] *= -12
+            raices = _find_roots_by_bracketing(flujos)
+            self.assertEqual(len(raices), 1)
+            self.assertAlmostEqual(_resolver_tir(flujos), raices[0], places=7)
+
+        # Root near r = -1 must not overflow: 1 + r = 0.01 -> r = -0.99
+        flujos = [-1.0] + [0.0] * 99 + [0.01 ** 100]
+        self.assertAlmostEqual(_resolver_tir(flujos), -0.99, places=9)
+
+    def test_tir_cola_de_ceros(self):
+        """
+        Zero months at either end do not change the IRR: a long zero tail used to make the
+        scaled NPV underflow to 0 at r = -0.9999 and the solver return that bound.
+        """
+        import copy
+        import calculadora_financiera as cf
+        from calculadora_financiera import TIR_anual
+        self.assertAlmostEqual(TIR_anual([-100, 60, 60] + [0] * 100), TIR_anual([-100, 60, 60]), places=10)
+        self.assertAlmostEqual(TIR_anual([0] * 30 + [-100, 60, 60] + [0] * 100), TIR_anual([-100, 60, 60]), places=10)
+        # Primer flujo positivo (un solo cambio de signo), también con cola de ceros
+        self.assertAlmostEqual(TIR_anual([50, 50, -120]), 3.2380323, places=6)
+        self.assertAlmostEqual(TIR_anual([50, 50, -120] + [0] * 200), TIR_anual([50, 50, -120]), places=10)
+
+        # Proyecto real con horizonte largo: CAPEX en el mes 0 y sin deuda
+        p = copy.deepcopy(cf.parametros)
+        p["horizonte_meses"] = 240
+        for item in p["cronograma_inversion"]:
+            item["mes"] = 0
+        p["financiamiento"]["monto_deuda"] = 0
+        kpis = cf.evaluar_proyecto(p).kpis
+        self.assertAlmostEqual(kpis["tir_proyecto"], 0.1998144, places=6)
+        self.assertAlmostEqual(kpis["tir_inversionista"], 0.1998144, places=6)
+
+    def test_kernel_van_matriz(self):
+        """
+        The NPV kernel must match a scalar loop for every flow/rate pair and keep
+        the historical infinite results as masks.
+        """
+        from calculadora_financiera import _npv_matriz, VAN, VAN_matriz
+        rng = np.random.default_rng(3)
+        flujos = rng.normal(0, 1000, (4, 37))
+        tasas = np.array([-0.5, 0.0, 0.01, 0.3, 2.0])
+        resultado = _npv_matriz(flujos, tasas)
+        self.assertEqual(resultado.shape, (4, 5))
+        for i in range(4):
+            for j, r in enumerate(tasas):
+                esperado = sum(cf / (1 + r) ** t for t, cf in enumerate(flujos[i]))
+                self.assertAlmostEqual(resultado[i, j], esperado, delta=1e-9 * max(1.0, abs(esperado)))
+
+        self.assertTrue(np.allclose(VAN_matriz(flujos, 0.12), [VAN(f, 0.12) for f in flujos]))
+
+        # 1 + r <= 0 -> +inf; denominator underflow -> sign of first non-zero flow from there on
+        self.assertEqual(_npv_matriz([-1.0, 2.0], -1.0), np.inf)
+        self.assertEqual(_npv_matriz([1.0] + [0.0] * 300 + [-2.0], -0.99), -np.inf)
+
+    def test_tir_batch_vs_individual(self):
+        """
+        TIR_anual_batch must reproduce TIR_anual row by row, including rows resolved by the
+        scan (several sign changes) and rows without an IRR.
+        """
+        from calculadora_financiera import TIR_anual_batch, TIR_anual
+        rng = np.random.default_rng(11)
+        una_raiz = np.abs(rng.normal(100, 30, (20, 48)))
+        una_raiz[:, :4] = -rng.uniform(500, 2000, (20, 4))
+        varias = rng.normal(0, 100, (5, 48))
+        sin_tir = np.vstack([np.zeros(48), np.ones(48)])
+        flujos = np.vstack([una_raiz, varias, sin_tir])
+
+        res = TIR_anual_batch(flujos)
+        self.assertEqual(res["tir_mensual"].shape, (27,))
+        for i, fila in enumerate(flujos):
+            esperado = TIR_anual(fila)
+            if esperado is None:
+                self.assertFalse(res["converged"][i])
+                self.assertTrue(np.isnan(res["tir_anual_equivalente"][i]))
+            else:
+                self.assertTrue(res["converged"][i])
+                self.assertAlmostEqual(res["tir_anual_equivalente"][i], esperado, places=9)
+        self.assertTrue((res["iteraciones"][:20] > 0).all())
+        self.assertTrue((res["iteraciones"][20:] == 0).all())
+
+    def test_tir_batch_flujos_con_relleno(self):
+        """
+        TIR_anual_batch must match TIR_anual on rows padded with zeros (rows of different
+        length in one matrix, long zero tails, leading zeros, positive first flow).
+        """
+        from calculadora_financiera import TIR_anual_batch, TIR_anual
+        filas = [
+            [-100, 60, 60],
+            [50, 50, -120],
+            [0] * 30 + [-100, 60, 60],
+            [-100] + [3] * 150,
+            [-1000] * 3 + [150] * 30,
+        ]
+        flujos = np.zeros((len(filas), 241))
+        for i, fila in enumerate(filas):
+            flujos[i, :len(fila)] = fila
+        for tir_inicial in (None, 0.05):
+            res = TIR_anual_batch(flujos, tir_inicial=tir_inicial)
+            self.assertTrue(res["converged"].all())
+            for i, fila in enumerate(flujos):
+                self.assertAlmostEqual(res["tir_anual_equivalente"][i], TIR_anual(fila), places=9)
+
+    def test_tir_arranque_en_caliente(self):
+        """
+        A warm start must speed up nearby scenarios without changing the chosen root,
+        even when the guess is close to a root the robust path would not pick.
+        """
+        from calculadora_financiera import TIR_anual, TIR_anual_batch, _find_roots_by_bracketing
+        base = np.array([-1000.0] * 3 + [150.0] * 30)
+        variaciones = np.where(base < 0, base, base * np.array([0.9, 0.95, 1.0, 1.05, 1.1])[:, None])
+        tir_base = TIR_anual(base, return_structure=True)["tir_mensual"]
+
+        frio = TIR_anual_batch(variaciones)
+        caliente = TIR_anual_batch(variaciones, tir_inicial=tir_base)
+        np.testing.assert_allclose(caliente["tir_mensual"], frio["tir_mensual"], rtol=1e-10)
+        self.assertLess(caliente["iteraciones"].sum(), frio["iteraciones"].sum())
+
+        # Flujo con varias raíces: la estimación cerca de otra raíz no altera la elección
+        flujo = np.array([-100.0, 230.0, -132.0])
+        raices = _find_roots_by_bracketing(flujo)
+        self.assertGreater(len(raices), 1)
+        elegida = TIR_anual(flujo)
+        for guess in raices:
+            self.assertEqual(TIR_anual(flujo, tir_inicial=guess), elegida)
+
+    def test_sensibilidad_paralela_vs_serie(self):
+        """
+        The process-pool runner must return the same rows, in the same order, as the
+        serial batch evaluation.
+        """
+        import calculadora_financiera as cf
+        escenarios = {
+            "Crecimiento Precio": ("ventas", "crecimiento_precio_anual"),
+            "Terreno": ("cronograma_inversion", "costo_terreno"),
+        }
+        etiquetas, escenarios_test = cf.construir_escenarios_sensibilidad(cf.parametros, escenarios, [-0.1, 0.0, 0.1])
+        self.assertEqual(etiquetas[3], ("Terreno", -0.1))
+        self.assertAlmostEqual(escenarios_test[3]["cronograma_inversion"][0]["monto"], 4_500_000)
+
+        serie, kpis_serie = cf.generar_modelo_financiero_batch(escenarios_test)
+        nombre = "FCF Apalancado (FCFE)"
+        for workers in (1, 2):
+            paralelo, kpis = cf.generar_modelo_financiero_paralelo(
+                escenarios_test, columnas=(nombre,), max_workers=workers, escenarios_por_tarea=2
+            )
+            self.assertEqual(list(paralelo), [nombre])
+            np.testing.assert_allclose(paralelo[nombre], serie[nombre])
+            np.testing.assert_allclose(kpis["roi_estatico"], kpis_serie["roi_estatico"])
+
+        # Por defecto, con pocos escenarios por proceso no se crea el pool
+        from unittest import mock
+        with mock.patch("concurrent.futures.ProcessPoolExecutor", side_effect=AssertionError("pool")):
+            auto, _ = cf.generar_modelo_financiero_paralelo(escenarios_test, columnas=(nombre,))
+        np.testing.assert_allclose(auto[nombre], serie[nombre])
+
+    def test_parametros_overlay(self):
+        """
+        A copy-on-write overlay must read like the modified dict, never touch the base,
+        and give the same model as a deep-copied, edited parameter tree.
+        """
+        import copy
+        import calculadora_financiera as cf
+        base = copy.deepcopy(cf.parametros)
+        capa = cf.ParametrosOverlay(base, {("financiamiento", "costo_deuda_anual"): 0.15},
+                                    multiplicadores_tag={"costo_urbanizacion": 1.2})
+        capa["planes_venta"][1]["velocidad"] = 4
+        capa["financiamiento"]["porcentaje_deuda"] = 0.4
+
+        esperado = copy.deepcopy(base)
+        esperado["financiamiento"]["costo_deuda_anual"] = 0.15
+        esperado["financiamiento"]["porcentaje_deuda"] = 0.4
+        esperado["planes_venta"][1]["velocidad"] = 4
+        for item in esperado["cronograma_inversion"]:
+            if item["tag_sensibilidad"] == "costo_urbanizacion":
+                item["monto"] *= 1.2
+
+        self.assertEqual(base, cf.parametros)
+        self.assertEqual(capa.materializar(), esperado)
+        self.assertEqual(set(capa.cambios), {("financiamiento", "costo_deuda_anual"),
+                                             ("financiamiento", "porcentaje_deuda"),
+                                             ("planes_venta", 1, "velocidad")})
+        derivada = capa.con({("ventas", "crecimiento_precio_anual"): 0.0})
+        self.assertEqual(capa["ventas"]["crecimiento_precio_anual"], 0.05)
+        self.assertEqual(derivada["planes_venta"][1]["velocidad"], 4)
+
+        monto = esperado["financiamiento"]["monto_deuda"]
+        df_capa, df_esperado = (
+            cf.generar_modelo_financiero_detallado(
+                p, cf.construir_cronograma_inversiones(p), cf.crear_tabla_amortizacion(p, monto), monto
+            )
+            for p in (capa, esperado)
+        )
+        self.assertTrue(df_capa.equals(df_esperado))
+
+    def test_cache_etapas(self):
+        """
+        Stage results are memoized by their own inputs: a change that no stage reads
+        hits every stage, and the LRU bound is respected.
+        """
+        import calculadora_financiera as cf
+        cache = cf.cache_etapas
+        cache.limpiar()
+        base = cf.ParametrosOverlay(cf.parametros)
+        monto = base["financiamiento"]["monto_deuda"]
+
+        def correr(p):
+            return cf.generar_modelo_financiero_detallado(
+                p, cf.construir_cronograma_inversiones(p), cf.crear_tabla_amortizacion(p, monto), monto
+            )
+
+        df_base = correr(base)
+        self.assertEqual(cache.aciertos["amortizacion"], 0)
+        df_ke = correr(base.con({("financiamiento", "costo_capital_propio_anual"): 0.25}))
+        self.assertTrue(df_ke.equals(df_base))
+        for etapa in ("capex", "amortizacion", "ventas", "operativo"):
+            self.assertEqual((cache.aciertos[etapa], cache.fallos[etapa]), (1, 1), etapa)
+
+        # Sólo la amortización depende de la tasa de deuda
+        correr(base.con({("financiamiento", "costo_deuda_anual"): 0.2}))
+        self.assertEqual(cache.fallos["amortizacion"], 2)
+        self.assertEqual(cache.fallos["ventas"], 1)
+
+        # Por lotes: claves repetidas entre escenarios se calculan una sola vez
+        _, escenarios = cf.construir_escenarios_sensibilidad(
+            base, {"Tasa": ("financiamiento", "costo_deuda_anual")}, [-0.1, 0.0, 0.1])
+        cf.generar_modelo_financiero_batch(escenarios)
+        self.assertEqual(cache.fallos["amortizacion_lote"], 3)
+        self.assertEqual(cache.fallos["ventas_lote"], 1)
+
+        pequena = cf.CacheEtapas(max_entradas=2)
+        for i in range(3):
+            pequena.obtener("etapa", i, lambda: np.zeros(1))
+        self.assertEqual(len(pequena), 2)
+        self.assertIsNone(pequena.buscar("etapa", 0))
+        cache.limpiar()
+
+    def test_amortizacion_batch_forma_cerrada(self):
+        """
+        The closed-form batch schedule must match the single-loan table for loans with
+        different amounts, rates, terms and payment frequencies (incl. a term that is not
+        a multiple of the period, which leaves a balance until the term ends).
+        """
+        import copy
+        import calculadora_financiera as cf
+        prestamos = [(1200, 0.12, 12, "Mensual"), (5000, 0.08, 10, "Trimestral"), (800, 0.0, 24, "Anual")]
+        cubo = cf.calcular_amortizacion_batch(
+            [m for m, _, _, _ in prestamos], [t for _, t, _, _ in prestamos],
+            [pl for _, _, pl, _ in prestamos], [cf._MESES_POR_PERIODO[c] for _, _, _, c in prestamos], 36
+        )
+        self.assertEqual(cubo.shape, (4, 3, 37))
+        for i, (monto, tasa, plazo, cap) in enumerate(prestamos):
+            p = copy.deepcopy(cf.parametros)
+            p["horizonte_meses"] = 36
+            p["financiamiento"].update(costo_deuda_anual=tasa, plazo_deuda_meses=plazo, capitalizacion=cap)
+            tabla = cf.crear_tabla_amortizacion(p, monto)
+            for j, nombre in enumerate(cf.COLUMNAS_AMORTIZACION):
+                np.testing.assert_allclose(cubo[j, i, 1:], tabla[nombre].values, atol=1e-9)
+        # plazo 10 trimestral: 4 cuotas de 1250 pero sólo 3 pagos dentro del plazo
+        self.assertAlmostEqual(cubo[3, 1, 10], 1250.0)
+        self.assertEqual(cubo[3, 1, 11], 0.0)
+
+    def test_items_periodicos_compilados(self):
+        """
+        Each "% Utilidad" expense applies to EBITDA net of the expenses listed before it,
+        so the order of the items changes the result.
+        """
+        from calculadora_financiera import _proyeccion_operativa, compilar_proyecto
+        def item(tipo, monto, base, inicio=1, fin=12):
+            return {"nombre": base, "tipo": tipo, "monto": monto, "mes_inicio": inicio, "mes_fin": fin, "base_calculo": base}
+        ventas = np.full(13, 1000.0)
+        inventario = np.full(13, 10.0)
+        p = {"items_periodicos": [
+            item("Ingreso", 200, "Monto Fijo", fin=6),
+            item("Gasto", 100, "Monto Fijo"),
+            item("Gasto", 10, "% Utilidad"),
+            item("Gasto", 5, "% Ventas"),
+            item("Gasto", 2, "Por Lote Inventario", inicio=4),
+            item("Gasto", 50, "% Utilidad"),
+        ]}
+        otros, costos = _proyeccion_operativa(compilar_proyecto(p), ventas, inventario, 12)
+        self.assertEqual(otros[0], 0.0)
+        self.assertEqual(otros[6], 200.0)
+        self.assertEqual(otros[7], 0.0)
+        # mes 5: ingresos 1200; 100 -> +110 (10% de 1100) -> +60 (5%) -> +20 -> +455 (50% de 910)
+        self.assertAlmostEqual(costos[5], 745.0)
+        # mes 3: sin el gasto por lote -> 100 + 110 + 60 + 465
+        self.assertAlmostEqual(costos[3], 735.0)
+
+        p["items_periodicos"].insert(0, p["items_periodicos"].pop(2))
+        _, costos_reordenados = _proyeccion_operativa(compilar_proyecto(p), ventas, inventario, 12)
+        self.assertAlmostEqual(costos_reordenados[5], 120.0 + 100 + 60 + 20 + 450)
+
+    def test_kernel_impuestos_perdida_arrastrable(self):
+        """
+        The closed-form carryforward must match the month-by-month rule for 1D and 2D
+        inputs; expiry and usage caps are kernel parameters.
+        """
+        from calculadora_financiera import calcular_impuestos_con_perdidas
+        rng = np.random.default_rng(5)
+        ebt = rng.normal(0, 100, (6, 40))
+        tasas = np.linspace(0.1, 0.35, 6)
+
+        esperado = np.zeros_like(ebt)
+        for i in range(ebt.shape[0]):
+            arrastre = 0.0
+            for t, valor in enumerate(ebt[i]):
+                if valor < 0:
+                    arrastre -= valor
+                else:
+                    uso = min(valor, arrastre)
+                    arrastre -= uso
+                    esperado[i, t] = -(valor - uso) * tasas[i]
+
+        impuestos, _ = calcular_impuestos_con_perdidas(ebt, tasas)
+        np.testing.assert_allclose(impuestos, esperado, atol=1e-9)
+        impuestos_1d, _ = calcular_impuestos_con_perdidas(ebt[2], tasas[2])
+        np.testing.assert_allclose(impuestos_1d, esperado[2], atol=1e-9)
+        # Reglas neutras por el camino general dan lo mismo
+        general, _ = calcular_impuestos_con_perdidas(ebt, tasas, meses_vencimiento=100, fraccion_max_uso=1.0)
+        np.testing.assert_allclose(general, esperado, atol=1e-9)
+
+        # Vencimiento: la pérdida del mes 0 sólo cubre hasta el mes 2
+        impuestos, perdida = calcular_impuestos_con_perdidas([-100.0, 0, 30, 50, 80], 0.5, meses_vencimiento=2)
+        np.testing.assert_allclose(impuestos, [0, 0, 0, -25, -40])
+        np.testing.assert_allclose(perdida, [100, 100, 70, 0, 0])
+        # Tope de uso: la pérdida compensa a lo más la mitad de la utilidad del mes
+        impuestos, perdida = calcular_impuestos_con_perdidas([-100.0, 60, 100], 1.0, fraccion_max_uso=0.5)
+        np.testing.assert_allclose(impuestos, [0, -30, -50])
+        np.testing.assert_allclose(perdida, [100, 70, 20])
+
+    def test_grafo_recalculo_incremental(self):
+        """
+        Editing a parameter only recomputes the nodes downstream of it, and the
+        incremental values match a graph evaluated from scratch.
+        """
+        import calculadora_financiera as cf
+        escenarios = {"Tasa Préstamo": ("financiamiento", "costo_deuda_anual")}
+        variaciones = [-0.1, 0.0, 0.1]
+        grafo = cf.construir_grafo_modelo(escenarios, variaciones)
+        base = cf.ParametrosOverlay(cf.parametros)
+        grafo.actualizar(base)
+        grafo.evaluar()
+        grafo.actualizar(base)
+        grafo.evaluar()
+        self.assertEqual(grafo.recalculados, [])
+
+        p_ke = base.con({("financiamiento", "costo_capital_propio_anual"): 0.25})
+        grafo.actualizar(p_ke)
+        valores = grafo.evaluar()
+        self.assertEqual(set(grafo.recalculados),
+                         {"wacc", "van_proyecto", "van_inversionista", "payback_descontado", "sensibilidad_van"})
+        desde_cero = cf.construir_grafo_modelo(escenarios, variaciones)
+        desde_cero.actualizar(p_ke)
+        esperado = desde_cero.evaluar()
+        for nombre in ("wacc", "van_proyecto", "van_inversionista", "payback_descontado"):
+            self.assertEqual(valores[nombre], esperado[nombre], nombre)
+        self.assertTrue(valores["sensibilidad_van"].equals(esperado["sensibilidad_van"]))
+
+        # Los ítems periódicos tocan opex y lo que sigue, nunca la deuda ni el capex
+        items = [{"nombre": "Admin", "monto": 10_000, "base_calculo": "Monto Fijo", "mes_inicio": 1, "mes_fin": 24, "tipo": "Gasto"}]
+        grafo.actualizar(p_ke.con({("items_periodicos",): items}))
+        grafo.evaluar()
+        self.assertTrue({"opex", "flujos", "sensibilidad_flujos"} <= set(grafo.recalculados))
+        self.assertFalse({"deuda", "capex", "ventas", "total_intereses"} & set(grafo.recalculados))
+
+    def test_grafo_cancelacion(self):
+        """
+        A cancelled evaluation raises CalculoCancelado and leaves the graph consistent:
+        finished nodes are kept and the rest is computed on the next run.
+        """
+        import calculadora_financiera as cf
+        grafo = cf.construir_grafo_modelo({"Tasa Préstamo": ("financiamiento", "costo_deuda_anual")}, [-0.1, 0.0, 0.1])
+        grafo.actualizar(cf.ParametrosOverlay(cf.parametros))
+        avances = []
+
+        def cancelar_tras_flujos():
+            return "flujos" in grafo.recalculados
+
+        with self.assertRaises(cf.CalculoCancelado):
+            grafo.evaluar(cancelado=cancelar_tras_flujos, al_avanzar=lambda nombre, *_: avances.append(nombre))
+        self.assertIn("flujos", grafo.recalculados)
+        self.assertNotIn("wacc", grafo.recalculados)
+        self.assertEqual(avances, grafo.recalculados[-len(avances):])
+
+        grafo.evaluar()
+        self.assertNotIn("flujos", grafo.recalculados[grafo.recalculados.index("wacc"):])
+        self.assertIn("sensibilidad_tir", grafo.recalculados)
+
+        # El barrido de escenarios también se abandona entre bloques
+        _, escenarios_test = cf.construir_escenarios_sensibilidad(
+            cf.parametros, {"Tasa Préstamo": ("financiamiento", "costo_deuda_anual")}, [-0.1, 0.0, 0.1])
+        with self.assertRaises(cf.CalculoCancelado):
+            cf.generar_modelo_financiero_paralelo(escenarios_test, max_workers=1, cancelado=lambda: True)
+
+    def test_evaluar_proyecto_sin_pandas(self):
+        """
+        The headless path returns the same columns as the DataFrame adapter and KPIs
+        consistent with the standalone metric functions.
+        """
+        import calculadora_financiera as cf
+        p = cf.ParametrosOverlay(cf.parametros)
+        monto = p["financiamiento"]["monto_deuda"]
+        resultado = cf.evaluar_proyecto(p)
+
+        df = cf.generar_modelo_financiero_detallado(
+            p, cf.construir_cronograma_inversiones(p), cf.crear_tabla_amortizacion(p, monto), monto
+        )
+        for nombre in cf.COLUMNAS_MODELO:
+            np.testing.assert_array_equal(resultado.column(nombre), df[nombre].to_numpy(), err_msg=nombre)
+        self.assertEqual(df.attrs["roi_estatico"], resultado.kpis["roi_estatico"])
+
+        kpis = resultado.kpis
+        self.assertAlmostEqual(kpis["van_inversionista"], cf.VAN(resultado.fcfe, p["financiamiento"]["costo_capital_propio_anual"]))
+        self.assertAlmostEqual(kpis["van_proyecto"], cf.VAN(resultado.fcff, kpis["wacc"]))
+        self.assertEqual(kpis["tir_inversionista"], cf.TIR_anual(resultado.fcfe))
+        self.assertAlmostEqual(kpis["total_intereses"], cf.calcular_total_intereses(cf.crear_tabla_amortizacion(p, monto)))
+        self.assertAlmostEqual(kpis["roi_total"], kpis["multiplo_capital"] - 1)
+        self.assertIsInstance(kpis["van_proyecto"], float)
+
+    def test_resultado_modelo_compacto(self):
+        """
+        The result keeps only the non-derivable columns in one read-only block; derived
+        columns and the DataFrame are rebuilt exactly, on demand.
+        """
+        import calculadora_financiera as cf
+        p = cf.ParametrosOverlay(cf.parametros, {("financiamiento", "tasa_impuesto_renta"): 0.27})
+        resultado = cf.evaluar_proyecto(p)
+        monto = p["financiamiento"]["monto_deuda"]
+        s = cf.compilar_proyecto(p)
+        bloque, kpis = cf._calcular_bloque_modelo(s, cf._etapa_capex(s), cf.crear_tabla_amortizacion(p, monto), monto)
+
+        self.assertLess(resultado.bloque.shape[0], len(cf.COLUMNAS_ALMACENADAS))  # Depreciacion no ocupa fila
+        self.assertEqual(resultado.bloque.shape[1], p["horizonte_meses"] + 1)
+        self.assertLess(len(cf.COLUMNAS_ALMACENADAS), len(cf.COLUMNAS_MODELO))
+        self.assertFalse(resultado.bloque.flags.writeable)
+        for nombre in cf.COLUMNAS_MODELO:
+            np.testing.assert_array_equal(resultado.column(nombre), bloque[cf.IDX_COLUMNA[nombre]], err_msg=nombre)
+        with self.assertRaises(KeyError):
+            resultado.column("No existe")
+
+        df = resultado.to_frame()
+        self.assertEqual(list(df.columns), cf.COLUMNAS_MODELO)
+        self.assertEqual(df.attrs["roi_total"], resultado.kpis["roi_total"])
+        # El DataFrame es una copia: modificarlo no toca el resultado
+        df.loc[0, "FCF Apalancado (FCFE)"] = 123.0
+        self.assertEqual(resultado.fcfe[0], bloque[cf.IDX_COLUMNA["FCF Apalancado (FCFE)"]][0])
+        # ROI total / MOIC salen del kernel, sin volver a recorrer FCFE
+        fcfe = resultado.fcfe
+        moic = fcfe[fcfe > 0].sum() / -fcfe[fcfe < 0].sum()
+        self.assertAlmostEqual(resultado.kpis["multiplo_capital"], moic)
+        self.assertAlmostEqual(kpis["roi_total"], moic - 1)
+
+    def test_compilar_proyecto(self):
+        """
+        The compiled spec gives the same model as the raw dict, is idempotent, keeps the
+        investment schedule sorted by month and reports invalid fields by path.
+        """
+        import copy
+        import calculadora_financiera as cf
+        p = copy.deepcopy(cf.parametros)
+        p["cronograma_inversion"].append({"item": "Retenido", "monto": 250_000, "mes": 1})
+        s = cf.compilar_proyecto(p)
+        self.assertIs(cf.compilar_proyecto(s), s)
+        self.assertEqual([e.mes for e in s.inversiones], sorted(e.mes for e in s.inversiones))
+        self.assertEqual(s.inversion_total, sum(item["monto"] for item in p["cronograma_inversion"]))
+        self.assertIs(s.planes_venta[0].tipo, cf.TipoPlan.DINAMICO)
+        self.assertEqual(s.financiamiento.capitalizacion, 1)
+
+        r_dict, r_spec = cf.evaluar_proyecto(p), cf.evaluar_proyecto(s)
+        np.testing.assert_array_equal(r_dict.fcfe, r_spec.fcfe)
+        self.assertEqual(r_dict.kpis, r_spec.kpis)
+        col, _ = cf.generar_modelo_financiero_batch([s, p])
+        np.testing.assert_array_equal(col["FCF Apalancado (FCFE)"][0], col["FCF Apalancado (FCFE)"][1])
+
+        invalidos = [
+            ({("planes_venta", 1, "tipo"): "Preventa"}, "planes_venta[1].tipo"),
+            ({("financiamiento", "capitalizacion"): "Bimestral"}, "financiamiento.capitalizacion"),
+            ({("planes_venta", 0, "frecuencia"): -1}, "planes_venta[0].frecuencia"),
+            ({("cronograma_inversion", 2, "mes"): 2.5}, "cronograma_inversion[2].mes"),
+            ({("horizonte_meses",): "120"}, "horizonte_meses"),
+        ]
+        for cambios, ruta in invalidos:
+            q = copy.deepcopy(cf.parametros)
+            for claves, valor in cambios.items():
+                destino = q
+                for clave in claves[:-1]:
+                    destino = destino[clave]
+                destino[claves[-1]] = valor
+            with self.assertRaises(cf.ParametrosInvalidos) as ctx:
+                cf.evaluar_proyecto(q)
+            self.assertEqual(ctx.exception.ruta, ruta)
+        # frecuencia=0 (todas las cuotas en el mismo mes) sigue siendo válida
+        q = copy.deepcopy(cf.parametros)
+        q["planes_venta"][0]["frecuencia"] = 0
+        self.assertEqual(cf.compilar_proyecto(q).planes_venta[0].frecuencia, 0)
+        # Un campo ausente sólo se exige donde se usa
+        with self.assertRaises(cf.ParametrosInvalidos) as ctx:
+            cf.evaluar_proyecto({"horizonte_meses": 12, "financiamiento": {"monto_deuda": 0}})
+        self.assertEqual(ctx.exception.ruta, "financiamiento.costo_deuda_anual")
+
+
+    def test_monte_carlo_streaming(self):
+        """
+        Degenerate draws reproduce the base case, a seed reproduces the run regardless of
+        block layout in workers, and streamed percentiles stay within one bin of NumPy's.
+        """
+        import calculadora_financiera as cf
+        p = cf.parametros
+        fijas = {
+            "Crecimiento": (("ventas", "crecimiento_precio_anual"), ("uniforme", 1.0, 1.0)),
+            "Tasa": (("financiamiento", "costo_deuda_anual"), ("normal", 1.0, 0.0)),
+        }
+        res = cf.simular_monte_carlo(p, fijas, 50, semilla=1, simulaciones_por_bloque=20, max_workers=1)
+        base = cf.evaluar_proyecto(p)
+        self.assertEqual(res["simulaciones"], 50)
+        for nombre in ("van_proyecto", "van_inversionista", "multiplo_capital"):
+            self.assertAlmostEqual(res["metricas"][nombre].media, base.kpis[nombre], delta=1e-6 * abs(base.kpis[nombre]))
+        self.assertAlmostEqual(res["metricas"]["tir_proyecto"].media, base.kpis["tir_proyecto"], places=6)
+        np.testing.assert_allclose(res["fcfe_mensual"].media, base.fcfe, rtol=1e-9, atol=1e-6)
+
+        variables = {
+            "Crecimiento": (("ventas", "crecimiento_precio_anual"), ("triangular", 0.6, 1.0, 1.2)),
+            "Velocidad": (("planes_venta", 0, "velocidad"), ("uniforme", 0.8, 1.1)),
+            "Urbanización": (("cronograma_inversion", "costo_urbanizacion"), ("lognormal", 0.0, 0.1)),
+        }
+        a = cf.simular_monte_carlo(p, variables, 300, semilla=7, simulaciones_por_bloque=100, max_workers=1)
+        b = cf.simular_monte_carlo(p, variables, 300, semilla=7, simulaciones_por_bloque=100, max_workers=2)
+        for nombre in cf.METRICAS_MONTE_CARLO:
+            np.testing.assert_array_equal(a["metricas"][nombre].conteos, b["metricas"][nombre].conteos)
+
+        rng = np.random.default_rng(0)
+        h = cf.HistogramaStreaming(bins=256)
+        valores = []
+        for escala in (1.0, 10.0, 100.0):
+            lote = rng.normal(0.0, escala, 5_000)
+            h.agregar(lote)
+            valores.append(lote)
+            nbytes = h.nbytes if escala == 1.0 else nbytes
+            self.assertEqual(h.nbytes, nbytes)
+        valores = np.concatenate(valores)
+        self.assertEqual(h.n, valores.size)
+        self.assertAlmostEqual(h.media, valores.mean(), places=8)
+        self.assertAlmostEqual(h.desviacion, valores.std(ddof=1), places=6)
+        np.testing.assert_allclose(h.percentiles([5, 50, 95]), np.percentile(valores, [5, 50, 95]), atol=float(h.ancho[0]))
+
+        with self.assertRaises(ValueError):
+            cf.simular_monte_carlo(p, {"X": (("ventas", "precio"), ("normal", 1.0, 0.1))}, 10)
+        with self.assertRaises(ValueError):
+            cf.simular_monte_carlo(p, {"X": (("cronograma_inversion", "no_existe"), ("normal", 1.0, 0.1))}, 10)
+
+    def test_indices_sobol(self):
+        """
+        The streaming Saltelli/Jansen estimators recover analytic indices, a variable with
+        no range gets zero indices and the design is reproducible from its seed.
+        """
+        import calculadora_financiera as cf
+        # f = x1 + 2 x2 + 4 x1 x3 con x ~ U(0, 1): índices analíticos
+        puntos, muestreo = cf._diseno_unitario(20_000, 6, "lhs", 1)
+        self.assertEqual(muestreo, "lhs")
+        A, B = puntos[:, :3], puntos[:, 3:]
+        f = lambda X: X[:, 0] + 2 * X[:, 1] + 4 * X[:, 0] * X[:, 2]
+        columnas = [f(A), f(B)]
+        for i in range(3):
+            AB = A.copy()
+            AB[:, i] = B[:, i]
+            columnas.append(f(AB))
+        salidas = np.column_stack(columnas)
+        acumulador = cf._AcumuladorSobol(3)
+        for i in range(0, len(salidas), 1_000):
+            acumulador.agregar(salidas[i:i + 1_000])
+        s1, s1_ic, st, st_ic = acumulador.indices(1.96)
+        varianza = 9 / 12 + 4 / 12 + 4 / 12 + 1 / 9  # la interacción x1·x3 aporta 1/9
+        np.testing.assert_allclose(s1, np.array([9, 4, 4]) / 12 / varianza, atol=3 * s1_ic.max())
+        np.testing.assert_allclose(st, np.array([9 / 12 + 1 / 9, 4 / 12, 4 / 12 + 1 / 9]) / varianza,
+                                   atol=3 * st_ic.max())
+
+        p = cf.parametros
+        variables = {
+            "Tasa": (("financiamiento", "costo_deuda_anual"), (-0.2, 0.2)),
+            "Urbanización": (("cronograma_inversion", "costo_urbanizacion"), (-0.2, 0.2)),
+            "Velocidad": (("planes_venta", 0, "velocidad"), (0.0, 0.0)),
+        }
+        a = cf.indices_sobol(p, variables, 64, muestreo="lhs", semilla=3, filas_por_bloque=16, max_workers=1)
+        b = cf.indices_sobol(p, variables, 64, muestreo="lhs", semilla=3, filas_por_bloque=64, max_workers=1)
+        self.assertEqual(a["evaluaciones"], 64 * 5)
+        for metrica in cf.METRICAS_SOBOL:
+            self.assertEqual(a["metricas"][metrica]["ST"][2], 0.0)
+            self.assertEqual(a["metricas"][metrica]["S1"][2], 0.0)
+            np.testing.assert_allclose(a["metricas"][metrica]["ST"], b["metricas"][metrica]["ST"], rtol=1e-9)
+        self.assertGreater(a["metricas"]["VAN Inversionista"]["ST"][1], a["metricas"]["VAN Inversionista"]["ST"][0])
+
+        with self.assertRaises(ValueError):
+            cf.indices_sobol(p, {"X": (("ventas", "precio"), (-0.1, 0.1))}, 8)
+        with self.assertRaises(ValueError):
+            cf.indices_sobol(p, {"X": (("financiamiento", "capitalizacion"), (-0.1, 0.1))}, 8)
+
+    def test_sobol_deuda_fija(self):
+        """
+        Sobol scenarios keep financiamiento.monto_deuda, like Monte Carlo, the GUI and the
+        graph, even when porcentaje_deuda is present and an investment tag moves CAPEX.
+        """
+        import copy
+        import calculadora_financiera as cf
+        p = copy.deepcopy(cf.parametros)
+        p["financiamiento"]["porcentaje_deuda"] = 0.6
+        resueltas = cf._resolver_rangos(p, {"Terreno": (("cronograma_inversion", "costo_terreno"), (0.5, 0.5))})
+        valores = cf._evaluar_bloque_sobol((p, resueltas, np.zeros((1, 2)), None))
+        esperado = cf.evaluar_proyecto(cf.ParametrosOverlay(p).con({}, {"costo_terreno": 1.5})).kpis
+        np.testing.assert_allclose(valores["VAN Inversionista"], esperado["van_inversionista"], rtol=1e-12)
+
+    def test_tabla_sensibilidad_2d(self):
+        """
+        Every cell of a two-way table matches the single-scenario model, and stages that
+        depend on neither axis are computed once for the whole grid.
+        """
+        import copy
+        import calculadora_financiera as cf
+        p = cf.parametros
+        crecimientos = np.linspace(0.0, 0.10, 6)
+        velocidades = np.array([3.0, 5.0, 7.0])
+        fallos = dict(cf.cache_etapas.fallos)
+        r = cf.tabla_sensibilidad_2d(p, (("ventas", "crecimiento_precio_anual"), crecimientos),
+                                     (("planes_venta", 0, "velocidad"), velocidades))
+        self.assertEqual(r["van"].shape, (6, 3))
+        self.assertLessEqual(cf.cache_etapas.fallos["capex_lote"] - fallos.get("capex_lote", 0), 1)
+        self.assertLessEqual(cf.cache_etapas.fallos["amortizacion_lote"] - fallos.get("amortizacion_lote", 0), 1)
+
+        q = copy.deepcopy(p)
+        q["ventas"]["crecimiento_precio_anual"] = crecimientos[4]
+        q["planes_venta"][0]["velocidad"] = velocidades[2]
+        kpis = cf.evaluar_proyecto(q).kpis
+        self.assertAlmostEqual(r["van"][4, 2], kpis["van_inversionista"], delta=1e-6 * abs(kpis["van_inversionista"]))
+        self.assertAlmostEqual(r["tir"][4, 2], kpis["tir_inversionista"], places=6)
+
+        # Eje de tag: multiplicadores de las inversiones con ese tag_sensibilidad
+        r = cf.tabla_sensibilidad_2d(p, (("cronograma_inversion", "costo_urbanizacion"), [0.8, 1.0, 1.2]),
+                                     (("financiamiento", "costo_deuda_anual"), [0.12]), max_workers=1)
+        self.assertAlmostEqual(r["van"][1, 0], cf.evaluar_proyecto(p).kpis["van_inversionista"], delta=1e-3)
+        self.assertTrue(r["van"][0, 0] > r["van"][1, 0] > r["van"][2, 0])
+
+        with self.assertRaises(ValueError):
+            cf.tabla_sensibilidad_2d(p, (("ventas", "crecimiento_precio_anual"), [0.05]),
+                                     (("ventas", "crecimiento_precio_anual"), [0.05]))
+        with self.assertRaises(ValueError):
+            cf.tabla_sensibilidad_2d(p, (("ventas", "precio"), [1.0]), (("financiamiento", "costo_deuda_anual"), [0.1]))
+
+    def test_buscar_objetivo(self):
+        """
+        Goal seek lands on the target metric of the single-scenario model, solves several
+        problems in one batch and reports targets it cannot reach instead of raising.
+        """
+        import copy
+        import calculadora_financiera as cf
+        p = cf.parametros
+        r = cf.buscar_objetivo(p, ("planes_venta", 0, "monto_pie"), "van_inversionista", 3_000_000)
+        self.assertTrue(r["convergido"])
+        q = copy.deepcopy(p)
+        q["planes_venta"][0]["monto_pie"] = r["valor"]
+        self.assertAlmostEqual(cf.evaluar_proyecto(q).kpis["van_inversionista"], 3_000_000, delta=1.0)
+
+        problemas = [{"ruta": ("planes_venta", i, "monto_cuota"), "metrica": "tir_proyecto", "objetivo": 0.30}
+                     for i in range(2)]
+        problemas.append({"ruta": ("financiamiento", "costo_deuda_anual"), "metrica": "van_inversionista",
+                          "objetivo": 0.0, "intervalo": (0.0, 1.0)})
+        problemas.append({"ruta": ("planes_venta", 0, "monto_pie"), "metrica": "van_inversionista", "objetivo": -1e9})
+        resultados = cf.buscar_objetivos(p, problemas)
+        for i in range(2):
+            self.assertTrue(resultados[i]["convergido"])
+            q = copy.deepcopy(p)
+            q["planes_venta"][i]["monto_cuota"] = resultados[i]["valor"]
+            self.assertAlmostEqual(cf.evaluar_proyecto(q).kpis["tir_proyecto"], 0.30, places=6)
+        self.assertTrue(resultados[2]["convergido"])
+        self.assertTrue(0.0 < resultados[2]["valor"] < 1.0)
+        self.assertFalse(resultados[3]["convergido"])
+        self.assertIsNone(resultados[3]["valor"])
+
+        with self.assertRaises(ValueError):
+            cf.buscar_objetivo(p, ("planes_venta", 0, "monto_pie"), "ebitda", 0.0)
+
+        # Resolver la deuda no toca ventas ni ítems: las rondas reutilizan esas etapas
+        aciertos = dict(cf.cache_etapas.aciertos)
+        problemas = [{"ruta": ("financiamiento", "monto_deuda"), "metrica": "van_inversionista",
+                      "objetivo": objetivo} for objetivo in np.linspace(2e6, 4e6, 5)]
+        resultados = cf.buscar_objetivos(p, problemas)
+        self.assertTrue(all(r["convergido"] for r in resultados))
+        for etapa in ("ventas_lote", "operativo_lote"):
+            self.assertGreater(cf.cache_etapas.aciertos[etapa] - aciertos.get(etapa, 0), 5)
+
+    def test_trazar_contorno(self):
+        """
+        Every traced point lies on the VAN = 0 contour, and warm-starting from neighbours
+        needs fewer model evaluations than solving each point from the base value.
+        """
+        import copy
+        import calculadora_financiera as cf
+        p = cf.parametros
+        crecimientos = np.linspace(0.0, 0.10, 21)
+        r = cf.trazar_contorno(p, (("ventas", "crecimiento_precio_anual"), crecimientos),
+                               ("financiamiento", "costo_deuda_anual"))
+        self.assertTrue(r["convergido"].all())
+        self.assertEqual(r["polilinea"].shape, (21, 2))
+        # Más crecimiento de precio soporta una tasa de deuda más alta
+        self.assertTrue(np.all(np.diff(r["y"]) > 0))
+        for i in (0, 7, 20):
+            q = copy.deepcopy(p)
+            q["ventas"]["crecimiento_precio_anual"] = crecimientos[i]
+            q["financiamiento"]["costo_deuda_anual"] = r["y"][i]
+            self.assertAlmostEqual(cf.evaluar_proyecto(q).kpis["van_inversionista"], 0.0, delta=10.0)
+
+        en_frio = cf.buscar_objetivos(p, [
+            {"ruta": ("financiamiento", "costo_deuda_anual"), "metrica": "van_inversionista", "objetivo": 0.0,
+             "fijos": {("ventas", "crecimiento_precio_anual"): x}} for x in crecimientos
+        ], max_workers=1)
+        self.assertLess(r["evaluaciones"], sum(e["evaluaciones"] for e in en_frio))
+        np.testing.assert_allclose(r["y"], [e["valor"] for e in en_frio], atol=1e-5)
+
+    def test_importacion_perezosa(self):
+        """
+        Importing the module in a fresh interpreter must not load pandas or firebase_admin;
+        pandas comes in with the first DataFrame, and the headless path never needs it.
+        """
+        import json
+        import os
+        import subprocess
+        import sys
+        codigo = (
+            "import json, sys\n"
+            "import calculadora_financiera as cf\n"
+            "cargados = lambda: [m for m in ('pandas', 'firebase_admin') if m in sys.modules]\n"
+            "fases = {'import': cargados()}\n"
+            "cf.evaluar_proyecto(cf.parametros)\n"
+            "fases['headless'] = cargados()\n"
+            "cf.construir_cronograma_inversiones(cf.parametros)\n"
+            "fases['dataframe'] = cargados()\n"
+            "print(json.dumps(fases))\n"
+        )
+        salida = subprocess.run([sys.executable, "-c", codigo], capture_output=True, text=True, check=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)))
+        fases = json.loads(salida.stdout.strip().splitlines()[-1])
+        self.assertEqual(fases["import"], [])
+        self.assertEqual(fases["headless"], [])
+        self.assertEqual(fases["dataframe"], ["pandas"])
+
 if __name__ == '__main__':
     unittest.main()